@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import anomaly_detector
+import synthetic_data
+
+# So sánh robust z-score trực tuyến (anomaly_detector) với IsolationForest fit lại trên toàn
+# lịch sử (như preprocess_stock_data). Universe giả lập được chèn ngoại lai đã biết trước:
+# cú nhảy giá (dịch mức giá vĩnh viễn, chỉ một bar có return bất thường) và đột biến khối
+# lượng. Báo cáo precision / recall so với nhãn thật, mức trùng khớp giữa hai phương pháp,
+# thời gian cả universe và độ trễ cập nhật một ngày cho cả panel.
+
+
+def inject_anomalies(close, volume, rate, seed):
+    """
+    Chèn ngoại lai vào panel (ticker x ngày); trả về panel mới và mặt nạ nhãn thật.
+    """
+    rng = np.random.default_rng(seed)
+    close, volume = close.copy(), volume.copy()
+    truth = np.zeros(close.shape, dtype=bool)
+    n_tickers, n_days = close.shape
+    for i in range(n_tickers):
+        # Bỏ qua phần khởi động của detector
+        days = rng.choice(np.arange(anomaly_detector.WINDOW, n_days), size=max(1, int(n_days * rate)),
+                          replace=False)
+        for j, day in enumerate(days):
+            if j % 2 == 0:
+                jump = rng.choice([-1, 1]) * rng.uniform(0.15, 0.25)
+                close[i, day:] *= np.exp(jump)
+            else:
+                volume[i, day] *= rng.uniform(8, 20)
+            truth[i, day] = True
+    return close, volume, truth
+
+
+def scores(flags, truth):
+    flagged = flags == -1
+    hits = (flagged & truth).sum()
+    return {"flagged": int(flagged.sum()), "precision": hits / max(flagged.sum(), 1),
+            "recall": hits / max(truth.sum(), 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark robust z-score trực tuyến so với IsolationForest.")
+    parser.add_argument("--tickers", type=int, default=50, help="Số ticker giả lập")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--rate", type=float, default=0.01, help="Tỷ lệ bar bị chèn ngoại lai")
+    args = parser.parse_args()
+
+    from sklearn.ensemble import IsolationForest
+
+    frames = [synthetic_data.generate_ohlcv(t, end="2024-12-31", days=args.days)
+              for t in synthetic_data.universe_tickers(args.tickers)]
+    close = np.array([df['Close'].to_numpy() for df in frames])
+    volume = np.array([df['Volume'].to_numpy() for df in frames])
+    close, volume, truth = inject_anomalies(close, volume, args.rate, seed=0)
+    print(f"{args.tickers} ticker x {close.shape[1]} ngày, {truth.sum()} ngoại lai được chèn")
+
+    started = time.perf_counter()
+    iso_flags = np.array([IsolationForest(contamination=0.01, random_state=42)
+                          .fit_predict(np.column_stack([close[i], volume[i]])) for i in range(len(close))])
+    iso_seconds = time.perf_counter() - started
+
+    state = anomaly_detector.RobustZState(range(args.tickers))
+    started = time.perf_counter()
+    _, robust_flags = state.update_panel(close[:, :-20], volume[:, :-20])
+    panel_seconds = time.perf_counter() - started
+    # 20 ngày cuối đi theo đường cập nhật trực tuyến: một lần update cho cả panel mỗi ngày
+    started = time.perf_counter()
+    online = [state.update(close[:, t], volume[:, t])[1] for t in range(close.shape[1] - 20, close.shape[1])]
+    update_ms = (time.perf_counter() - started) / 20 * 1000
+    robust_flags = np.hstack([robust_flags, np.array(online).T])
+
+    print("| Method | Time (s) | Flagged | Precision | Recall |")
+    print("|:-------|---------:|--------:|----------:|-------:|")
+    for name, flags, seconds in (("IsolationForest (refit/ticker)", iso_flags, iso_seconds),
+                                 ("Robust z (panel)", robust_flags, panel_seconds)):
+        r = scores(flags, truth)
+        print(f"| {name} | {seconds:.2f} | {r['flagged']} | {r['precision']:.1%} | {r['recall']:.1%} |")
+    both = ((iso_flags == -1) & (robust_flags == -1)).sum()
+    either = ((iso_flags == -1) | (robust_flags == -1)).sum()
+    print(f"\nNhãn giống nhau: {(iso_flags == robust_flags).mean():.2%} số bar, "
+          f"trùng ngoại lai (Jaccard): {both / max(either, 1):.1%}")
+    print(f"Cập nhật trực tuyến một ngày cho {args.tickers} ticker: {update_ms:.2f} ms")
+
+    try:
+        import market_store
+        if market_store.has_ticker("FPT.VN"):
+            df = market_store.load_ohlcv("FPT.VN").interpolate(method='linear')
+            iso = IsolationForest(contamination=0.01, random_state=42).fit_predict(df[['Close', 'Volume']])
+            robust, _ = anomaly_detector.detect_frame(df)
+            robust = robust.to_numpy()
+            print(f"\nFPT.VN ({len(df)} bar): IsolationForest {int((iso == -1).sum())} ngoại lai, "
+                  f"robust z {int((robust == -1).sum())}, chung {int(((iso == -1) & (robust == -1)).sum())}")
+    except Exception as e:
+        print(f"Bỏ qua FPT.VN: {e}")
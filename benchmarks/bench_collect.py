@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import collect_data
+import mock_market_server
+
+# Đo throughput của collect_universe trên máy chủ OHLCV giả lập (không cần mạng).
+# Máy chủ chạy ở tiến trình riêng để không tranh GIL với phía client được đo.
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_ready(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Máy chủ giả lập không khởi động được")
+
+
+def run(tickers, workers, port, rate_limit):
+    source = collect_data.HTTPSource(f"http://127.0.0.1:{port}")
+    with tempfile.TemporaryDirectory() as store:
+        os.environ["STOCK_STORE_DIR"] = store
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = collect_data.collect_universe(tickers, source=source, max_workers=workers,
+                                                   rate_limit=rate_limit, backoff=0.05)
+        elapsed = time.perf_counter() - started
+    retries = sum(report["attempts"].values()) - len(tickers)
+    return elapsed, report, retries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tải dữ liệu song song trên máy chủ giả lập.")
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.02, help="Độ trễ giả lập mỗi request (giây)")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Số request tối đa mỗi giây")
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = multiprocessing.Process(target=mock_market_server.run_server, daemon=True,
+                                     kwargs={"port": port, "fail_rate": args.fail_rate, "latency": args.latency})
+    server.start()
+    _wait_until_ready(port)
+
+    tickers = [f"SYN{i:04d}" for i in range(args.tickers)]
+    # Lượt chạy làm nóng để máy chủ sinh sẵn lịch sử của các ticker
+    run(tickers, 16, port, None)
+
+    print("| Workers | Time (s) | Tickers/s | Retries | Failed |")
+    print("|--------:|---------:|----------:|--------:|-------:|")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        elapsed, report, retries = run(tickers, workers, port, args.rate_limit)
+        print(f"| {workers} | {elapsed:.2f} | {len(report['succeeded']) / elapsed:.1f} | "
+              f"{retries} | {len(report['failed'])} |")
+    server.terminate()
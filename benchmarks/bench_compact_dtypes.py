@@ -0,0 +1,97 @@
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import compact_dtypes
+import synthetic_data
+
+# So sánh chế độ mặc định (float64) với chế độ compact (float32 / int8 / ticker categorical)
+# trên universe giả lập: dung lượng file đã tiền xử lý, bộ nhớ của panel train/test, thời gian
+# đọc + ghép panel và thời gian huấn luyện / dự đoán của XGBoost chung cho cả universe.
+
+
+def _quiet():
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def prepare(tickers, output_root, compact):
+    import preprocess_data
+    sources = {}
+    for ticker in tickers:
+        output_dir = os.path.join(output_root, ticker)
+        with _quiet():
+            preprocess_data.preprocess_stock_data(ticker=ticker, output_dir=output_dir, compact=compact)
+        sources[ticker] = os.path.join(output_dir, "data", "processed")
+    return sources
+
+
+def measure(sources, compact, n_estimators):
+    import xgboost as xgb
+    import modeling
+    started = time.perf_counter()
+    frames = modeling.load_ticker_frames(sources, compact=compact)
+    train = modeling.stack_panel(frames, "train", compact=compact)
+    test = modeling.stack_panel(frames, "test", compact=compact)
+    load_seconds = time.perf_counter() - started
+
+    features = [c for c in train.columns if c not in ['Close', 'Outlier']]
+    model = xgb.XGBRegressor(n_estimators=n_estimators, learning_rate=0.05, tree_method="hist",
+                             enable_categorical=True)
+    started = time.perf_counter()
+    model.fit(train[features], train['Close'])
+    fit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    y_pred = model.predict(test[features])
+    predict_seconds = time.perf_counter() - started
+    rmse = float(np.sqrt(np.mean((y_pred.astype(np.float64) - test['Close'].to_numpy(dtype=np.float64)) ** 2)))
+
+    csv_bytes = sum(os.path.getsize(os.path.join(d, name)) for d in sources.values()
+                    for name in ("preprocessed_data.csv", "train_data.csv", "test_data.csv"))
+    return {"panel_mb": (compact_dtypes.frame_nbytes(train) + compact_dtypes.frame_nbytes(test)) / 2**20,
+            "csv_mb": csv_bytes / 2**20, "load_seconds": load_seconds, "fit_seconds": fit_seconds,
+            "predict_seconds": predict_seconds, "rmse_scaled": rmse, "rows": len(train) + len(test)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chế độ kiểu dữ liệu gọn (compact).")
+    parser.add_argument("--tickers", type=int, default=100, help="Số ticker giả lập")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--n-estimators", type=int, default=300)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)
+
+    workdir = tempfile.mkdtemp(prefix="bench_compact_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    try:
+        print(f"Sinh {args.tickers} ticker x {args.days} ngày và tiền xử lý ở hai chế độ...")
+        tickers = synthetic_data.write_universe(args.tickers, days=args.days, seed=0, end="2024-12-31")
+        results = {}
+        for label, compact in (("float64", False), ("compact", True)):
+            sources = prepare(tickers, os.path.join(workdir, label), compact)
+            results[label] = measure(sources, compact, args.n_estimators)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{results['float64']['rows']} dòng panel, XGBoost {args.n_estimators} cây")
+    print("| Mode | CSV (MB) | Panel (MB) | Load (s) | Fit (s) | Predict (s) | RMSE (scaled) |")
+    print("|:-----|---------:|-----------:|---------:|--------:|------------:|--------------:|")
+    for label, r in results.items():
+        print(f"| {label} | {r['csv_mb']:.1f} | {r['panel_mb']:.1f} | {r['load_seconds']:.2f} | "
+              f"{r['fit_seconds']:.2f} | {r['predict_seconds']:.3f} | {r['rmse_scaled']:.5f} |")
+    base, compact = results["float64"], results["compact"]
+    print(f"\nBộ nhớ panel giảm {1 - compact['panel_mb'] / base['panel_mb']:.0%}, "
+          f"thời gian fit giảm {1 - compact['fit_seconds'] / base['fit_seconds']:.0%}, "
+          f"đọc + ghép panel giảm {1 - compact['load_seconds'] / base['load_seconds']:.0%}")
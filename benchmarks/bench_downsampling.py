@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import downsampling
+
+# Đo chi phí giảm điểm cho biểu đồ dashboard trên lịch sử nến phút nhiều năm: thời gian LTTB /
+# min-max, kích thước JSON gửi lên trình duyệt (như Plotly tuần tự hóa x/y) so với gửi toàn bộ
+# điểm, và độ trung thực (giữ đỉnh/đáy, sai số khi nội suy đường đã giảm về lưới gốc).
+
+
+def payload(series):
+    started = time.perf_counter()
+    body = json.dumps({"x": series.index.strftime("%Y-%m-%d %H:%M").tolist(), "y": series.tolist()})
+    return len(body), time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark giảm điểm (LTTB / min-max) cho dashboard.")
+    parser.add_argument("--years", type=float, default=3, help="Số năm nến phút (phiên 6.5 giờ, 252 ngày/năm)")
+    parser.add_argument("--points", type=int, default=2000, help="Số điểm tối đa mỗi đường")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = int(args.years * 252 * 390)
+    index = pd.date_range("2020-01-01", periods=n, freq="min")
+    series = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n))), index=index)
+    raw_bytes, raw_seconds = payload(series)
+    x = index.asi8.astype(np.float64)
+
+    print(f"{n:,} nến phút, tối đa {args.points} điểm mỗi đường")
+    print("| Method | Downsample (ms) | Points | JSON (KB) | Serialize (ms) | Max/min giữ nguyên | RMSE nội suy (%) |")
+    print("|:-------|--------:|-------:|----------:|---------:|:--|--:|")
+    print(f"| Toàn bộ điểm | - | {n:,} | {raw_bytes / 1024:,.0f} | {raw_seconds * 1000:,.0f} | - | - |")
+    for method in downsampling.METHODS:
+        started = time.perf_counter()
+        small = downsampling.downsample(series, args.points, method)
+        seconds = time.perf_counter() - started
+        size, serialize = payload(small)
+        kept = small.max() == series.max() and small.min() == series.min()
+        rebuilt = np.interp(x, small.index.asi8.astype(np.float64), small.to_numpy())
+        rmse = np.sqrt(np.mean((rebuilt - series.to_numpy()) ** 2)) / series.mean() * 100
+        print(f"| {method} | {seconds * 1000:.0f} | {len(small):,} | {size / 1024:,.0f} | {serialize * 1000:.1f} | "
+              f"{'có' if kept else 'không'} | {rmse:.3f} |")
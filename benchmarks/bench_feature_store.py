@@ -0,0 +1,94 @@
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import compact_dtypes
+import synthetic_data
+
+# So sánh cách modeling nạp dữ liệu: đọc lại train/test CSV rồi lọc cột (cách cũ) với kho
+# đặc trưng (lần đầu lưu .npy, các lần sau chỉ memmap). Kiểm tra X của kho là view không sao
+# chép, đo thời gian tính + lưu một đặc trưng bổ sung và lần đọc lại từ cache.
+
+
+def _quiet():
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def load_csv(processed_dir):
+    train_df = compact_dtypes.read_csv(os.path.join(processed_dir, "train_data.csv"))
+    test_df = compact_dtypes.read_csv(os.path.join(processed_dir, "test_data.csv"))
+    features = [c for c in train_df.columns if c not in ['Close', 'Outlier']]
+    return train_df[features], train_df['Close'], test_df[features], test_df['Close']
+
+
+def load_store(processed_dir, root):
+    import feature_store
+    with _quiet():
+        store = feature_store.materialize("SYN0000", processed_dir, root=root)
+    return store, store.frame("train"), store.target("train"), store.frame("test"), store.target("test")
+
+
+def timed(func, *args, repeat=1):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark kho đặc trưng memmap so với đọc CSV.")
+    parser.add_argument("--days", type=int, default=20000, help="Số ngày giao dịch của ticker giả lập")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)
+
+    workdir = tempfile.mkdtemp(prefix="bench_feature_store_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    try:
+        import preprocess_data
+        synthetic_data.write_universe(1, days=args.days, seed=0, end="2024-12-31")
+        with _quiet():
+            preprocess_data.preprocess_stock_data(ticker="SYN0000", output_dir=workdir)
+        processed_dir = os.path.join(workdir, "data", "processed")
+        root = os.path.join(workdir, "features")
+
+        csv_seconds, (X_csv, y_csv, X_test_csv, _) = timed(load_csv, processed_dir, repeat=args.repeat)
+        first_seconds, _ = timed(load_store, processed_dir, root)
+        cached_seconds, (store, X_train, y_train, X_test, _) = timed(load_store, processed_dir, root,
+                                                                      repeat=args.repeat)
+        with _quiet():
+            extra_seconds, _ = timed(store.column, "Volatility_20")
+        extra_cached_seconds, _ = timed(store.column, "Volatility_20", repeat=args.repeat)
+
+        same = (np.array_equal(X_csv.to_numpy(), X_train.to_numpy())
+                and np.array_equal(X_test_csv.to_numpy(), X_test.to_numpy())
+                and np.array_equal(y_csv.to_numpy(), y_train.to_numpy()))
+        zero_copy = np.shares_memory(X_train.to_numpy(), store.matrix) and \
+            np.shares_memory(X_test.to_numpy(), store.matrix)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(X_csv) + len(X_test_csv)} dòng x {X_csv.shape[1]} đặc trưng")
+    print("| Nạp dữ liệu | Thời gian (s) |")
+    print("|:------------|--------------:|")
+    print(f"| CSV train/test | {csv_seconds:.3f} |")
+    print(f"| Kho đặc trưng, lần đầu (lưu .npy) | {first_seconds:.3f} |")
+    print(f"| Kho đặc trưng, memmap | {cached_seconds:.4f} |")
+    print(f"| Volatility_20, tính + lưu | {extra_seconds:.4f} |")
+    print(f"| Volatility_20, từ cache | {extra_cached_seconds:.4f} |")
+    print(f"\nGiống hệt CSV: {same}, X là view của memmap (không sao chép): {zero_copy}")
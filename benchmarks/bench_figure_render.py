@@ -0,0 +1,84 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import eda_analysis
+import figure_renderer
+import synthetic_data
+from technical_indicators import calculate_rsi, calculate_macd
+
+# Đo thời gian vẽ báo cáo EDA cho universe giả lập (4 biểu đồ mỗi ticker): vẽ tuần tự, vẽ song
+# song trên process pool, chạy lại khi dữ liệu không đổi (bỏ qua theo hash lát dữ liệu) và khi
+# chỉ một phần ticker có thêm ngày giao dịch mới.
+
+
+def eda_inputs(ticker, days, extra_days=0):
+    """
+    Dữ liệu gốc và bản "đã tiền xử lý" tối giản (đủ cột cho eda_jobs) của một ticker.
+    """
+    raw = synthetic_data.generate_ohlcv(ticker, end="2024-12-31", days=days + extra_days)
+    pre = raw.copy()
+    pre['Log_Returns'] = np.log(pre['Close'] / pre['Close'].shift(1))
+    pre['RSI_14'] = calculate_rsi(pre['Close'], period=14)
+    pre['MACD_12_26_9'], _ = calculate_macd(pre['Close'])
+    pre['SMA_7'] = pre['Close'].rolling(window=7).mean()
+    pre['SMA_30'] = pre['Close'].rolling(window=30).mean()
+    return pre, raw
+
+
+def universe_jobs(tickers, days, workdir, updated=()):
+    jobs = []
+    for ticker in tickers:
+        pre, raw = eda_inputs(ticker, days, extra_days=1 if ticker in updated else 0)
+        jobs.extend(eda_analysis.eda_jobs(pre, raw, ticker, os.path.join(workdir, ticker)))
+    return jobs
+
+
+def timed(jobs, **kwargs):
+    started = time.perf_counter()
+    status = figure_renderer.render_figures(jobs, **kwargs)
+    rendered = sum(s == "rendered" for s in status.values())
+    return time.perf_counter() - started, rendered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vẽ biểu đồ EDA song song và bỏ qua biểu đồ không đổi.")
+    parser.add_argument("--tickers", type=int, default=20, help="Số ticker giả lập")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--jobs", type=int, default=None, help="Số tiến trình vẽ (mặc định: số CPU)")
+    parser.add_argument("--updated", type=float, default=0.1, help="Tỷ lệ ticker có thêm ngày mới")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    tickers = synthetic_data.universe_tickers(args.tickers)
+    updated = set(tickers[:max(1, int(len(tickers) * args.updated))])
+    workdir = tempfile.mkdtemp(prefix="bench_render_")
+    try:
+        jobs = universe_jobs(tickers, args.days, workdir)
+        rows = [("Tuần tự, vẽ tất cả", *timed(jobs, max_workers=1, force=True)),
+                (f"Process pool ({args.jobs or os.cpu_count()} worker), vẽ tất cả",
+                 *timed(jobs, max_workers=args.jobs, force=True)),
+                ("Chạy lại, dữ liệu không đổi", *timed(universe_jobs(tickers, args.days, workdir),
+                                                       max_workers=args.jobs))]
+        rows.append((f"Chạy lại, {len(updated)} ticker có ngày mới",
+                     *timed(universe_jobs(tickers, args.days, workdir, updated), max_workers=args.jobs)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.tickers} ticker x {len(jobs) // args.tickers} biểu đồ, {args.days} ngày")
+    print("| Lần chạy | Time (s) | Biểu đồ vẽ lại |")
+    print("|:--|--:|--:|")
+    for name, seconds, rendered in rows:
+        print(f"| {name} | {seconds:.2f} | {rendered}/{len(jobs)} |")
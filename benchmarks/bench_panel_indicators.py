@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import panel_indicators
+from preprocess_data import calculate_rsi, calculate_macd
+
+# So sánh engine panel với cách tính từng Series của preprocess_data:
+# kiểm tra kết quả trùng khớp tuyệt đối rồi đo thời gian theo số ticker.
+
+
+def make_panel(n_tickers, n_days, seed=42):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.02, (n_tickers, n_days))
+    panel = rng.uniform(10_000, 150_000, (n_tickers, 1)) * np.exp(np.cumsum(returns, axis=1))
+    # Một phần ticker niêm yết muộn (NaN ở đầu chuỗi)
+    late = rng.random(n_tickers) < 0.1
+    panel[late, :rng.integers(1, n_days // 2)] = np.nan
+    return panel
+
+
+def per_series(panel):
+    out = []
+    for row in panel:
+        close = pd.Series(row)
+        macd, signal = calculate_macd(close)
+        out.append({
+            "Log_Returns": np.log(close / close.shift(1)).values,
+            "RSI_14": calculate_rsi(close, period=14).values,
+            "MACD_12_26_9": macd.values,
+            "MACDs_12_26_9": signal.values,
+            "SMA_7": close.rolling(window=7).mean().values,
+            "SMA_30": close.rolling(window=30).mean().values,
+        })
+    return out
+
+
+def check_identical(panel):
+    result = panel_indicators.compute_indicators(panel)
+    for i, reference in enumerate(per_series(panel)):
+        for name, values in reference.items():
+            if not np.array_equal(values, result[name][i], equal_nan=True):
+                raise AssertionError(f"{name} khác kết quả pandas ở ticker {i}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark engine chỉ báo dạng panel.")
+    parser.add_argument("--tickers", default="10,100,1000,5000")
+    parser.add_argument("--days", type=int, default=1250)
+    parser.add_argument("--max-reference", type=int, default=1000,
+                        help="Chỉ chạy cách tính từng Series tới số ticker này")
+    args = parser.parse_args()
+
+    check_identical(make_panel(200, 400, seed=7))
+    print("Kết quả panel trùng khớp tuyệt đối với calculate_rsi / calculate_macd / rolling().mean().\n")
+
+    print(f"| Tickers | Days | Panel (s) | Per-series (s) | Speedup |")
+    print(f"|--------:|-----:|----------:|---------------:|--------:|")
+    for n in [int(t) for t in args.tickers.split(",")]:
+        panel = make_panel(n, args.days)
+        started = time.perf_counter()
+        panel_indicators.compute_indicators(panel)
+        panel_time = time.perf_counter() - started
+
+        if n <= args.max_reference:
+            started = time.perf_counter()
+            per_series(panel)
+            ref_time = time.perf_counter() - started
+            print(f"| {n} | {args.days} | {panel_time:.3f} | {ref_time:.3f} | {ref_time / panel_time:.1f}x |")
+        else:
+            print(f"| {n} | {args.days} | {panel_time:.3f} | - | - |")
@@ -0,0 +1,199 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import instrumentation
+import market_store
+import synthetic_data
+
+# Đo thời gian các hàm của pipeline trên universe giả lập (1, 100, 1000 ticker...).
+# Mỗi ô (hàm x số ticker) chạy hàm lần lượt cho từng ticker trong một kho dữ liệu
+# tạm, ghi thời gian tổng, ms/ticker, dòng/giây và peak RSS ra file JSON để so sánh
+# giữa các nhánh (--compare) và phát hiện chỗ thời gian tăng nhanh hơn tuyến tính.
+
+FUNCTIONS = ("descriptive_stats", "indicators", "preprocess", "eda", "model")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_descriptive_stats(ticker, workdir):
+    import descriptive_stats
+    descriptive_stats.calculate_descriptive_stats(ticker=ticker)
+
+
+def _run_indicators(ticker, workdir):
+    from preprocess_data import calculate_rsi, calculate_macd
+    close = market_store.load_ohlcv(ticker, columns=["Close"])["Close"]
+    calculate_rsi(close, period=14)
+    calculate_macd(close)
+
+
+def _run_preprocess(ticker, workdir):
+    import preprocess_data
+    if preprocess_data.preprocess_stock_data(ticker=ticker, output_dir=workdir) is None:
+        raise RuntimeError(f"Tiền xử lý {ticker} thất bại")
+
+
+def _run_eda(ticker, workdir):
+    import eda_analysis
+    eda_analysis.run_eda_analysis(ticker=ticker, output_dir=workdir)
+
+
+def _run_model(ticker, workdir):
+    import modeling
+    modeling.run_modeling(output_dir=workdir)
+
+
+RUNNERS = {
+    "descriptive_stats": _run_descriptive_stats,
+    "indicators": _run_indicators,
+    "preprocess": _run_preprocess,
+    "eda": _run_eda,
+    "model": _run_model,
+}
+
+
+def bench_cell(function, tickers, rows, output_root, max_seconds=None):
+    """
+    Chạy một hàm cho lần lượt các ticker. Nếu vượt max_seconds thì dừng và ghi số ticker đã chạy.
+    """
+    import matplotlib.pyplot as plt
+    runner = RUNNERS[function]
+    done = 0
+    with instrumentation.track(f"{function}@{len(tickers)}") as record, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        for ticker in tickers:
+            runner(ticker, os.path.join(output_root, ticker))
+            plt.close("all")
+            done += 1
+            if max_seconds and time.perf_counter() - started > max_seconds:
+                break
+        record["rows"] = rows[:done].sum()
+    return {
+        "function": function,
+        "tickers": len(tickers),
+        "tickers_run": done,
+        "seconds": record["seconds"],
+        "ms_per_ticker": record["seconds"] / done * 1000,
+        "rows": int(record["rows"]),
+        "rows_per_sec": record["rows_per_sec"],
+        "peak_rss_mb": record["peak_rss_bytes"] / 2**20 if record["peak_rss_bytes"] else None,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    previous = {(r["function"], r["tickers"]): r for r in baseline["results"]}
+    print(f"\nSo với {baseline_path} ({baseline.get('label')}):")
+    print("| Function | Tickers | Baseline ms/ticker | Current ms/ticker | Ratio |")
+    print("|:---------|--------:|-------------------:|------------------:|------:|")
+    for r in results:
+        old = previous.get((r["function"], r["tickers"]))
+        if old:
+            print(f"| {r['function']} | {r['tickers']} | {old['ms_per_ticker']:.1f} | "
+                  f"{r['ms_per_ticker']:.1f} | {r['ms_per_ticker'] / old['ms_per_ticker']:.2f}x |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline trên universe giả lập.")
+    parser.add_argument("--tickers", default="1,100,1000", help="Các kích thước universe, phân tách bằng dấu phẩy")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--interval", default="1d", choices=list(synthetic_data.INTERVALS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--functions", default=",".join(FUNCTIONS),
+                        help=f"Các hàm cần đo (trong {', '.join(FUNCTIONS)})")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="Giới hạn thời gian mỗi ô; ticker còn lại bị bỏ qua (xem tickers_run)")
+    parser.add_argument("--label", default=None, help="Nhãn của lần chạy (mặc định: git commit)")
+    parser.add_argument("--output", default=None,
+                        help="File JSON kết quả (mặc định benchmarks/results/pipeline_<label>.json)")
+    parser.add_argument("--compare", default=None, help="File JSON của lần chạy khác để so sánh")
+    args = parser.parse_args()
+
+    sizes = sorted(int(n) for n in args.tickers.split(","))
+    selected = {name.strip() for name in args.functions.split(",")}
+    if selected - set(FUNCTIONS):
+        parser.error(f"Hàm không tồn tại: {sorted(selected - set(FUNCTIONS))}")
+    # Giữ thứ tự của pipeline: eda và model đọc đầu ra của preprocess
+    functions = [name for name in FUNCTIONS if name in selected]
+    label = args.label or _git_revision() or "local"
+    output = args.output or os.path.join(BASE_DIR, "benchmarks", "results", f"pipeline_{label}.json")
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    try:
+        print(f"Sinh {sizes[-1]} ticker x {args.days} ngày ({args.interval})...")
+        started = time.perf_counter()
+        # Cố định ngày kết thúc để mọi lần chạy dùng đúng cùng một dữ liệu
+        all_tickers = synthetic_data.write_universe(sizes[-1], days=args.days, interval=args.interval,
+                                                    seed=args.seed, end="2024-12-31")
+        rows = np.array([len(market_store.load_ohlcv(t, columns=["Close"])) for t in all_tickers])
+        print(f"   ({time.perf_counter() - started:.1f}s, {rows.sum()} dòng)")
+
+        # Import trước các module nặng để thời gian import không bị tính vào ô đầu tiên
+        import descriptive_stats, preprocess_data, eda_analysis, modeling  # noqa: F401
+        warnings.simplefilter("ignore", FutureWarning)
+
+        results = []
+        for n in sizes:
+            for function in functions:
+                if function in ("eda", "model") and "preprocess" not in functions:
+                    for ticker in all_tickers[:n]:
+                        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                            _run_preprocess(ticker, os.path.join(workdir, "out", ticker))
+                result = bench_cell(function, all_tickers[:n], rows, os.path.join(workdir, "out"),
+                                    args.max_seconds)
+                instrumentation.reset()
+                results.append(result)
+                print(f"{function:<18} {n:>5} ticker: {result['seconds']:8.2f}s "
+                      f"({result['ms_per_ticker']:.1f} ms/ticker, {result['tickers_run']} đã chạy)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    payload = {
+        "label": label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"tickers": sizes, "days": args.days, "interval": args.interval, "seed": args.seed,
+                   "max_seconds": args.max_seconds},
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "pandas": pd.__version__, "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nĐã lưu kết quả vào '{output}'")
+
+    print("\n| Function | Tickers | Seconds | ms/ticker | Rows/s | Peak RSS (MB) |")
+    print("|:---------|--------:|--------:|----------:|-------:|--------------:|")
+    for r in results:
+        print(f"| {r['function']} | {r['tickers']} | {r['seconds']:.2f} | {r['ms_per_ticker']:.1f} | "
+              f"{r['rows_per_sec'] or 0:.0f} | {r['peak_rss_mb'] or 0:.0f} |")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Đo throughput và độ trễ của prediction_server với nhiều client đồng thời, so sánh
+# micro-batching (max_batch lớn) với dự đoán từng request (max_batch=1).
+# Cần có mô hình trong models/ (chạy 'python main.py model' trước).
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(port, max_batch, max_wait_ms):
+    code = ("import sys; sys.path.append({src!r}); import prediction_server; "
+            "prediction_server.run_server(port={port}, max_batch={max_batch}, max_wait_ms={wait})").format(
+        src=os.path.join(BASE_DIR, "src"), port=port, max_batch=max_batch, wait=max_wait_ms)
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Prediction server dừng khi khởi động (đã có mô hình trong models/?)")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Prediction server không khởi động được")
+
+
+async def _client(port, body, requests, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = (f"POST /predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    for _ in range(requests):
+        started = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append((time.perf_counter() - started) * 1000)
+    writer.close()
+
+
+async def _load(port, body, clients, requests):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(port, body, requests, latencies) for _ in range(clients)])
+    return time.perf_counter() - started, latencies
+
+
+def run(max_batch, max_wait_ms, clients, requests, body):
+    port = _free_port()
+    process = _start_server(port, max_batch, max_wait_ms)
+    try:
+        asyncio.run(_load(port, body, clients, 5))  # warm-up
+        elapsed, latencies = asyncio.run(_load(port, body, clients, requests))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    return {"max_batch": max_batch, "requests": len(latencies), "req_per_sec": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies), "p99_ms": latencies[int(len(latencies) * 0.99) - 1]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark micro-batching của prediction server.")
+    parser.add_argument("--model", default="XGBoost")
+    parser.add_argument("--clients", type=int, default=64, help="Số kết nối đồng thời")
+    parser.add_argument("--requests", type=int, default=50, help="Số request mỗi kết nối")
+    parser.add_argument("--max-batch", default="1,256")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Một dòng đặc trưng thật từ data/processed làm payload
+    processed_df = pd.read_csv(os.path.join(BASE_DIR, "data", "processed", "preprocessed_data.csv"), index_col='Date')
+    row = processed_df.drop(columns=['Close', 'Outlier']).iloc[-1].to_dict()
+    body = json.dumps({"model": args.model, "rows": [row]}).encode()
+
+    print(f"{args.clients} client x {args.requests} request, model {args.model}")
+    print("| max_batch | Requests | Req/s | p50 (ms) | p99 (ms) |")
+    print("|----------:|---------:|------:|---------:|---------:|")
+    for max_batch in [int(b) for b in args.max_batch.split(",")]:
+        r = run(max_batch, args.max_wait_ms, args.clients, args.requests, body)
+        print(f"| {r['max_batch']} | {r['requests']} | {r['req_per_sec']:.0f} | {r['p50_ms']:.1f} | {r['p99_ms']:.1f} |")
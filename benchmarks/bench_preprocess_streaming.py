@@ -0,0 +1,104 @@
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import synthetic_data
+
+# So sánh tiền xử lý nạp toàn bộ với tiền xử lý theo khối (--chunk-rows) trên một ticker
+# nến phút giả lập: thời gian, peak RSS của tiến trình con và độ lệch lớn nhất giữa hai
+# file preprocessed_data.csv. Mỗi chế độ chạy trong tiến trình riêng để đo RSS độc lập.
+# Thêm một ticker nến ngày bắt đầu vài ngày trước cuối năm (phân vùng năm đầu ngắn hơn cửa sổ
+# khởi động SMA_30) để kiểm tra hai chế độ cho cùng số dòng, cùng ngày đầu và cùng giá trị.
+
+CODE = ("import sys; sys.path.append({src!r}); import preprocess_data; "
+        "sys.exit(preprocess_data.preprocess_stock_data(ticker={ticker!r}, output_dir={out!r}, "
+        "chunk_rows={chunk_rows}) is None)")
+
+
+def run_mode(ticker, output_dir, chunk_rows):
+    code = CODE.format(src=os.path.join(BASE_DIR, "src"), ticker=ticker, out=output_dir, chunk_rows=chunk_rows)
+    env = dict(os.environ, MPLBACKEND="Agg", PYTHONWARNINGS="ignore")
+    started = time.perf_counter()
+    # Đo peak RSS riêng của tiến trình con bằng wait4
+    process = subprocess.Popen([sys.executable, "-c", code], env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"Tiền xử lý thất bại (chunk_rows={chunk_rows})")
+    return time.perf_counter() - started, usage.ru_maxrss / 1024
+
+
+def read_output(output_dir):
+    return pd.read_csv(os.path.join(output_dir, "data", "processed", "preprocessed_data.csv"), index_col='Date')
+
+
+def check_short_first_year(workdir, chunk_rows):
+    """
+    So sánh hai chế độ trên ticker có phân vùng năm đầu chỉ vài ngày. Trả về (số dòng, ngày đầu) của
+    từng chế độ và độ lệch lớn nhất (None nếu khác số dòng).
+    """
+    import market_store
+    ticker = "SHORTYEAR.VN"
+    market_store.write_ohlcv(synthetic_data.generate_ohlcv(ticker, start="2022-12-20", end="2024-06-30", seed=1),
+                             ticker)
+    frames = []
+    for label, rows in (("short_mem", None), ("short_chunked", chunk_rows)):
+        output_dir = os.path.join(workdir, label)
+        run_mode(ticker, output_dir, rows)
+        frames.append(read_output(output_dir))
+    shapes = [(len(f), f.index[0]) for f in frames]
+    if shapes[0] != shapes[1]:
+        return shapes, None
+    features = frames[0].columns.drop('Outlier')
+    return shapes, float(np.abs(frames[0][features].to_numpy() - frames[1][features].to_numpy()).max())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tiền xử lý theo khối so với nạp toàn bộ.")
+    parser.add_argument("--days", type=int, default=1500, help="Số ngày giao dịch")
+    parser.add_argument("--interval", default="1m", choices=list(synthetic_data.INTERVALS))
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_stream_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    try:
+        ticker = synthetic_data.write_universe(1, days=args.days, interval=args.interval, seed=0,
+                                               end="2024-12-31", prefix="BENCH")[0]
+        results = {}
+        for label, chunk_rows in (("in-memory", None), (f"chunked ({args.chunk_rows})", args.chunk_rows)):
+            output_dir = os.path.join(workdir, label.split()[0])
+            results[label] = run_mode(ticker, output_dir, chunk_rows) + (output_dir,)
+
+        frames = [read_output(out) for _, _, out in results.values()]
+        rows = len(frames[0])
+        features = frames[0].columns.drop('Outlier')
+        max_diff = float(np.abs(frames[0][features].to_numpy() - frames[1][features].to_numpy()).max())
+        outlier_agreement = float((frames[0]['Outlier'] == frames[1]['Outlier']).mean())
+        short_shapes, short_diff = check_short_first_year(workdir, args.chunk_rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{ticker}: {rows} dòng ({args.days} ngày, {args.interval})")
+    print("| Mode | Seconds | Peak RSS (MB) |")
+    print("|:-----|--------:|--------------:|")
+    for label, (seconds, rss_mb, _) in results.items():
+        print(f"| {label} | {seconds:.1f} | {rss_mb:.0f} |")
+    print(f"Độ lệch lớn nhất của đặc trưng: {max_diff:.3g}; nhãn Outlier trùng {outlier_agreement:.2%} "
+          f"(IsolationForest học trên mẫu khi dữ liệu lớn hơn sample_rows)")
+    (mem_rows, mem_first), (chunk_rows, chunk_first) = short_shapes
+    print(f"Năm đầu ngắn: in-memory {mem_rows} dòng từ {mem_first}, chunked {chunk_rows} dòng từ {chunk_first}, "
+          + (f"độ lệch lớn nhất {short_diff:.3g}" if short_diff is not None else "KHÁC NHAU"))
+    if short_diff is None or short_diff > 1e-9:
+        sys.exit(1)
@@ -0,0 +1,101 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import synthetic_data
+
+# So sánh thống kê mùa vụ (tháng x thứ) của Volume / Log Returns: groupby lại toàn bộ lịch sử
+# mỗi lần (như boxplot seaborn cũ) với khối tổng hợp seasonality_cube (dựng một lần, cập nhật
+# theo bar mới, tra cứu cả universe bằng cách gộp khối). Báo cáo thời gian và sai số phân vị.
+
+COLUMNS = ["Q05", "Q25", "Q50", "Q75", "Q95"]
+
+
+def groupby_stats(frames):
+    """
+    Thống kê mùa vụ chính xác bằng pandas trên dữ liệu đã nạp đủ (ticker -> DataFrame).
+    """
+    import seasonality_cube
+    rows = []
+    for df in frames.values():
+        local = df.index + seasonality_cube.EXCHANGE_UTC_OFFSET
+        rows.append(pd.DataFrame({"Volume": df["Volume"].astype(float),
+                                  "Log_Returns": np.log(df["Close"] / df["Close"].ffill().shift(1)),
+                                  "Month": local.month, "Weekday": local.weekday}))
+    data = pd.concat(rows)
+    result = {}
+    for measure in seasonality_cube.MEASURES:
+        grouped = data.groupby(["Month", "Weekday"])[measure]
+        result[measure] = grouped.quantile(list(seasonality_cube.QUANTILES)).unstack()
+        result[measure]["Mean"] = grouped.mean()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark khối mùa vụ so với groupby mỗi lần chạy.")
+    parser.add_argument("--tickers", type=int, default=200, help="Số ticker giả lập")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--new-days", type=int, default=1, help="Số ngày mới thêm vào mỗi ticker")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_season_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    cube_dir = os.path.join(workdir, "cubes")
+    try:
+        import market_store
+        import seasonality_cube
+        tickers = synthetic_data.write_universe(args.tickers, days=args.days, seed=0, end="2024-12-31")
+
+        started = time.perf_counter()
+        expected = groupby_stats({t: market_store.load_ohlcv(t, columns=["Close", "Volume"]) for t in tickers})
+        groupby_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for ticker in tickers:
+            seasonality_cube.update_ticker(ticker, root=cube_dir)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cube = seasonality_cube.universe_cube(tickers, root=cube_dir)
+        table = cube.to_frame("cell")
+        lookup_seconds = time.perf_counter() - started
+
+        # Thêm ngày giao dịch mới cho mọi ticker rồi cập nhật dần
+        for ticker in tickers:
+            df = synthetic_data.generate_ohlcv(ticker, end="2024-12-31", days=args.days + args.new_days,
+                                               seed=hash(ticker) % 1000)
+            df.index = df.index + pd.Timedelta(days=3 * args.new_days)
+            market_store.write_ohlcv(df.iloc[-args.new_days:], ticker)
+        started = time.perf_counter()
+        added = sum(seasonality_cube.update_ticker(ticker, root=cube_dir)[1] for ticker in tickers)
+        update_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.tickers} ticker x {args.days} ngày")
+    print("| Bước | Time (s) |\n|:--|--:|")
+    print(f"| groupby toàn bộ lịch sử (mỗi lần chạy) | {groupby_seconds:.2f} |")
+    print(f"| Dựng khối lần đầu | {build_seconds:.2f} |")
+    print(f"| Cập nhật {added} bar mới | {update_seconds:.2f} |")
+    print(f"| Tra cứu cả universe (gộp khối) | {lookup_seconds:.3f} |")
+    print("\nSai số tương đối lớn nhất của khối so với pandas (theo ô tháng x thứ):")
+    print("| Measure | " + " | ".join(COLUMNS) + " | Mean |\n|:--|" + "--:|" * (len(COLUMNS) + 1))
+    for measure, exact in expected.items():
+        got = table[table["Measure"] == measure].set_index(["Month", "Weekday"])
+        got.index = pd.MultiIndex.from_arrays([got.index.get_level_values(0),
+                                               [seasonality_cube.WEEKDAYS.index(d) for d in
+                                                got.index.get_level_values(1)]])
+        got = got.reindex(exact.index)
+        errors = [np.nanmax(np.abs(got[c].to_numpy() / exact[q].to_numpy() - 1))
+                  for c, q in zip(COLUMNS + ["Mean"], list(seasonality_cube.QUANTILES) + ["Mean"])]
+        print(f"| {measure} | " + " | ".join(f"{e:.1e}" for e in errors) + " |")
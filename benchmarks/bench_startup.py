@@ -0,0 +1,93 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Đo thời gian khởi động của CLI và kiểm tra mỗi lệnh con chỉ nạp thư viện nặng
+# mà stage của nó cần. Trả về mã lỗi 1 nếu vượt ngân sách thời gian hoặc có
+# import thừa, để dùng làm bước chặn hồi quy.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(BASE_DIR, "main.py")
+
+HEAVY = ("pandas", "numpy", "sklearn", "xgboost", "matplotlib", "seaborn", "mplfinance", "scipy", "yfinance")
+
+# Thư viện nặng mà mỗi lệnh được phép nạp
+ALLOWED = {
+    "--help": (),
+    "collect": ("pandas", "numpy", "yfinance"),
+    "stats": ("pandas", "numpy"),
+    "preprocess": ("pandas", "numpy", "sklearn", "scipy", "matplotlib"),
+    "eda": ("pandas", "numpy", "scipy", "matplotlib", "seaborn", "mplfinance"),
+    "model": ("pandas", "numpy", "sklearn", "scipy", "matplotlib", "xgboost"),
+    "predict": ("pandas", "numpy", "xgboost"),
+    "backtest": ("pandas", "numpy"),
+    "tune": ("pandas", "numpy"),
+    "serve": ("pandas", "numpy", "xgboost"),
+    "corr": ("pandas", "numpy"),
+    "seasonality": ("pandas", "numpy"),
+    "report": ("pandas", "numpy", "matplotlib"),
+}
+
+# Nạp main.py rồi import đúng các module mà handler của lệnh con import (không chạy stage),
+# sau đó in ra các package cấp cao nhất đã có trong sys.modules
+PROBE = """
+import dis, runpy, sys
+main = runpy.run_path({main!r}, run_name="probe")
+if sys.argv[1:]:
+    args = main["build_parser"]().parse_args(sys.argv[1:])
+    for ins in dis.get_instructions(args.handler):
+        if ins.opname == "IMPORT_NAME":
+            __import__(ins.argval)
+print(" ".join(sorted({{name.split('.')[0] for name in sys.modules}})))
+"""
+
+
+def time_command(argv, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + argv, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def loaded_modules(command):
+    argv = [] if command == "--help" else [command]
+    out = subprocess.run([sys.executable, "-c", PROBE.format(main=MAIN)] + argv,
+                         check=True, capture_output=True, text=True).stdout
+    return set(out.split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động CLI.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="Ngân sách thời gian (median) cho 'python main.py --help'")
+    args = parser.parse_args()
+
+    failures = []
+    baseline = time_command(["-c", "pass"], args.runs)
+    help_time = time_command([MAIN, "--help"], args.runs)
+    print(f"python -c pass      : {baseline * 1000:.0f} ms")
+    print(f"python main.py --help: {help_time * 1000:.0f} ms (ngân sách {args.budget_ms:.0f} ms)")
+    if help_time * 1000 > args.budget_ms:
+        failures.append(f"--help mất {help_time * 1000:.0f} ms > {args.budget_ms:.0f} ms")
+
+    print("\n| Command | Heavy modules loaded |")
+    print("|:--------|:---------------------|")
+    for command, allowed in ALLOWED.items():
+        heavy = sorted(m for m in loaded_modules(command) if m in HEAVY)
+        print(f"| {command} | {', '.join(heavy) or '-'} |")
+        extra = [m for m in heavy if m not in allowed]
+        if extra:
+            failures.append(f"'{command}' nạp thừa: {', '.join(extra)}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\nOK")
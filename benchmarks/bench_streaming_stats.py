@@ -0,0 +1,70 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add src to python path to facilitate imports
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+import synthetic_data
+
+# So sánh thống kê mô tả cả universe: cách cũ (nạp từng ticker, mỗi chỉ số một lượt pandas,
+# rồi ghép toàn bộ dữ liệu để tính số liệu universe) với một lượt quét + gộp trạng thái
+# (descriptive_stats.calculate_universe_stats). Báo cáo thời gian và sai lệch so với pandas.
+
+STATS = ("mean", "median", "std", "min", "max", "skew", "kurt")
+
+
+def pandas_stats(tickers, columns):
+    import market_store
+    frames = [market_store.load_ohlcv(t, columns=columns) for t in tickers]
+    per_ticker = [{stat: getattr(df[col], stat)() for stat in STATS} for df in frames for col in columns]
+    universe = pd.concat(frames)
+    return per_ticker, {col: {stat: getattr(universe[col], stat)() for stat in STATS} for col in columns}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark thống kê mô tả một lượt, gộp được.")
+    parser.add_argument("--tickers", type=int, default=200, help="Số ticker giả lập")
+    parser.add_argument("--days", type=int, default=1250, help="Số ngày giao dịch mỗi ticker")
+    parser.add_argument("--jobs", type=int, default=None, help="Số tiến trình quét song song")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_stats_")
+    os.environ["STOCK_STORE_DIR"] = os.path.join(workdir, "store")
+    try:
+        import contextlib
+        import descriptive_stats
+        tickers = synthetic_data.write_universe(args.tickers, days=args.days, seed=0, end="2024-12-31")
+        columns = descriptive_stats.STATS_COLUMNS
+
+        started = time.perf_counter()
+        _, expected = pandas_stats(tickers, columns)
+        pandas_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = descriptive_stats.calculate_universe_stats(tickers, jobs=args.jobs, output_dir=workdir)
+        stream_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    universe = result[result["Ticker"] == "UNIVERSE"].set_index("Variable")
+    names = {"mean": "Mean (Trung bình)", "median": "Median (Trung vị)", "std": "Std (Độ lệch chuẩn)",
+             "min": "Min (Nhỏ nhất)", "max": "Max (Lớn nhất)", "skew": "Skewness (Độ lệch)",
+             "kurt": "Kurtosis (Độ nhọn)"}
+    print(f"{args.tickers} ticker x {args.days} ngày")
+    print(f"| Cách tính | Thời gian (s) |\n|:--|--:|\n| pandas, mỗi chỉ số một lượt | {pandas_seconds:.2f} |"
+          f"\n| Một lượt + gộp trạng thái | {stream_seconds:.2f} |")
+    print("\nSai lệch tương đối của số liệu universe so với pandas:")
+    print("| Variable | " + " | ".join(STATS) + " |")
+    print("|:--|" + "--:|" * len(STATS))
+    for col in columns:
+        errors = [abs(universe.loc[col, names[stat]] / expected[col][stat] - 1) for stat in STATS]
+        print(f"| {col} | " + " | ".join(f"{e:.1e}" for e in errors) + " |")
@@ -1,49 +1,392 @@
 import sys
 import os
+import argparse
+import time
 
 # Add src to python path to facilitate imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-import collect_data
-import analyze_data
-import descriptive_stats
-import preprocess_data
-import eda_analysis
-import modeling
+# Chỉ import thư viện chuẩn ở đây: mỗi lệnh con tự import module của stage nó cần
+# (pandas, xgboost, matplotlib... chỉ được nạp khi thực sự chạy stage đó).
+from pipeline import Stage, run_pipeline
 
-def main():
-    print("===========================================")
-    print("   STOCK ANALYSIS PIPELINE                 ")
-    print("===========================================")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+OUTLIER_METHODS = ("isolation_forest", "robust_z")
+COMMANDS = ("run", "collect", "stats", "preprocess", "eda", "model", "predict", "backtest", "tune", "serve", "corr", "seasonality", "report")
+
+
+def build_stages(ticker="FPT.VN", incremental_model=False, compact=False, outlier_method="isolation_forest"):
+    """
+    Khai báo các phase của pipeline cùng đầu vào/đầu ra để bộ chạy DAG có thể bỏ qua phase không đổi.
+    """
+    # Giống market_store.store_dir() nhưng không cần import numpy/pandas
+    store_root = os.environ.get("STOCK_STORE_DIR") or os.path.join(BASE_DIR, "data", "store")
+    store = os.path.join(store_root, f"ticker={ticker}")
+    processed = os.path.join(BASE_DIR, "data", "processed")
+    results = os.path.join(BASE_DIR, "results")
+    figures = os.path.join(results, "figures")
+    # Khóa stage chỉ băm module chính: các module src mà stage dùng được khai báo như đầu vào
+    src = lambda *names: [os.path.join(BASE_DIR, "src", f"{name}.py") for name in names]
+
+    return [
+        # Phase 1: Data Collection
+        Stage("collect", "collect_data:collect_stock_data", "[Phase 1] Data Collection",
+              params={"ticker": ticker, "incremental": True},
+              outputs=[store], always_run=True),
+        Stage("analyze", "analyze_data:analyze_and_describe_variables", "[Phase 1] Variable Description",
+              params={"ticker": ticker}, inputs=[store] + src("market_store"), deps=["collect"]),
+
+        # Phase 2: Descriptive Statistics
+        Stage("stats", "descriptive_stats:calculate_descriptive_stats", "[Phase 2] Descriptive Statistics",
+              params={"ticker": ticker}, inputs=[store] + src("market_store", "streaming_stats"), deps=["collect"]),
 
-    # Phase 1: Data Collection
-    print("\n--- [Phase 1] Data Collection ---")
-    collect_data.collect_stock_data(ticker="FPT.VN")
-    analyze_data.analyze_and_describe_variables()
+        # Phase 3: Data Preprocessing
+        # This generates preprocessed_data.csv, train_data.csv, test_data.csv and outliers.png
+        Stage("preprocess", "preprocess_data:preprocess_stock_data", "[Phase 3] Data Preprocessing",
+              params={"ticker": ticker, "compact": compact, "outlier_method": outlier_method},
+              inputs=[store] + src("technical_indicators", "market_store", "streaming_preprocess", "anomaly_detector",
+                                   "compact_dtypes", "figure_renderer"),
+              deps=["collect"],
+              outputs=[os.path.join(processed, name) for name in
+                       ("preprocessed_data.csv", "train_data.csv", "test_data.csv", "scaling_params.json")]
+                      + [os.path.join(figures, "outliers.png")]),
 
-    # Phase 2: Descriptive Statistics
-    print("\n--- [Phase 2] Descriptive Statistics ---")
-    descriptive_stats.calculate_descriptive_stats()
+        # Phase 4: EDA & Visualization (chạy song song với Phase 5)
+        Stage("eda", "eda_analysis:run_eda_analysis", "[Phase 4] EDA & Visualization",
+              params={"ticker": ticker},
+              inputs=[store, os.path.join(processed, "preprocessed_data.csv")]
+                     + src("market_store", "seasonality_cube", "streaming_stats", "figure_renderer"),
+              deps=["preprocess"],
+              outputs=[os.path.join(figures, name) for name in
+                       ("trend_analysis.png", "distribution_analysis.png",
+                        "correlation_heatmap.png", "seasonality_analysis.png")]),
 
-    # Phase 3: Data Preprocessing
-    print("\n--- [Phase 3] Data Preprocessing ---")
-    # This generates preprocessed_data.csv, train_data.csv, test_data.csv
-    # and outliers.png in results/figures (via updated script)
-    preprocess_data.preprocess_stock_data()
+        # Phase 5: Modeling
+        # This generates model_comparison.png, feature_importance.png in results/figures
+        Stage("model", "modeling:run_modeling", "[Phase 5] Modeling",
+              params={"ticker": ticker, "incremental": incremental_model, "compact": compact},
+              inputs=[os.path.join(processed, name) for name in ("preprocessed_data.csv", "scaling_params.json")]
+                     + src("feature_store", "model_registry", "compact_dtypes", "streaming_preprocess")
+                     # Tham số đã tìm bằng 'tune' (thiếu file thì băm là None)
+                     + [os.path.join(BASE_DIR, "models", "xgboost_params.json")],
+              deps=["preprocess"],
+              outputs=[os.path.join(results, "metrics.csv"), os.path.join(results, "predictions.csv"),
+                       os.path.join(figures, "feature_importance.png"),
+                       os.path.join(figures, "model_comparison.png"), os.path.join(BASE_DIR, "models")]),
+    ]
 
-    # Phase 4: EDA & Visualization
-    print("\n--- [Phase 4] EDA & Visualization ---")
-    # This generates png files in results/figures
-    eda_analysis.run_eda_analysis()
 
-    # Phase 5: Modeling
-    print("\n--- [Phase 5] Modeling ---")
-    # This generates model_comparison.png, feature_importance.png in results/figures
-    modeling.run_modeling()
+def run_universe_mode(tickers, only=None, jobs=None, batch_size=1, memory_limit_mb=None, incremental_model=False,
+                      compact=False, outlier_method="isolation_forest"):
+    """
+    Chạy pipeline cho cả universe: tải dữ liệu song song rồi chia tiền xử lý, EDA
+    và modeling theo ticker trên process pool.
+    """
+    import collect_data
+    import universe
+
+    steps = only or ["collect"] + list(universe.STEPS)
+    if "collect" in steps:
+        print("\n--- [Universe] Data Collection ---")
+        collect_data.collect_universe(tickers, incremental=True)
+
+    fan_out = [step for step in universe.STEPS if step in steps]
+    if not fan_out:
+        return {}
+    print(f"\n--- [Universe] {', '.join(fan_out)} cho {len(tickers)} ticker ---")
+    summary = universe.run_universe(tickers, steps=fan_out, max_workers=jobs, batch_size=batch_size,
+                                    memory_limit_mb=memory_limit_mb, incremental_model=incremental_model,
+                                    compact=compact, outlier_method=outlier_method)
+    return {"universe": "failed" if (summary["status"] != "ok").any() else "done"}
+
+
+def export_metrics(metrics_dir, ticker, status):
+    """
+    Ghi thời gian, peak RSS và thông lượng của từng stage ra JSON và định dạng Prometheus.
+    """
+    import instrumentation
+    instrumentation.print_summary()
+    if not instrumentation.records():
+        return
+    instrumentation.to_json(os.path.join(metrics_dir, "pipeline_metrics.json"),
+                            extra={"ticker": ticker, "status": status,
+                                   "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    instrumentation.to_prometheus(os.path.join(metrics_dir, "pipeline_metrics.prom"), labels={"ticker": ticker})
+    print(f"   - Saved metrics to '{metrics_dir}' (pipeline_metrics.json, pipeline_metrics.prom)")
+
+
+def _read_tickers(args):
+    tickers = []
+    if args.tickers:
+        tickers += [t.strip() for t in args.tickers.split(",") if t.strip()]
+    if args.tickers_file:
+        with open(args.tickers_file, "r") as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return list(dict.fromkeys(tickers))
+
+
+def cmd_run(args):
+    print("===========================================")
+    print("   STOCK ANALYSIS PIPELINE                 ")
+    print("===========================================")
+
+    only = [name.strip() for name in args.only.split(",")] if args.only else None
+    tickers = _read_tickers(args)
+    if tickers:
+        status = run_universe_mode(tickers, only=only, jobs=args.jobs, batch_size=args.batch_size,
+                                   memory_limit_mb=args.max_memory_mb, incremental_model=args.incremental,
+                                   compact=args.compact, outlier_method=args.outliers)
+    else:
+        status = run_pipeline(build_stages(args.ticker, args.incremental, args.compact, args.outliers), only=only,
+                              force=args.force, max_workers=args.jobs)
+        export_metrics(args.metrics_dir, args.ticker, status)
 
     print("\n===========================================")
+    for name, result in status.items():
+        print(f"   {name:<12}{result}")
+    if "failed" in status.values():
+        print("   PIPELINE FINISHED WITH ERRORS           ")
+        print("===========================================")
+        return 1
     print("   PIPELINE COMPLETED SUCCESSFULLY         ")
     print("===========================================")
+    return 0
+
+
+def cmd_collect(args):
+    import collect_data
+    collect_data.collect_stock_data(ticker=args.ticker, period=args.period, incremental=not args.full)
+    return 0
+
+
+def cmd_stats(args):
+    import descriptive_stats
+    tickers = _read_tickers(args)
+    if tickers:
+        # Thống kê cả universe: mỗi ticker quét một lần, trạng thái được gộp lại
+        return 0 if descriptive_stats.calculate_universe_stats(tickers, jobs=args.jobs) is not None else 1
+    import analyze_data
+    analyze_data.analyze_and_describe_variables(ticker=args.ticker)
+    descriptive_stats.calculate_descriptive_stats(ticker=args.ticker)
+    return 0
+
+
+def cmd_preprocess(args):
+    import preprocess_data
+    result = preprocess_data.preprocess_stock_data(ticker=args.ticker, chunk_rows=args.chunk_rows,
+                                                   compact=args.compact, outlier_method=args.outliers)
+    return 0 if result is not None else 1
+
+
+def cmd_eda(args):
+    import eda_analysis
+    status = eda_analysis.run_eda_analysis(ticker=args.ticker, render_workers=args.jobs, force=args.force)
+    return 0 if status is not None else 1
+
+
+def cmd_model(args):
+    import modeling
+    tickers = _read_tickers(args)
+    if tickers:
+        # Mô hình chung cho cả universe trên dữ liệu đã tiền xử lý trong universe/<ticker>/
+        sources = {t: os.path.join(BASE_DIR, "universe", t, "data", "processed") for t in tickers}
+        return 0 if modeling.run_global_modeling(sources, compare=not args.no_compare,
+                                                 compact=args.compact) is not None else 1
+    extra_features = [f.strip() for f in (args.extra_features or "").split(",") if f.strip()]
+    modeling.run_modeling(incremental=args.incremental, compact=args.compact, ticker=args.ticker,
+                          extra_features=extra_features)
+    return 0
+
+
+def cmd_predict(args):
+    import predict
+    result = predict.predict_latest(ticker=args.ticker, model_name=args.model, rows=args.rows,
+                                    version=args.version)
+    return 0 if result is not None else 1
+
+
+def cmd_backtest(args):
+    import backtest
+    tickers = _read_tickers(args)
+    if tickers:
+        # Chế độ universe: dùng dữ liệu đã tiền xử lý trong universe/<ticker>/
+        sources = {t: os.path.join(BASE_DIR, "universe", t, "data", "processed") for t in tickers}
+    else:
+        sources = {args.ticker: os.path.join(BASE_DIR, "data", "processed")}
+    result = backtest.run_backtest(sources, train_days=args.train_days, retrain_every=args.retrain_every,
+                                   window=args.window, models=args.models.split(","), max_workers=args.jobs)
+    return 0 if result is not None else 1
+
+
+def cmd_corr(args):
+    import correlation_engine
+    tickers = _read_tickers(args)
+    if len(tickers) < 2:
+        print("Lỗi: Cần ít nhất 2 ticker (--tickers hoặc --tickers-file).")
+        return 1
+    result = correlation_engine.run_correlation(tickers, window=args.window, step=args.step, top=args.top,
+                                                block_size=args.block_size, max_workers=args.jobs)
+    return 0 if result is not None else 1
+
+
+def cmd_seasonality(args):
+    import seasonality_cube
+    tickers = _read_tickers(args) or [args.ticker]
+    result = seasonality_cube.run_seasonality(tickers, jobs=args.jobs, rebuild=args.rebuild)
+    return 0 if result is not None else 1
+
+
+def cmd_tune(args):
+    import hyperparameter_search
+    best = hyperparameter_search.run_search(method=args.method, n_trials=args.trials, n_splits=args.folds,
+                                            max_workers=args.jobs, study=args.study, seed=args.seed)
+    return 0 if best is not None else 1
+
+
+def cmd_serve(args):
+    import prediction_server
+    ok = prediction_server.run_server(host=args.host, port=args.port, max_batch=args.max_batch,
+                                      max_wait_ms=args.max_wait_ms)
+    return 0 if ok else 1
+
+
+def cmd_report(args):
+    import dashboard
+    dashboard.create_dashboard(ticker=args.ticker)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Stock analysis pipeline")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run = subparsers.add_parser("run", help="Chạy toàn bộ pipeline (mặc định)")
+    run.add_argument("--ticker", default="FPT.VN")
+    run.add_argument("--only", help="Chỉ chạy các stage này (phân tách bằng dấu phẩy), ví dụ: eda,model")
+    run.add_argument("--force", action="store_true", help="Chạy lại kể cả khi đầu vào không đổi")
+    run.add_argument("--jobs", type=int, default=None, help="Số tiến trình chạy song song")
+    run.add_argument("--metrics-dir", default=os.path.join(BASE_DIR, "results"),
+                     help="Thư mục ghi pipeline_metrics.json / pipeline_metrics.prom")
+    run.add_argument("--incremental", action="store_true",
+                     help="Cập nhật XGBoost từ mô hình đã lưu thay vì fit lại toàn bộ")
+    run.add_argument("--compact", action="store_true", help="Kiểu dữ liệu gọn: đặc trưng float32, Outlier int8")
+    run.add_argument("--outliers", default="isolation_forest", choices=OUTLIER_METHODS,
+                     help="Phát hiện ngoại lai: IsolationForest hoặc robust z-score trực tuyến")
+    run.add_argument("--tickers", help="Chế độ universe: danh sách ticker phân tách bằng dấu phẩy")
+    run.add_argument("--tickers-file", help="Chế độ universe: file chứa mỗi dòng một ticker")
+    run.add_argument("--batch-size", type=int, default=1, help="Số ticker mỗi task (chế độ universe)")
+    run.add_argument("--max-memory-mb", type=int, default=None,
+                     help="Giới hạn bộ nhớ mỗi worker (chế độ universe)")
+    run.set_defaults(handler=cmd_run)
+
+    collect = subparsers.add_parser("collect", help="Tải dữ liệu vào kho (incremental)")
+    collect.add_argument("--ticker", default="FPT.VN")
+    collect.add_argument("--period", default="5y")
+    collect.add_argument("--full", action="store_true", help="Tải lại toàn bộ lịch sử")
+    collect.set_defaults(handler=cmd_collect)
+
+    predict = subparsers.add_parser("predict", help="Dự đoán bằng mô hình đã lưu (không huấn luyện lại)")
+    predict.add_argument("--ticker", default="FPT.VN")
+    predict.add_argument("--model", default="XGBoost", choices=["XGBoost", "LinearRegression", "XGBoostGlobal"])
+    predict.add_argument("--rows", type=int, default=1, help="Số bar mới nhất cần dự đoán")
+    predict.add_argument("--version", default=None, help="Phiên bản mô hình (mặc định: mới nhất)")
+    predict.set_defaults(handler=cmd_predict)
+
+    # Modeling đọc đặc trưng đã tiền xử lý qua kho đặc trưng data/features/<ticker>/
+    model = subparsers.add_parser("model", help="Huấn luyện và đánh giá mô hình")
+    model.add_argument("--ticker", default="FPT.VN", help="Tên ticker trong kho đặc trưng")
+    model.add_argument("--extra-features", default=None,
+                       help="Đặc trưng bổ sung tính khi cần, ví dụ Volatility_20,Momentum_5")
+    model.add_argument("--incremental", action="store_true",
+                       help="Cập nhật XGBoost từ mô hình đã lưu thay vì fit lại toàn bộ")
+    model.add_argument("--compact", action="store_true", help="Kiểu dữ liệu gọn: đặc trưng float32, Outlier int8")
+    model.add_argument("--tickers", help="Mô hình chung: danh sách ticker (dùng dữ liệu trong universe/<ticker>/)")
+    model.add_argument("--tickers-file", help="Mô hình chung: file chứa mỗi dòng một ticker")
+    model.add_argument("--no-compare", action="store_true",
+                       help="Mô hình chung: không huấn luyện mô hình riêng từng ticker để so sánh")
+    model.set_defaults(handler=cmd_model)
+
+    corr = subparsers.add_parser("corr", help="Tương quan log return giữa các ticker (ma trận, cửa sổ trượt, top-k)")
+    corr.add_argument("--tickers", help="Danh sách ticker phân tách bằng dấu phẩy")
+    corr.add_argument("--tickers-file", help="File chứa mỗi dòng một ticker")
+    corr.add_argument("--window", type=int, default=None, help="Cửa sổ trượt N ngày (mặc định: chỉ ma trận toàn kỳ)")
+    corr.add_argument("--step", type=int, default=20, help="Ghi ảnh chụp tương quan trượt mỗi N ngày")
+    corr.add_argument("--top", type=int, default=20, help="Số cặp tương quan cao nhất cần in")
+    corr.add_argument("--block-size", type=int, default=256, help="Số ticker mỗi khối tính")
+    corr.add_argument("--jobs", type=int, default=None, help="Số tiến trình chạy song song")
+    corr.set_defaults(handler=cmd_corr)
+
+    season = subparsers.add_parser("seasonality", help="Khối mùa vụ (tháng x thứ) của Volume / Log Returns")
+    season.add_argument("--ticker", default="FPT.VN")
+    season.add_argument("--tickers", help="Danh sách ticker phân tách bằng dấu phẩy")
+    season.add_argument("--tickers-file", help="File chứa mỗi dòng một ticker")
+    season.add_argument("--jobs", type=int, default=None, help="Số tiến trình chạy song song")
+    season.add_argument("--rebuild", action="store_true", help="Dựng lại khối từ toàn bộ lịch sử")
+    season.set_defaults(handler=cmd_seasonality)
+
+    bt = subparsers.add_parser("backtest", help="Walk-forward backtest (huấn luyện lại theo chu kỳ)")
+    bt.add_argument("--ticker", default="FPT.VN")
+    bt.add_argument("--tickers", help="Danh sách ticker (dùng dữ liệu trong universe/<ticker>/)")
+    bt.add_argument("--tickers-file", help="File chứa mỗi dòng một ticker")
+    bt.add_argument("--window", default="rolling", choices=["rolling", "expanding"])
+    bt.add_argument("--train-days", type=int, default=500, help="Độ dài cửa sổ train (dòng)")
+    bt.add_argument("--retrain-every", type=int, default=20, help="Huấn luyện lại sau mỗi N ngày")
+    bt.add_argument("--models", default="LinearRegression,XGBoost")
+    bt.add_argument("--jobs", type=int, default=None, help="Số tiến trình chạy song song")
+    bt.set_defaults(handler=cmd_backtest)
+
+    tune = subparsers.add_parser("tune", help="Tìm siêu tham số XGBoost (time-series CV, có thể tiếp tục)")
+    tune.add_argument("--method", default="halving", choices=["grid", "random", "halving"])
+    tune.add_argument("--trials", type=int, default=None, help="Số ứng viên (mặc định 8 x số worker)")
+    tune.add_argument("--folds", type=int, default=5)
+    tune.add_argument("--jobs", type=int, default=None, help="Số tiến trình (mặc định: số lõi CPU)")
+    tune.add_argument("--study", default=None, help="Tên study trong trials.sqlite (dùng để tiếp tục)")
+    tune.add_argument("--seed", type=int, default=42)
+    tune.set_defaults(handler=cmd_tune)
+
+    serve = subparsers.add_parser("serve", help="Chạy dịch vụ dự đoán HTTP cục bộ (micro-batching)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--max-batch", type=int, default=256, help="Số dòng tối đa mỗi lần predict")
+    serve.add_argument("--max-wait-ms", type=float, default=2.0, help="Thời gian chờ gom batch (ms)")
+    serve.set_defaults(handler=cmd_serve)
+
+    preprocess = subparsers.add_parser("preprocess", help="Tiền xử lý và tạo đặc trưng")
+    preprocess.add_argument("--ticker", default="FPT.VN")
+    preprocess.add_argument("--chunk-rows", type=int, default=None,
+                            help="Xử lý theo khối N dòng (out-of-core); train/test ghi thành khoảng chỉ số")
+    preprocess.add_argument("--compact", action="store_true", help="Kiểu dữ liệu gọn: đặc trưng float32, Outlier int8")
+    preprocess.add_argument("--outliers", default="isolation_forest", choices=OUTLIER_METHODS,
+                            help="Phát hiện ngoại lai: IsolationForest hoặc robust z-score trực tuyến")
+    preprocess.set_defaults(handler=cmd_preprocess)
+
+    stats = subparsers.add_parser("stats", help="Bảng mô tả biến và thống kê mô tả")
+    stats.add_argument("--ticker", default="FPT.VN")
+    stats.add_argument("--tickers", help="Thống kê cả universe: danh sách ticker phân tách bằng dấu phẩy")
+    stats.add_argument("--tickers-file", help="Thống kê cả universe: file chứa mỗi dòng một ticker")
+    stats.add_argument("--jobs", type=int, default=None, help="Số tiến trình chạy song song")
+    stats.set_defaults(handler=cmd_stats)
+
+    eda = subparsers.add_parser("eda", help="Vẽ biểu đồ EDA")
+    eda.add_argument("--ticker", default="FPT.VN")
+    eda.add_argument("--jobs", type=int, default=None, help="Số tiến trình vẽ song song (mặc định: số CPU)")
+    eda.add_argument("--force", action="store_true", help="Vẽ lại cả biểu đồ có dữ liệu đầu vào không đổi")
+    eda.set_defaults(handler=cmd_eda)
+
+    report = subparsers.add_parser("report", help="Tạo dashboard tổng hợp (results/figures/dashboard.png)")
+    report.add_argument("--ticker", default="FPT.VN")
+    report.set_defaults(handler=cmd_report)
+    return parser
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Giữ tương thích: "python main.py [--only ...]" tương đương "python main.py run [...]"
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "run")
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
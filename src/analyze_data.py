@@ -1,18 +1,15 @@
 import pandas as pd
+import market_store
 
-def analyze_and_describe_variables():
+def analyze_and_describe_variables(ticker="FPT.VN"):
     """
-    Đọc dữ liệu từ file CSV và chuẩn bị bảng mô tả biến (Bảng 1).
+    Đọc dữ liệu từ kho dữ liệu và chuẩn bị bảng mô tả biến (Bảng 1).
     """
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    filename = os.path.join(base_dir, "data", "raw", "stock_data.csv")
-    
-    if not os.path.exists(filename):
-        print(f"Lỗi: Không tìm thấy file {filename}")
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
         return
 
-    df = pd.read_csv(filename)
+    df = market_store.load_ohlcv(ticker).reset_index()
     
     print("\n--- Cấu trúc dữ liệu (Data Structure) ---")
     print(df.info())
@@ -0,0 +1,190 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Phát hiện ngoại lai trực tuyến bằng robust z-score (median / MAD trên cửa sổ trượt),
+# thay cho việc fit lại IsolationForest trên toàn bộ lịch sử mỗi lần chạy.
+# Mỗi bar mới được so với `window` bar trước đó của chính ticker (bar hiện tại không
+# làm lệch median của nó) trên hai tín hiệu: log return của Close và log(1 + Volume).
+# Điểm là max |z| của hai tín hiệu; vượt `threshold` thì gắn nhãn -1 như IsolationForest.
+# Trạng thái là bộ đệm vòng (ticker x window x tín hiệu), cập nhật một lần cho cả panel
+# mỗi ngày nên chi phí mỗi bar là O(window) và không phụ thuộc độ dài lịch sử.
+# Trạng thái lưu được (save_state / load_state) và ghép được theo ticker (merge).
+
+STATE_FILE = "anomaly_state.npz"
+SIGNALS = ("Log_Returns", "Log_Volume")
+WINDOW = 63
+THRESHOLD = 5.0
+MIN_PERIODS = 20
+# MAD * 1.4826 ước lượng độ lệch chuẩn khi phân phối chuẩn
+MAD_SCALE = 1.4826
+MIN_SCALE = 1e-8
+# Số ngày tính cùng lúc ở chế độ panel (giới hạn bộ nhớ của các cửa sổ trượt)
+BLOCK_DAYS = 256
+
+
+class RobustZState:
+    """
+    Trạng thái robust z-score của một panel ticker, cập nhật theo từng ngày.
+    """
+
+    def __init__(self, tickers, window=WINDOW, threshold=THRESHOLD, min_periods=MIN_PERIODS):
+        self.tickers = list(tickers)
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = min_periods
+        self.buffer = np.full((len(self.tickers), window, len(SIGNALS)), np.nan)
+        self.count = np.zeros(len(self.tickers), dtype=np.int64)
+        self.prev_close = np.full(len(self.tickers), np.nan)
+        self.last_date = None
+
+    def _signals(self, close, volume):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.stack([np.log(close / self.prev_close), np.log1p(volume)], axis=1)
+
+    def score(self, close, volume):
+        """
+        Điểm |z| lớn nhất của bar (close, volume) so với cửa sổ hiện tại, không cập nhật trạng thái.
+        """
+        return self._score(self._signals(np.asarray(close, dtype=np.float64),
+                                         np.asarray(volume, dtype=np.float64)))
+
+    def _score(self, x):
+        buffer = self.buffer
+        missing = np.isnan(buffer)
+        with warnings.catch_warnings():
+            # Ticker chưa có quan sát nào: nanmedian cảnh báo và trả NaN, điểm được đặt 0 bên dưới
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian if missing.any() else np.median
+            center = median(buffer, axis=1)
+            mad = median(np.abs(buffer - center[:, np.newaxis, :]), axis=1)
+        z = np.abs(x - center) / np.maximum(MAD_SCALE * mad, MIN_SCALE)
+        enough = (self.window - missing.sum(axis=1)) >= self.min_periods
+        z = np.where(enough & (z == z), z, 0.)
+        return z.max(axis=1)
+
+    def update(self, close, volume, date=None):
+        """
+        Hấp thụ một ngày cho cả panel (close/volume dài bằng số ticker, NaN = không có bar).
+        Trả về (điểm, nhãn) với nhãn -1 là ngoại lai, 1 là bình thường.
+        """
+        close = np.asarray(close, dtype=np.float64).reshape(len(self.tickers))
+        volume = np.asarray(volume, dtype=np.float64).reshape(len(self.tickers))
+        if date is not None:
+            date = pd.Timestamp(date)
+            if self.last_date is not None and date <= self.last_date:
+                raise ValueError(f"Ngày {date} không mới hơn ngày cuối {self.last_date}")
+            self.last_date = date
+
+        x = self._signals(close, volume)
+        observed = close == close
+        scores = np.where(observed, self._score(x), 0.)
+
+        rows = np.flatnonzero(observed)
+        self.buffer[rows, self.count[rows] % self.window] = x[rows]
+        self.count[rows] += 1
+        self.prev_close[rows] = close[rows]
+        return scores, np.where(scores > self.threshold, -1, 1)
+
+    def update_panel(self, close, volume, dates=None):
+        """
+        Hấp thụ lần lượt các ngày của panel (ticker x ngày). Trả về (điểm, nhãn) cùng kích thước.
+        Panel không có ô trống được tính một lượt bằng cửa sổ trượt, kết quả trùng với update từng ngày.
+        """
+        close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+        volume = np.atleast_2d(np.asarray(volume, dtype=np.float64))
+        if close.shape[1] and not np.isnan(close).any():
+            scores = self._update_block(close, volume)
+            if dates is not None:
+                self.last_date = pd.Timestamp(dates[-1])
+            return scores, np.where(scores > self.threshold, -1, 1)
+        scores = np.zeros(close.shape)
+        for t in range(close.shape[1]):
+            scores[:, t], _ = self.update(close[:, t], volume[:, t], None if dates is None else dates[t])
+        return scores, np.where(scores > self.threshold, -1, 1)
+
+    def _update_block(self, close, volume, block_days=BLOCK_DAYS):
+        n_tickers, n_days = close.shape
+        window = self.window
+        previous = np.concatenate([self.prev_close[:, np.newaxis], close[:, :-1]], axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.stack([np.log(close / previous), np.log1p(volume)], axis=2)
+        # Bộ đệm vòng theo thứ tự thời gian (cũ nhất trước), nối với các ngày mới
+        ring = (self.count[:, np.newaxis] + np.arange(window)) % window
+        history = np.take_along_axis(self.buffer, ring[:, :, np.newaxis], axis=1)
+        full = np.concatenate([history, x], axis=1)
+
+        scores = np.empty((n_tickers, n_days))
+        for lo in range(0, n_days, block_days):
+            hi = min(lo + block_days, n_days)
+            # Cửa sổ của ngày t là full[t : t + window] (window ngày ngay trước t): ticker x ngày x tín hiệu x window
+            windows = np.lib.stride_tricks.sliding_window_view(full[:, lo:hi + window - 1], window, axis=1)
+            missing = np.isnan(windows)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                median = np.nanmedian if missing.any() else np.median
+                center = median(windows, axis=3)
+                mad = median(np.abs(windows - center[..., np.newaxis]), axis=3)
+            z = np.abs(x[:, lo:hi] - center) / np.maximum(MAD_SCALE * mad, MIN_SCALE)
+            enough = (window - missing.sum(axis=3)) >= self.min_periods
+            scores[:, lo:hi] = np.where(enough & (z == z), z, 0.).max(axis=2)
+
+        self.count += n_days
+        ring = (self.count[:, np.newaxis] - window + np.arange(window)) % window
+        np.put_along_axis(self.buffer, ring[:, :, np.newaxis], full[:, -window:], axis=1)
+        self.prev_close = close[:, -1].copy()
+        return scores
+
+    def merge(self, other):
+        """
+        Ghép trạng thái của hai nhóm ticker rời nhau (ví dụ hai tiến trình) thành một panel.
+        """
+        if (self.window, self.threshold, self.min_periods) != (other.window, other.threshold, other.min_periods):
+            raise ValueError("Không ghép được trạng thái khác window/threshold/min_periods")
+        overlap = set(self.tickers) & set(other.tickers)
+        if overlap:
+            raise ValueError(f"Ticker bị trùng khi ghép trạng thái: {sorted(overlap)}")
+        merged = RobustZState(self.tickers + other.tickers, self.window, self.threshold, self.min_periods)
+        merged.buffer = np.concatenate([self.buffer, other.buffer])
+        merged.count = np.concatenate([self.count, other.count])
+        merged.prev_close = np.concatenate([self.prev_close, other.prev_close])
+        dates = [d for d in (self.last_date, other.last_date) if d is not None]
+        merged.last_date = max(dates) if dates else None
+        return merged
+
+
+def detect_frame(df, state=None, ticker="FPT.VN", **kwargs):
+    """
+    Nhãn ngoại lai (-1/1) cho DataFrame OHLCV của một ticker; tiếp tục từ state nếu có.
+    Trả về (Series nhãn, state).
+    """
+    state = state or RobustZState([ticker], **kwargs)
+    _, flags = state.update_panel(df['Close'].to_numpy(dtype=np.float64)[np.newaxis, :],
+                                  df['Volume'].to_numpy(dtype=np.float64)[np.newaxis, :])
+    if len(df):
+        state.last_date = pd.Timestamp(df.index[-1])
+    return pd.Series(flags[0], index=df.index, name='Outlier'), state
+
+
+def save_state(state, path):
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, tickers=np.array(state.tickers), buffer=state.buffer, count=state.count,
+                 prev_close=state.prev_close,
+                 params=np.array([state.window, state.threshold, state.min_periods], dtype=np.float64),
+                 last_date=np.array([-1 if state.last_date is None else state.last_date.value], dtype=np.int64))
+    # Ghi đè nguyên tử để không để lại trạng thái hỏng nếu bị ngắt giữa chừng
+    os.replace(path + ".tmp", path)
+
+
+def load_state(path):
+    with np.load(path) as data:
+        window, threshold, min_periods = data["params"]
+        state = RobustZState(data["tickers"].tolist(), int(window), float(threshold), int(min_periods))
+        state.buffer = data["buffer"]
+        state.count = data["count"]
+        state.prev_close = data["prev_close"]
+        last_date = int(data["last_date"][0])
+    state.last_date = None if last_date < 0 else pd.Timestamp(last_date)
+    return state
@@ -0,0 +1,203 @@
+import contextlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import worker_threads
+
+# Walk-forward backtest cho giai đoạn modeling: thay vì một lần chia 80/20, mô hình
+# được huấn luyện lại sau mỗi `retrain_every` ngày trên cửa sổ trượt (rolling) hoặc
+# mở rộng (expanding) và dự đoán đoạn kế tiếp. Đặc trưng của mọi ticker được ghi
+# một lần vào một file .npy và các worker mở nó bằng memmap, nên các fold chạy
+# song song đọc chung một ma trận mà không sao chép cho từng fold.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS = ("LinearRegression", "XGBoost")
+MODEL_LABELS = {"LinearRegression": "Linear Regression", "XGBoost": "XGBoost"}
+
+_features = None
+_target = None
+
+
+def make_folds(n_rows, train_days=500, retrain_every=20, window="rolling", min_train_days=None):
+    """
+    Sinh các fold (train_start, train_end, test_start, test_end) theo chỉ số dòng.
+    rolling: cửa sổ train dài cố định train_days; expanding: train từ dòng đầu tiên.
+    """
+    if window not in ("rolling", "expanding"):
+        raise ValueError(f"window phải là 'rolling' hoặc 'expanding', nhận được '{window}'")
+    min_train_days = min_train_days or train_days
+    folds = []
+    test_start = min_train_days
+    while test_start < n_rows:
+        test_end = min(test_start + retrain_every, n_rows)
+        train_start = 0 if window == "expanding" else max(0, test_start - train_days)
+        folds.append((train_start, test_start, test_start, test_end))
+        test_start = test_end
+    return folds
+
+
+def build_feature_matrix(sources, path):
+    """
+    Ghi đặc trưng (X) và Close (y) của các ticker nối tiếp nhau vào path (X) và path + ".target.npy".
+    sources: dict ticker -> thư mục data/processed. Trả về DataFrame vị trí của từng ticker.
+    """
+    frames = {}
+    for ticker, processed_dir in sources.items():
+        csv_path = os.path.join(processed_dir, "preprocessed_data.csv")
+        if not os.path.exists(csv_path):
+            print(f"Lỗi: Không tìm thấy {csv_path}, bỏ qua {ticker}")
+            continue
+        frames[ticker] = pd.read_csv(csv_path, index_col='Date', parse_dates=True)
+    if not frames:
+        return None
+
+    features = [c for c in next(iter(frames.values())).columns if c not in ['Close', 'Outlier']]
+    n_total = sum(len(df) for df in frames.values())
+    X = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n_total, len(features)))
+    y = np.lib.format.open_memmap(path + ".target.npy", mode="w+", dtype=np.float64, shape=(n_total,))
+
+    layout = []
+    offset = 0
+    for ticker, df in frames.items():
+        X[offset:offset + len(df)] = df[features].to_numpy()
+        y[offset:offset + len(df)] = df['Close'].to_numpy()
+        scaling = {}
+        params_path = os.path.join(sources[ticker], "scaling_params.json")
+        if os.path.exists(params_path):
+            with open(params_path, "r") as f:
+                scaling = json.load(f)
+        layout.append({"ticker": ticker, "offset": offset, "rows": len(df),
+                       "Close_min": scaling.get("Close_min"), "Close_max": scaling.get("Close_max"),
+                       "dates": df.index})
+        offset += len(df)
+    X.flush()
+    y.flush()
+    del X, y
+    return pd.DataFrame(layout), features
+
+
+def _init_worker(features_path):
+    global _features, _target
+    # Mỗi worker dùng 1 luồng, song song hóa nằm ở cấp fold
+    worker_threads.limit_worker_threads()
+    _features = np.load(features_path, mmap_mode="r")
+    _target = np.load(features_path + ".target.npy", mmap_mode="r")
+
+
+def _fit_predict(model_name, X_train, y_train, X_test, xgb_params):
+    if model_name == "LinearRegression":
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression()
+    else:
+        import xgboost as xgb
+        model = xgb.XGBRegressor(**xgb_params)
+    model.fit(X_train, y_train)
+    return model.predict(X_test)
+
+
+def run_fold(task):
+    """
+    Huấn luyện và đánh giá các mô hình trên một fold. Chạy trong worker (đọc memmap chung).
+    """
+    from modeling import evaluate_metrics
+    offset = task["offset"]
+    train = slice(offset + task["train_start"], offset + task["train_end"])
+    test = slice(offset + task["test_start"], offset + task["test_end"])
+    # Lát cắt của memmap là view, không sao chép dữ liệu
+    X_train, y_train = _features[train], _target[train]
+    X_test, y_test = _features[test], _target[test]
+
+    def inverse_scale(values):
+        if task["Close_min"] is None:
+            return values
+        return values * (task["Close_max"] - task["Close_min"]) + task["Close_min"]
+
+    y_true = inverse_scale(np.asarray(y_test))
+    rows = []
+    for model_name in task["models"]:
+        started = time.perf_counter()
+        y_pred = inverse_scale(_fit_predict(model_name, X_train, y_train, X_test, task["xgb_params"]))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = evaluate_metrics(y_true, y_pred, MODEL_LABELS[model_name])
+        metrics.update(ticker=task["ticker"], fold=task["fold"], train_rows=task["train_end"] - task["train_start"],
+                       test_rows=len(y_true), fit_seconds=time.perf_counter() - started)
+        rows.append(metrics)
+    return task["index"], rows
+
+
+def run_backtest(sources, train_days=500, retrain_every=20, window="rolling", models=MODELS,
+                 max_workers=None, xgb_params=None, output_dir=None):
+    """
+    Chạy walk-forward backtest cho các ticker (dict ticker -> thư mục data/processed).
+    Ghi results/backtest_folds.csv (mỗi fold một dòng/mô hình) và trả về DataFrame đó.
+    """
+    results_dir = os.path.join(output_dir or BASE_DIR, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    xgb_params = {"n_estimators": 1000, "learning_rate": 0.01, "objective": "reg:squarederror",
+                  "tree_method": "hist", "n_jobs": 1, **(xgb_params or {})}
+
+    started = time.perf_counter()
+    # Tên riêng cho mỗi lần chạy: các backtest đồng thời không ghi đè ma trận đặc trưng của nhau,
+    # và file (có thể vài GB) luôn được xóa kể cả khi lỗi
+    fd, features_path = tempfile.mkstemp(prefix=".backtest_features_", suffix=".npy", dir=results_dir)
+    os.close(fd)
+    try:
+        built = build_feature_matrix(sources, features_path)
+        if built is None:
+            print("Lỗi: Không có dữ liệu đã tiền xử lý để backtest.")
+            return
+        layout, features = built
+
+        tasks = []
+        for _, entry in layout.iterrows():
+            for fold, (train_start, train_end, test_start, test_end) in enumerate(
+                    make_folds(entry["rows"], train_days, retrain_every, window)):
+                tasks.append({"index": len(tasks), "ticker": entry["ticker"], "fold": fold, "offset": entry["offset"],
+                              "train_start": train_start, "train_end": train_end,
+                              "test_start": test_start, "test_end": test_end,
+                              "Close_min": entry["Close_min"], "Close_max": entry["Close_max"],
+                              "models": list(models), "xgb_params": xgb_params})
+        if not tasks:
+            print(f"Lỗi: Dữ liệu quá ngắn cho cửa sổ train {train_days} ngày.")
+            return
+        print(f"Backtest {window}: {len(layout)} ticker, {len(tasks)} fold, huấn luyện lại mỗi {retrain_every} ngày")
+
+        rows = []
+        with worker_threads.single_threaded_pool(), \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                    initargs=(features_path,)) as pool:
+            # Gửi nhiều fold mỗi lần để giảm chi phí giao tiếp giữa các tiến trình
+            chunksize = max(1, len(tasks) // ((max_workers or os.cpu_count() or 1) * 4))
+            for i, (index, fold_rows) in enumerate(pool.map(run_fold, tasks, chunksize=chunksize), 1):
+                task = tasks[index]
+                dates = layout.loc[layout["ticker"] == task["ticker"], "dates"].iloc[0]
+                for row in fold_rows:
+                    row.update(test_start=dates[task["test_start"]], test_end=dates[task["test_end"] - 1])
+                rows.extend(fold_rows)
+                if i % 100 == 0 or i == len(tasks):
+                    print(f"   [{i}/{len(tasks)}] fold xong ({time.perf_counter() - started:.1f}s)")
+
+        results = pd.DataFrame(rows, columns=["ticker", "fold", "test_start", "test_end", "train_rows", "test_rows",
+                                              "Model", "RMSE", "MAE", "R2", "MAPE", "fit_seconds"])
+        results.to_csv(os.path.join(results_dir, "backtest_folds.csv"), index=False)
+    finally:
+        for path in (features_path, features_path + ".target.npy"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    summary = results.groupby("Model")[["RMSE", "MAE", "R2", "MAPE"]].mean()
+    print("\n--- Walk-forward Summary (trung bình qua các fold) ---")
+    print(summary.to_markdown())
+    print(f"   - Saved per-fold metrics to '{os.path.join(results_dir, 'backtest_folds.csv')}' "
+          f"({time.perf_counter() - started:.1f}s)")
+    return results
+
+
+if __name__ == "__main__":
+    run_backtest({"FPT.VN": os.path.join(BASE_DIR, "data", "processed")})
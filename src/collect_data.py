@@ -1,32 +1,215 @@
-import yfinance as yf
 import pandas as pd
+import io
 import os
+import random
+import threading
+import time
+import http.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode, urlparse
+import market_store
 
-def collect_stock_data(ticker="FPT.VN", period="5y", interval="1d"):
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class YFinanceSource:
+    """
+    Nguồn dữ liệu mặc định: tải lịch sử giá từ yfinance.
+    """
+
+    def fetch(self, ticker, start=None, period="5y", interval="1d"):
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+
+class CSVFixtureSource:
+    """
+    Nguồn dữ liệu cục bộ đọc từ <directory>/<ticker>.csv (cùng định dạng file CSV cũ),
+    dùng thay yfinance khi chạy offline hoặc kiểm thử.
     """
-    Tải dữ liệu lịch sử giá cổ phiếu từ yfinance.
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start=None, period=None, interval="1d"):
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+        return _read_ohlcv_csv(path, start)
+
+
+class HTTPSource:
+    """
+    Nguồn dữ liệu HTTP trả về CSV (ví dụ mock_market_server). Mỗi luồng giữ
+    một kết nối keep-alive riêng để tái sử dụng giữa các request.
+    """
+
+    def __init__(self, base_url, timeout=10):
+        url = urlparse(base_url)
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path.rstrip('/') + '/history'
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def fetch(self, ticker, start=None, period="5y", interval="1d"):
+        params = {"ticker": ticker, "interval": interval}
+        if start is not None:
+            params["start"] = start
+        else:
+            params["period"] = period
+
+        conn = self._connection()
+        try:
+            conn.request("GET", f"{self.path}?{urlencode(params)}")
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # Kết nối hỏng: bỏ đi để lần thử sau mở kết nối mới
+            conn.close()
+            self._local.conn = None
+            raise
+
+        if response.status == 404:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        if response.status != 200:
+            raise IOError(f"HTTP {response.status} khi tải {ticker}")
+        return _read_ohlcv_csv(io.BytesIO(body), start)
+
+
+class RateLimiter:
     """
-    print(f"Đang tải dữ liệu cho {ticker}...")
-    stock = yf.Ticker(ticker)
-    df = stock.history(period=period, interval=interval)
-    
+    Giới hạn số request mỗi giây (token bucket), dùng chung giữa các luồng.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _read_ohlcv_csv(path_or_buffer, start=None):
+    df = pd.read_csv(path_or_buffer)
+    df['Date'] = pd.to_datetime(df['Date'], utc=True)
+    df.set_index('Date', inplace=True)
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start, tz="UTC")]
+    return df
+
+
+def collect_stock_data(ticker="FPT.VN", period="5y", interval="1d", source=None, incremental=False):
+    """
+    Tải dữ liệu lịch sử giá cổ phiếu và lưu vào kho dữ liệu.
+    Ở chế độ incremental chỉ tải phần dữ liệu sau bar cuối cùng đã lưu.
+    """
+    source = source or YFinanceSource()
+
+    start = None
+    if incremental and market_store.has_ticker(ticker):
+        # Tải lại từ bar cuối cùng (tính cả bar đó) để cập nhật bar có thể đã bị điều chỉnh
+        start = market_store.last_timestamp(ticker)
+
+    if start is not None:
+        print(f"Đang tải dữ liệu mới cho {ticker} từ {start.date()}...")
+        df = source.fetch(ticker, start=start.strftime('%Y-%m-%d'), interval=interval)
+    else:
+        print(f"Đang tải dữ liệu cho {ticker}...")
+        df = source.fetch(ticker, period=period, interval=interval)
+
     if df.empty:
+        if start is not None:
+            # Không có bar mới không phải lỗi: trả về khung rỗng (None chỉ khi tải thất bại)
+            print(f"Không có dữ liệu mới cho {ticker}.")
+            return df.reindex(columns=OHLCV_COLUMNS)
         print(f"Không tìm thấy dữ liệu cho {ticker}. Vui lòng kiểm tra lại ticker.")
         return None
-    
+
     # Chỉ giữ lại các cột cần thiết: Open, High, Low, Close, Volume
-    df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
-    
-    # Lưu vào file CSV
-    # Define paths relative to project root
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(base_dir, "data", "raw")
-    os.makedirs(data_dir, exist_ok=True)
-    
-    filename = os.path.join(data_dir, "stock_data.csv")
-    df.to_csv(filename)
-    print(f"Đã lưu dữ liệu vào {filename}")
+    df = df[OHLCV_COLUMNS]
+
+    if start is not None:
+        # Bỏ các bar cũ hơn bar cuối cùng đã lưu; bar trùng được ghi đè khi upsert
+        df = df[df.index >= pd.Timestamp(start, tz="UTC")]
+
+    # Lưu vào kho dữ liệu dạng cột (data/store/ticker=.../year=...)
+    rows = market_store.write_ohlcv(df, ticker)
+    print(f"Đã lưu {rows} dòng dữ liệu của {ticker} vào {market_store.store_dir()}")
     return df
 
+def collect_universe(tickers, period="5y", interval="1d", source=None, incremental=False,
+                     max_workers=8, rate_limit=None, max_retries=3, backoff=0.5):
+    """
+    Tải dữ liệu cho nhiều ticker song song (thread pool), có giới hạn tốc độ (request/giây),
+    retry với exponential backoff và báo cáo lỗi theo từng ticker.
+    """
+    source = source or YFinanceSource()
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    report = {"succeeded": {}, "failed": {}, "attempts": {}}
+
+    def fetch_one(ticker):
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                df = collect_stock_data(ticker, period=period, interval=interval,
+                                        source=source, incremental=incremental)
+                return attempt + 1, df
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                # Exponential backoff có jitter để các luồng không retry cùng lúc
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_one, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                attempts, df = future.result()
+            except Exception as e:
+                report["attempts"][ticker] = max_retries + 1
+                report["failed"][ticker] = f"{type(e).__name__}: {e}"
+                continue
+            report["attempts"][ticker] = attempts
+            # None là tải thất bại; không có bar mới thì collect_stock_data trả về khung rỗng
+            if df is None:
+                report["failed"][ticker] = "Không có dữ liệu"
+            else:
+                report["succeeded"][ticker] = len(df)
+    report["elapsed"] = time.perf_counter() - started
+
+    print(f"\n--- Tổng kết tải dữ liệu: {len(report['succeeded'])}/{len(tickers)} ticker thành công "
+          f"trong {report['elapsed']:.2f}s ---")
+    for ticker, error in sorted(report["failed"].items()):
+        print(f"   - {ticker}: {error} (sau {report['attempts'][ticker]} lần thử)")
+    return report
+
 if __name__ == "__main__":
     collect_stock_data()
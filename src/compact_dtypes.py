@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Chế độ kiểu dữ liệu gọn (compact) cho tiền xử lý và modeling:
+#   - đặc trưng float32 (XGBoost vốn huấn luyện trên float32 nên không phải sao chép/ép kiểu lại),
+#   - cờ (Outlier) int8,
+#   - index Date là datetime64[ns] (int64 epoch), parse theo ISO 8601 thay vì suy luận từng chuỗi,
+#   - mã ticker categorical (mảng mã int nhỏ thay vì chuỗi object).
+# Mặc định pipeline vẫn dùng float64 như trước; compact=True bật chế độ này.
+
+FEATURE_DTYPE = np.float32
+FLAG_DTYPE = np.int8
+FLAG_COLUMNS = ("Outlier",)
+CATEGORY_COLUMNS = ("Ticker",)
+
+
+def _target_dtype(col):
+    return FLAG_DTYPE if col in FLAG_COLUMNS else FEATURE_DTYPE
+
+
+def compact_frame(df):
+    """
+    Ép DataFrame đặc trưng sang kiểu gọn; các cột đã đúng kiểu không bị sao chép.
+    """
+    dtypes = {}
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                dtypes[col] = "category"
+        elif pd.api.types.is_numeric_dtype(df[col]) and df[col].dtype != _target_dtype(col):
+            dtypes[col] = _target_dtype(col)
+    if dtypes:
+        df = df.astype(dtypes)
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.dtype != "datetime64[ns]":
+        df.index = df.index.as_unit("ns")
+    return df
+
+
+def read_csv(source, compact=False, **kwargs):
+    """
+    Đọc CSV đặc trưng có cột Date làm index. compact=True: parse thẳng ra float32/int8 và
+    index datetime64[ns] theo định dạng ISO 8601.
+    """
+    if not compact:
+        return pd.read_csv(source, index_col='Date', parse_dates=True, **kwargs)
+    dtype = defaultdict(lambda: FEATURE_DTYPE, {"Date": object, **{col: FLAG_DTYPE for col in FLAG_COLUMNS}})
+    df = pd.read_csv(source, dtype=dtype, **kwargs)
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('Date'), format="ISO8601"), name='Date').as_unit("ns")
+    return df
+
+
+def frame_nbytes(df):
+    """
+    Bộ nhớ thực của DataFrame (kể cả index và chuỗi object), tính bằng byte.
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
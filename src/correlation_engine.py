@@ -0,0 +1,323 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import worker_threads
+
+# Tương quan log return giữa các ticker cho universe lớn (1000+ mã):
+#   - toàn bộ ma trận: chia ticker thành các khối block_size, mỗi cặp khối (I, J) là một task
+#     trên process pool, tính bằng vài phép nhân ma trận và ghi thẳng vào ma trận float32
+#     memmap (results/correlation/corr.npy). Ngày thiếu của từng ticker được bỏ qua theo cặp
+#     (pairwise complete) như DataFrame.corr();
+#   - cửa sổ trượt: mỗi worker giữ các tổng theo cặp (n, Σx, Σy, Σx², Σy², Σxy) của một khối dòng
+#     và cập nhật hạng 1 khi thêm / bỏ một ngày (hạng k cho k ngày giữa hai ảnh chụp), không tính
+#     lại cả cửa sổ; cứ `refresh` ngày tính lại chính xác để sai số cộng dồn không tăng.
+#     Ảnh chụp mỗi `step` ngày ghi vào rolling_corr.npy;
+#   - top_pairs: k cặp tương quan cao nhất, quét ma trận memmap theo khối dòng.
+# Dữ liệu đầu vào (return đã trừ trung bình, NaN -> 0, và mặt nạ quan sát) được ghi một lần
+# ra .npy (ticker x ngày) để các worker mở bằng memmap thay vì nhận bản sao.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOCK_SIZE = 256
+MIN_PERIODS = 20
+ROLLING_STEP = 20
+REFRESH_DAYS = 250
+
+_returns = None
+_mask = None
+
+
+def _init_worker(returns_path, mask_path):
+    global _returns, _mask
+    # Mỗi worker dùng 1 luồng, song song hóa nằm ở cấp khối
+    worker_threads.limit_worker_threads()
+    _returns = np.load(returns_path, mmap_mode="r")
+    _mask = np.load(mask_path, mmap_mode="r")
+
+
+def load_returns(tickers, start=None, end=None, root=None):
+    """
+    Log return ngày (Date x ticker) từ kho; ngày ticker chưa niêm yết / thiếu dữ liệu là NaN.
+    """
+    import market_store
+    close = market_store.load_panel(tickers, "Close", start=start, end=end, root=root)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.log(close / close.shift(1))
+    return returns.iloc[1:]
+
+
+def _prepare(returns, workdir):
+    values = np.asarray(returns, dtype=np.float64)
+    observed = ~np.isnan(values)
+    # Trừ trung bình từng cột trước khi cộng dồn để các tổng không bị triệt tiêu số
+    counts = observed.sum(axis=0)
+    center = np.where(counts > 0, np.where(observed, values, 0.).sum(axis=0) / np.maximum(counts, 1), 0.)
+    centered = np.where(observed, values - center, 0.)
+    returns_path = os.path.join(workdir, ".corr_returns.npy")
+    mask_path = os.path.join(workdir, ".corr_mask.npy")
+    # Lưu dạng ticker x ngày để khối ticker là các dòng liên tiếp
+    np.save(returns_path, np.ascontiguousarray(centered.T))
+    np.save(mask_path, np.ascontiguousarray(observed.T.astype(np.float64)))
+    return returns_path, mask_path
+
+
+def _pairwise(n, sx, sy, sxx, syy, sxy, min_periods):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        corr = cov / np.sqrt(var_x * var_y)
+    valid = (n >= min_periods) & (var_x > 0) & (var_y > 0)
+    return np.where(valid, np.clip(corr, -1., 1.), np.nan)
+
+
+def _block_corr(x_i, m_i, x_j, m_j, min_periods):
+    # Tổng theo cặp chỉ trên các ngày cả hai ticker đều có dữ liệu
+    n = m_i @ m_j.T
+    sx = x_i @ m_j.T
+    sy = m_i @ x_j.T
+    sxx = (x_i * x_i) @ m_j.T
+    syy = m_i @ (x_j * x_j).T
+    sxy = x_i @ x_j.T
+    return _pairwise(n, sx, sy, sxx, syy, sxy, min_periods)
+
+
+def _corr_block_task(task):
+    i0, i1, j0, j1 = task["rows"] + task["cols"]
+    corr = _block_corr(_returns[i0:i1], _mask[i0:i1], _returns[j0:j1], _mask[j0:j1], task["min_periods"])
+    if i0 == j0:
+        np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.))
+    out = np.load(task["output"], mmap_mode="r+")
+    out[i0:i1, j0:j1] = corr
+    out[j0:j1, i0:i1] = corr.T
+    out.flush()
+    return task["rows"], task["cols"]
+
+
+def _blocks(n, block_size):
+    return [(lo, min(lo + block_size, n)) for lo in range(0, n, block_size)]
+
+
+def correlation_matrix(returns, output_path, block_size=BLOCK_SIZE, min_periods=MIN_PERIODS, max_workers=None):
+    """
+    Ma trận tương quan (ticker x ticker) float32 ghi vào output_path (.npy, mở lại bằng memmap).
+    """
+    workdir = os.path.dirname(os.path.abspath(output_path))
+    n = returns.shape[1]
+    returns_path, mask_path = _prepare(returns, workdir)
+    out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(n, n))
+    del out
+    blocks = _blocks(n, block_size)
+    tasks = [{"rows": rows, "cols": cols, "min_periods": min_periods, "output": output_path}
+             for a, rows in enumerate(blocks) for cols in blocks[a:]]
+    try:
+        with worker_threads.single_threaded_pool(), \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                    initargs=(returns_path, mask_path)) as pool:
+            list(pool.map(_corr_block_task, tasks))
+    finally:
+        os.remove(returns_path)
+        os.remove(mask_path)
+    return np.load(output_path, mmap_mode="r")
+
+
+class RollingCorrelation:
+    """
+    Tương quan trượt `window` ngày giữa một khối dòng (rows) và mọi ticker, cập nhật hạng 1:
+    add() thêm một ngày và tự bỏ ngày cũ nhất khi cửa sổ đầy.
+    """
+
+    def __init__(self, n_tickers, window, rows=None, min_periods=MIN_PERIODS):
+        self.window = window
+        self.min_periods = min_periods
+        self.rows = slice(*(rows or (0, n_tickers)))
+        size = self.rows.stop - self.rows.start
+        self.n = np.zeros((size, n_tickers))
+        self.sx = np.zeros((size, n_tickers))
+        self.sxx = np.zeros((size, n_tickers))
+        self.sxy = np.zeros((size, n_tickers))
+        # Σy, Σy² theo cặp cần cả cột của khối: giữ cho mọi ticker x khối
+        self.sy = np.zeros((size, n_tickers))
+        self.syy = np.zeros((size, n_tickers))
+        self.days = deque()
+
+    def _apply(self, x, m, sign):
+        # x, m: (ngày x ticker); một ngày là cập nhật hạng 1, k ngày là hạng k (một phép nhân ma trận)
+        x_i, m_i = x[:, self.rows], m[:, self.rows]
+        self.n += sign * (m_i.T @ m)
+        self.sx += sign * (x_i.T @ m)
+        self.sxx += sign * ((x_i * x_i).T @ m)
+        self.sy += sign * (m_i.T @ x)
+        self.syy += sign * (m_i.T @ (x * x))
+        self.sxy += sign * (x_i.T @ x)
+
+    def add(self, x, m=None):
+        """
+        Thêm một ngày: x là return (NaN = không có dữ liệu) hoặc return đã làm sạch kèm mặt nạ m.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        self.add_days(x[np.newaxis, :], None if m is None else np.asarray(m, dtype=np.float64)[np.newaxis, :])
+
+    def add_days(self, x, m=None):
+        """
+        Thêm lần lượt k ngày (k x ticker) và bỏ các ngày rời cửa sổ, gộp thành hai cập nhật hạng k.
+        """
+        if m is None:
+            m = (x == x).astype(np.float64)
+            x = np.where(m > 0, x, 0.)
+        self.days.extend(zip(x, m))
+        self._apply(x, m, 1.)
+        evict = max(len(self.days) - self.window, 0)
+        if evict:
+            old = [self.days.popleft() for _ in range(evict)]
+            self._apply(np.array([day[0] for day in old]), np.array([day[1] for day in old]), -1.)
+
+    def recompute(self):
+        """
+        Tính lại chính xác các tổng từ các ngày trong cửa sổ (xóa sai số cộng dồn).
+        """
+        x = np.array([day[0] for day in self.days])
+        m = np.array([day[1] for day in self.days])
+        x_i, m_i = x[:, self.rows], m[:, self.rows]
+        self.n = m_i.T @ m
+        self.sx = x_i.T @ m
+        self.sxx = (x_i * x_i).T @ m
+        self.sy = m_i.T @ x
+        self.syy = m_i.T @ (x * x)
+        self.sxy = x_i.T @ x
+
+    def matrix(self):
+        return _pairwise(self.n, self.sx, self.sy, self.sxx, self.syy, self.sxy, self.min_periods)
+
+
+def _rolling_block_task(task):
+    i0, i1 = task["rows"]
+    window, step, refresh = task["window"], task["step"], task["refresh"]
+    n_tickers, n_days = _returns.shape
+    rolling = RollingCorrelation(n_tickers, window, rows=(i0, i1), min_periods=task["min_periods"])
+    out = np.load(task["output"], mmap_mode="r+")
+    # Các ngày giữa hai ảnh chụp được thêm/bỏ cùng lúc; cứ khoảng `refresh` ngày thì tính lại chính xác
+    snapshots = rolling_snapshot_days(n_days, window, step)
+    position, since_refresh = 0, 0
+    diagonal = np.arange(i1 - i0)
+    for k, day in enumerate(snapshots):
+        rolling.add_days(np.array(_returns[:, position:day + 1].T), np.array(_mask[:, position:day + 1].T))
+        since_refresh += day + 1 - position
+        position = day + 1
+        if since_refresh >= refresh:
+            rolling.recompute()
+            since_refresh = 0
+        corr = rolling.matrix()
+        corr[diagonal, diagonal + i0] = np.where(np.isnan(corr[diagonal, diagonal + i0]), np.nan, 1.)
+        out[k, i0:i1] = corr
+    out.flush()
+    return task["rows"]
+
+
+def rolling_snapshot_days(n_days, window, step=ROLLING_STEP):
+    """
+    Chỉ số ngày (cuối cửa sổ) của các ảnh chụp tương quan trượt.
+    """
+    return np.arange(window - 1, n_days, step)
+
+
+def rolling_correlation(returns, output_path, window, step=ROLLING_STEP, refresh=REFRESH_DAYS,
+                        block_size=BLOCK_SIZE, min_periods=MIN_PERIODS, max_workers=None):
+    """
+    Ảnh chụp ma trận tương quan trượt mỗi `step` ngày: float32 (ảnh chụp x ticker x ticker) tại output_path.
+    """
+    workdir = os.path.dirname(os.path.abspath(output_path))
+    n_days, n = returns.shape
+    snapshots = rolling_snapshot_days(n_days, window, step)
+    returns_path, mask_path = _prepare(returns, workdir)
+    out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(len(snapshots), n, n))
+    del out
+    tasks = [{"rows": rows, "window": window, "step": step, "refresh": refresh, "min_periods": min_periods,
+              "output": output_path} for rows in _blocks(n, block_size)]
+    try:
+        with worker_threads.single_threaded_pool(), \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                    initargs=(returns_path, mask_path)) as pool:
+            list(pool.map(_rolling_block_task, tasks))
+    finally:
+        os.remove(returns_path)
+        os.remove(mask_path)
+    return np.load(output_path, mmap_mode="r"), snapshots
+
+
+def top_pairs(corr, tickers, k=20, absolute=False, block_rows=1024):
+    """
+    k cặp ticker (i < j) có tương quan lớn nhất (hoặc |tương quan| nếu absolute), quét theo khối dòng.
+    """
+    n = corr.shape[0]
+    best_scores, best_rows, best_cols = np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    for i0, i1 in _blocks(n, block_rows):
+        block = np.array(corr[i0:i1], dtype=np.float64)
+        rows, cols = np.indices(block.shape)
+        rows += i0
+        score = np.abs(block) if absolute else block
+        score = np.where((cols > rows) & ~np.isnan(score), score, -np.inf).ravel()
+        take = min(k, len(score))
+        top = np.argpartition(score, -take)[-take:] if take else np.empty(0, dtype=np.int64)
+        top = top[np.isfinite(score[top])]
+        best_scores = np.concatenate([best_scores, score[top]])
+        best_rows = np.concatenate([best_rows, rows.ravel()[top]])
+        best_cols = np.concatenate([best_cols, cols.ravel()[top]])
+        if len(best_scores) > k:
+            keep = np.argpartition(best_scores, -k)[-k:]
+            best_scores, best_rows, best_cols = best_scores[keep], best_rows[keep], best_cols[keep]
+    order = np.argsort(-best_scores, kind="stable")
+    rows, cols = best_rows[order], best_cols[order]
+    return pd.DataFrame({"Ticker_1": [tickers[i] for i in rows], "Ticker_2": [tickers[j] for j in cols],
+                         "Correlation": [float(corr[i, j]) for i, j in zip(rows, cols)]})
+
+
+def run_correlation(tickers, output_dir=None, window=None, step=ROLLING_STEP, top=20, block_size=BLOCK_SIZE,
+                    min_periods=MIN_PERIODS, max_workers=None, start=None, end=None):
+    """
+    Tương quan log return cho cả universe: ma trận đầy đủ, (tùy chọn) cửa sổ trượt và top-k cặp.
+    Kết quả ghi vào results/correlation/.
+    """
+    base_dir = output_dir or BASE_DIR
+    out_dir = os.path.join(base_dir, "results", "correlation")
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    returns = load_returns(tickers, start=start, end=end)
+    present = [t for t in returns.columns if returns[t].notna().any()]
+    if len(present) < 2:
+        print("Lỗi: Cần ít nhất 2 ticker có dữ liệu trong kho để tính tương quan.")
+        return
+    returns = returns[present]
+    print(f"Tương quan log return: {len(present)} ticker x {len(returns)} ngày, khối {block_size}")
+    with open(os.path.join(out_dir, "tickers.json"), "w") as f:
+        json.dump({"tickers": present, "start": str(returns.index[0]), "end": str(returns.index[-1])}, f)
+
+    corr = correlation_matrix(returns, os.path.join(out_dir, "corr.npy"), block_size=block_size,
+                              min_periods=min_periods, max_workers=max_workers)
+    print(f"1. Đã ghi ma trận {corr.shape[0]}x{corr.shape[1]} float32 vào corr.npy "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    pairs = top_pairs(corr, present, k=top)
+    pairs.to_csv(os.path.join(out_dir, "top_pairs.csv"), index=False)
+    print(f"\n--- Top {len(pairs)} cặp tương quan cao nhất ---")
+    print(pairs.to_markdown(index=False))
+
+    result = {"corr": corr, "tickers": present, "top_pairs": pairs}
+    if window:
+        rolling_started = time.perf_counter()
+        rolling, snapshots = rolling_correlation(returns, os.path.join(out_dir, "rolling_corr.npy"), window,
+                                                 step=step, block_size=block_size, min_periods=min_periods,
+                                                 max_workers=max_workers)
+        np.save(os.path.join(out_dir, "rolling_dates.npy"),
+                returns.index[snapshots].as_unit("ns").asi8)
+        print(f"2. Đã ghi {len(snapshots)} ảnh chụp tương quan {window} ngày (mỗi {step} ngày) vào "
+              f"rolling_corr.npy ({time.perf_counter() - rolling_started:.1f}s)")
+        result.update(rolling=rolling, rolling_dates=returns.index[snapshots])
+    print(f"   - Saved results to '{out_dir}'")
+    return result
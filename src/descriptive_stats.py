@@ -1,48 +1,43 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
+import market_store
+import streaming_stats
 
-def calculate_descriptive_stats():
+# Thống kê được tính trong một lượt đọc theo khối từ kho (streaming_stats): mean/std/skew/kurtosis
+# khớp pandas, median lấy từ sketch phân vị (sai số tương đối RELATIVE_ACCURACY).
+STATS_COLUMNS = ["Close", "Volume"]
+CHUNK_ROWS = 100_000
+
+
+def scan_ticker(ticker="FPT.VN", columns=STATS_COLUMNS, chunk_rows=CHUNK_ROWS):
     """
-    Tính toán các chỉ số thống kê mô tả cho Close và Volume.
+    Trạng thái thống kê (gộp được) của một ticker sau một lượt đọc theo khối.
     """
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    filename = os.path.join(base_dir, "data", "raw", "stock_data.csv")
+    state = streaming_stats.StatsState(columns)
+    for chunk in market_store.iter_ohlcv(ticker, chunk_rows=chunk_rows, columns=columns):
+        state.update(chunk)
+    return state
 
-    if not os.path.exists(filename):
-        print(f"Lỗi: Không tìm thấy file {filename}")
+
+def calculate_descriptive_stats(ticker="FPT.VN"):
+    """
+    Tính toán các chỉ số thống kê mô tả cho Close và Volume.
+    """
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
         return
 
-    df = pd.read_csv(filename)
-    
-    # Chọn các biến cần thiết
-    cols = ["Close", "Volume"]
-    
-    stats_list = []
-    
-    for col in cols:
-        series = df[col]
-        stats = {
-            "Variable": col,
-            "Mean (Trung bình)": series.mean(),
-            "Median (Trung vị)": series.median(),
-            "Std (Độ lệch chuẩn)": series.std(),
-            "Min (Nhỏ nhất)": series.min(),
-            "Max (Lớn nhất)": series.max(),
-            "Skewness (Độ lệch)": series.skew(),
-            "Kurtosis (Độ nhọn)": series.kurtosis()
-        }
-        stats_list.append(stats)
-    
-    stats_df = pd.DataFrame(stats_list)
-    
+    # Chọn các biến cần thiết (chỉ đọc 2 cột này từ kho), mọi chỉ số trong một lượt
+    stats_df = scan_ticker(ticker).to_frame().drop(columns="Count")
+
     print("\n--- Thống kê mô tả (Descriptive Statistics) ---")
     print(stats_df.to_markdown(index=False))
-    
+
     # Phân tích điểm nhấn (Std)
     close_std = stats_df.loc[stats_df["Variable"] == "Close", "Std (Độ lệch chuẩn)"].values[0]
     volume_std = stats_df.loc[stats_df["Variable"] == "Volume", "Std (Độ lệch chuẩn)"].values[0]
-    
+
     print("\n--- Điểm nhấn phân tích ---")
     print(f"1. Độ lệch chuẩn của giá Close là {close_std:.2f}. ")
     print(f"   - Nếu giá trị này cao so với mức giá trung bình, điều đó cho thấy cổ phiếu có mức độ biến động lớn (High Volatility), đồng nghĩa với rủi ro cao hơn cho nhà đầu tư.")
@@ -50,5 +45,40 @@ def calculate_descriptive_stats():
 
     return stats_df
 
+
+def calculate_universe_stats(tickers, jobs=None, output_dir=None):
+    """
+    Thống kê mô tả từng ticker và của cả universe (gộp trạng thái, không đọc lại dữ liệu).
+    Mỗi ticker được quét một lần trên process pool; ghi results/universe_stats.csv.
+    """
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    available = [t for t in tickers if market_store.has_ticker(t)]
+    missing = sorted(set(tickers) - set(available))
+    if missing:
+        print(f"Warning: Bỏ qua {len(missing)} ticker không có trong kho: {', '.join(missing[:10])}")
+    if not available:
+        print(f"Lỗi: Không có ticker nào trong {market_store.store_dir()}")
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        states = dict(zip(available, pool.map(scan_ticker, available)))
+
+    universe = None
+    frames = []
+    for ticker, state in states.items():
+        universe = state if universe is None else universe.merge(state)
+        frames.append(state.to_frame().assign(Ticker=ticker))
+    frames.append(universe.to_frame().assign(Ticker="UNIVERSE"))
+    stats_df = pd.concat(frames, ignore_index=True)
+    stats_df = stats_df[["Ticker"] + [c for c in stats_df.columns if c != "Ticker"]]
+
+    print(f"\n--- Thống kê mô tả cả universe ({len(states)} ticker) ---")
+    print(stats_df[stats_df["Ticker"] == "UNIVERSE"].to_markdown(index=False))
+    path = os.path.join(base_dir, "results", "universe_stats.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stats_df.to_csv(path, index=False)
+    print(f"   - Saved '{path}'")
+    return stats_df
+
 if __name__ == "__main__":
     calculate_descriptive_stats()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Giảm số điểm của chuỗi thời gian trước khi gửi lên biểu đồ (dashboard): trình duyệt chỉ cần
+# khoảng vài nghìn điểm cho một đường, còn lịch sử nến phút nhiều năm có hàng triệu điểm.
+#   - min-max: mỗi bucket giữ điểm thấp nhất và cao nhất (theo thứ tự thời gian), không mất đỉnh/đáy;
+#   - LTTB (Largest-Triangle-Three-Buckets): mỗi bucket giữ điểm tạo tam giác lớn nhất với điểm đã
+#     chọn ở bucket trước và trung bình bucket sau, giữ hình dạng đường tốt với đúng n điểm.
+# Chỉ dùng numpy/pandas để import nhẹ và dùng lại được ngoài Streamlit.
+
+METHODS = ("lttb", "minmax")
+
+
+def minmax_indices(y, n_out):
+    """
+    Chỉ số (tăng dần) của điểm nhỏ nhất và lớn nhất trong mỗi bucket: khoảng n_out điểm,
+    cộng thêm điểm đầu và cuối.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    buckets = max(n_out // 2, 1)
+    # Bucket b gồm các chỉ số [starts[b], starts[b + 1]), kích thước chênh nhau tối đa 1
+    starts = (np.arange(buckets) * n + buckets - 1) // buckets
+    sizes = np.diff(np.r_[starts, n])
+    picked = [[0, n - 1]]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), sizes)
+        # Vị trí đầu tiên trong mỗi bucket đạt giá trị min / max
+        hits = np.flatnonzero(y == extreme)
+        bucket = np.searchsorted(starts, hits, side="right")
+        picked.append(hits[np.r_[True, bucket[1:] != bucket[:-1]]])
+    return np.unique(np.concatenate(picked))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Chỉ số (tăng dần) của n_out điểm chọn bằng LTTB; điểm đầu và cuối luôn được giữ.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 bucket giữa điểm đầu và điểm cuối
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(series, n_out, method="lttb"):
+    """
+    Series (index thời gian hoặc số) còn tối đa n_out điểm; NaN bị bỏ trước khi chọn.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method phải là một trong {METHODS}")
+    series = series.dropna()
+    if len(series) <= n_out:
+        return series
+    y = series.to_numpy(dtype=np.float64)
+    if method == "minmax":
+        return series.iloc[minmax_indices(y, n_out)]
+    index = series.index
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb_indices(x, y, n_out)]
+
+
+def downsample_frame(frame, n_out, method="lttb"):
+    """
+    Giảm điểm từng cột độc lập (mỗi cột một trace): dict tên cột -> Series.
+    """
+    return {col: downsample(frame[col], n_out, method) for col in frame.columns}
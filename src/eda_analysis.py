@@ -1,32 +1,157 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import mplfinance as mpf
 import os
+import figure_renderer
+import market_store
+import seasonality_cube
 
-def run_eda_analysis(input_file="preprocessed_data.csv", raw_data="stock_data.csv"):
+# Mỗi biểu đồ là một hàm vẽ nhận đúng lát dữ liệu nó cần và trả về Figure; run_eda_analysis
+# chỉ dựng các job rồi giao cho figure_renderer (vẽ song song, bỏ qua biểu đồ có đầu vào không đổi).
+# matplotlib / seaborn / mplfinance chỉ được import khi thực sự phải vẽ.
+
+CORR_COLS = ['Close', 'Volume', 'Log_Returns', 'RSI_14', 'MACD_12_26_9', 'SMA_7', 'SMA_30']
+
+
+def render_trend(ohlcv, ticker):
+    """
+    Trend Analysis (Candlestick + MA + Volume).
+    """
+    import mplfinance as mpf
+    # Tạo style cho mplfinance
+    mc = mpf.make_marketcolors(up='g', down='r', inherit=True)
+    s = mpf.make_mpf_style(marketcolors=mc)
+
+    fig, axes = mpf.plot(ohlcv, type='candle', style=s,
+             mav=(30), # Moving Average 30 ngày
+             volume=True,
+             title=f'Trend Analysis: {ticker} Stock Price (Last 1 Year)',
+             ylabel='Price ($)',
+             ylabel_lower='Volume',
+             figsize=(12, 8),
+             returnfig=True)
+    return fig
+
+
+def render_distribution(log_returns):
+    """
+    Distribution Analysis (Histogram + KDE cho Log Returns, so với phân phối chuẩn).
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from scipy.stats import norm
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(log_returns, kde=True, stat="density", linewidth=0, ax=ax)
+    ax.set_title('Distribution of Log Returns (Fat Tails Analysis)')
+    ax.set_xlabel('Log Returns')
+    ax.set_ylabel('Density')
+    ax.grid(True, alpha=0.3)
+
+    # Thêm đường chuẩn (Normal Distribution) để so sánh
+    mu, std = norm.fit(log_returns)
+    xmin, xmax = ax.get_xlim()
+    x = np.linspace(xmin, xmax, 100)
+    ax.plot(x, norm.pdf(x, mu, std), 'k', linewidth=2, label='Normal Distribution')
+    ax.legend()
+    return fig
+
+
+def render_heatmap(corr_matrix, ticker):
+    """
+    Correlation Heatmap giữa các biến quan trọng.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5, ax=ax)
+    ax.set_title(f"{ticker} Price Trend with MA30", fontsize=16)
+    return fig
+
+
+def render_seasonality(by_month, by_weekday):
+    """
+    Seasonality Analysis: hộp Volume theo Tháng và theo Ngày trong tuần, vẽ từ thống kê của khối
+    mùa vụ (hộp Q25-Q75, trung vị, râu Q05-Q95, dấu trung bình) thay vì tính lại từ dữ liệu gốc.
+    """
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    for ax, stats, label, cmap, title in ((axes[0], by_month, 'Month', "viridis", 'Volume Distribution by Month'),
+                                          (axes[1], by_weekday, 'Weekday', "magma",
+                                           'Volume Distribution by Day of Week')):
+        boxes = [{"label": str(row[label]), "whislo": row["Q05"], "q1": row["Q25"], "med": row["Q50"],
+                  "q3": row["Q75"], "whishi": row["Q95"], "mean": row["Mean"], "fliers": []}
+                 for row in stats.to_dict("records")]
+        artists = ax.bxp(boxes, showmeans=True, showfliers=False, patch_artist=True,
+                         meanprops={"marker": "D", "markerfacecolor": "white", "markeredgecolor": "black"})
+        colors = plt.get_cmap(cmap)(np.linspace(0.15, 0.85, max(len(boxes), 1)))
+        for patch, color in zip(artists["boxes"], colors):
+            patch.set_facecolor(color)
+        ax.set_title(title)
+        ax.set_xlabel('Month' if label == 'Month' else 'Day of Week')
+        ax.set_ylabel('Volume')
+
+    fig.tight_layout()
+    return fig
+
+
+def volume_stats(cube, by):
+    """
+    Thống kê hộp của Volume theo tháng hoặc theo thứ, tra từ khối mùa vụ (chỉ các nhóm có dữ liệu).
+    """
+    stats = cube.to_frame(by)
+    return stats[stats["Measure"] == "Volume"].drop(columns="Measure").reset_index(drop=True)
+
+
+def eda_jobs(df_pre, df_raw, ticker, results_dir, cube=None):
+    """
+    Dựng các job biểu đồ EDA từ dữ liệu đã tiền xử lý (df_pre) và dữ liệu gốc (df_raw).
+    cube: khối mùa vụ của ticker (seasonality_cube); mặc định dựng từ df_raw.
+    """
+    if cube is None:
+        cube = seasonality_cube.SeasonalityCube().update(df_raw)
+    # Lấy dữ liệu 1 năm gần nhất để vẽ nến cho rõ
+    df_last_year = df_raw.iloc[-252:]
+    # Log Returns dùng bản đã tính sẵn trong preprocessed
+    log_returns = df_pre['Log_Returns'].dropna()
+    # Chỉ các biến quan trọng có trong df_pre
+    available_cols = [c for c in CORR_COLS if c in df_pre.columns]
+
+    path = lambda name: os.path.join(results_dir, name)
+    return [
+        figure_renderer.figure_job("eda_analysis:render_trend", path('trend_analysis.png'),
+                                   title="Trend Analysis (Candlestick Chart)", ohlcv=df_last_year, ticker=ticker),
+        figure_renderer.figure_job("eda_analysis:render_distribution", path('distribution_analysis.png'),
+                                   title="Distribution Analysis (Histogram + KDE)", log_returns=log_returns),
+        figure_renderer.figure_job("eda_analysis:render_heatmap", path('correlation_heatmap.png'),
+                                   title="Correlation Heatmap", corr_matrix=df_pre[available_cols].corr(),
+                                   ticker=ticker),
+        figure_renderer.figure_job("eda_analysis:render_seasonality", path('seasonality_analysis.png'),
+                                   title="Seasonality Analysis", by_month=volume_stats(cube, "month"),
+                                   by_weekday=volume_stats(cube, "weekday")),
+    ]
+
+
+def run_eda_analysis(input_file="preprocessed_data.csv", ticker="FPT.VN", output_dir=None, render_workers=None,
+                     force=False):
     """
     Thực hiện phân tích EDA và vẽ biểu đồ.
+    render_workers: số tiến trình vẽ (1 = vẽ tuần tự trong tiến trình hiện tại).
+    force: vẽ lại cả những biểu đồ có dữ liệu đầu vào không đổi.
     """
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_raw_dir = os.path.join(base_dir, "data", "raw")
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_processed_dir = os.path.join(base_dir, "data", "processed")
     results_dir = os.path.join(base_dir, "results", "figures")
+    os.makedirs(results_dir, exist_ok=True)
 
     # Override defaults with correct paths if not specified or if defaults are filenames
     if input_file == "preprocessed_data.csv":
          input_file = os.path.join(data_processed_dir, "preprocessed_data.csv")
-    if raw_data == "stock_data.csv":
-         raw_data = os.path.join(data_raw_dir, "stock_data.csv")
 
     if not os.path.exists(input_file):
         print(f"Lỗi: Không tìm thấy file {input_file}")
         return
-    
-    if not os.path.exists(raw_data):
-        print(f"Lỗi: Không tìm thấy file {raw_data}")
+
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
         return
 
     # Load preprocessed and raw data
@@ -36,106 +161,23 @@ def run_eda_analysis(input_file="preprocessed_data.csv", raw_data="stock_data.cs
     df_pre.set_index('Date', inplace=True)
     df_pre.index = df_pre.index.tz_convert(None)
 
-    df_raw = pd.read_csv(raw_data)
-    df_raw['Date'] = pd.to_datetime(df_raw['Date'], utc=True)
-    df_raw.set_index('Date', inplace=True)
-    df_raw.index = df_raw.index.tz_convert(None)
-    df_raw.sort_index(inplace=True)
-
-    # 1. Trend Analysis (Candlestick + MA + Volume)
-    print("1. Drawing Trend Analysis (Candlestick Chart)...")
-    # Lấy dữ liệu 1 năm gần nhất để vẽ cho rõ
-    df_last_year = df_raw.iloc[-252:] 
-    
-    # Tạo style cho mplfinance
-    mc = mpf.make_marketcolors(up='g', down='r', inherit=True)
-    s = mpf.make_mpf_style(marketcolors=mc)
-    
-    # Vẽ biểu đồ
-    fig, axes = mpf.plot(df_last_year, type='candle', style=s,
-             mav=(30), # Moving Average 30 ngày
-             volume=True, 
-             title='Trend Analysis: AAPL Stock Price (Last 1 Year)',
-             ylabel='Price ($)',
-             ylabel_lower='Volume',
-             figsize=(12, 8),
-             returnfig=True)
-    fig.savefig(os.path.join(results_dir, 'trend_analysis.png'))
-    plt.close(fig)
-    print("   - Saved 'trend_analysis.png'")
-
-    # 2. Distribution Analysis (Histogram + KDE for Log Returns)
-    print("2. Drawing Distribution Analysis (Histogram + KDE)...")
-    plt.figure(figsize=(10, 6))
-    
-    # Tính lại Log Returns từ raw data để chính xác hơn cho visual (hoặc dùng preprocessed)
-    # Ở đây dùng preprocessed vì đã tính sẵn
-    log_returns = df_pre['Log_Returns'].dropna()
+    df_raw = market_store.load_ohlcv(ticker)
+    # Khối mùa vụ chỉ gộp thêm các bar mới kể từ lần chạy trước
+    cube, added = seasonality_cube.update_ticker(ticker, root=os.path.join(base_dir, "data", "seasonality"))
+    print(f"Seasonality cube: +{added} bar ({cube.rows} bar)")
+
+    jobs = eda_jobs(df_pre, df_raw, ticker, results_dir, cube=cube)
+    print(f"Rendering {len(jobs)} figures (Agg)...")
+    status = figure_renderer.render_figures(jobs, max_workers=render_workers, force=force)
+    for i, job in enumerate(jobs, 1):
+        name = os.path.basename(job["path"])
+        if status[job["path"]] == "skipped":
+            print(f"{i}. {job['title']}: dữ liệu không đổi, giữ '{name}'")
+        else:
+            print(f"{i}. {job['title']}\n   - Saved '{name}'")
 
-    sns.histplot(log_returns, kde=True, stat="density", linewidth=0)
-    plt.title('Distribution of Log Returns (Fat Tails Analysis)')
-    plt.xlabel('Log Returns')
-    plt.ylabel('Density')
-    plt.grid(True, alpha=0.3)
-    
-    # Thêm đường chuẩn (Normal Distribution) để so sánh
-    from scipy.stats import norm
-    mu, std = norm.fit(log_returns)
-    xmin, xmax = plt.xlim()
-    x = np.linspace(xmin, xmax, 100)
-    p = norm.pdf(x, mu, std)
-    plt.plot(x, p, 'k', linewidth=2, label='Normal Distribution')
-    plt.legend()
-    
-    plt.savefig(os.path.join(results_dir, 'distribution_analysis.png'))
-    plt.close()
-    print("   - Saved 'distribution_analysis.png'")
-
-    # 3. Correlation Analysis (Heatmap)
-    print("3. Drawing Correlation Heatmap...")
-    plt.figure(figsize=(10, 8))
-    
-    # Chọn các biến quan trọng để tương quan
-    corr_cols = ['Close', 'Volume', 'Log_Returns', 'RSI_14', 'MACD_12_26_9', 'SMA_7', 'SMA_30']
-    # Kiểm tra xem các cột có trong df_pre không
-    available_cols = [c for c in corr_cols if c in df_pre.columns]
-    
-    corr_matrix = df_pre[available_cols].corr()
-    
-    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
-    plt.title("FPT.VN Price Trend with MA30", fontsize=16)
-    plt.savefig(os.path.join(results_dir, 'correlation_heatmap.png'))
-    plt.close()
-    print("   - Saved 'correlation_heatmap.png'")
-
-    # 4. Seasonality Analysis (Boxplot)
-    print("4. Drawing Seasonality Analysis...")
-    df_raw['Month'] = df_raw.index.month
-    df_raw['DayOfWeek'] = df_raw.index.day_name()
-    
-    # Sắp xếp thứ tự ngày trong tuần
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    
-    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
-    
-    # Boxplot theo Tháng (Volume)
-    sns.boxplot(x='Month', y='Volume', data=df_raw, ax=axes[0], palette="viridis")
-    axes[0].set_title('Volume Distribution by Month')
-    axes[0].set_xlabel('Month')
-    axes[0].set_ylabel('Volume')
-    
-    # Boxplot theo Ngày trong tuần (Volume)
-    sns.boxplot(x='DayOfWeek', y='Volume', data=df_raw, ax=axes[1], order=days_order, palette="magma")
-    axes[1].set_title('Volume Distribution by Day of Week')
-    axes[1].set_xlabel('Day of Week')
-    axes[1].set_ylabel('Volume')
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_dir, 'seasonality_analysis.png'))
-    plt.close()
-    print("   - Saved 'seasonality_analysis.png'")
-    
     print("EDA Analysis Completed.")
+    return status
 
 if __name__ == "__main__":
     run_eda_analysis()
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import compact_dtypes
+from pipeline import FileHasher
+
+# Kho đặc trưng có phiên bản, dùng chung cho mọi mô hình:
+#   data/features/<ticker>/v0001/{meta.json, features.npy, Close.npy, Outlier.npy, index.npy, extra/<tên>.npy}
+# features.npy là ma trận C-order (dòng x đặc trưng mô hình) lấy từ preprocessed_data.csv; mở
+# bằng memmap nên X/y của train/test (các đoạn dòng liên tiếp) là view không sao chép và
+# LinearRegression / XGBoost đọc chung một vùng nhớ. meta.json ghi hash nguồn, khoảng ngày,
+# danh sách cột và chỉ số train/test; cùng một nguồn thì phiên bản cũ được dùng lại.
+# Đặc trưng bổ sung (đăng ký bằng @on_demand) được tính lần đầu khi được yêu cầu rồi lưu
+# vào extra/ để các lần sau chỉ cần memmap.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FEATURE_DIR = os.path.join(BASE_DIR, "data", "features")
+STORE_FORMAT = 1
+NON_FEATURES = ('Close', 'Outlier')
+TRAIN_RATIO = 0.8
+READ_CHUNK_ROWS = 100_000
+
+ON_DEMAND = {}
+
+
+def on_demand(name):
+    """
+    Đăng ký một đặc trưng tính khi cần: func(get) với get(tên cột) trả về mảng numpy.
+    """
+    def register(func):
+        ON_DEMAND[name] = func
+        return func
+    return register
+
+
+def _rolling(values, window, how):
+    result = getattr(pd.Series(values).rolling(window=window), how)()
+    # Giống bfill của tiền xử lý cho các dòng khởi động
+    return result.bfill().to_numpy()
+
+
+@on_demand("Volatility_20")
+def _volatility_20(get):
+    return _rolling(get('Log_Returns'), 20, "std")
+
+
+@on_demand("Momentum_5")
+def _momentum_5(get):
+    close = pd.Series(get('Close'))
+    return (close - close.shift(5)).bfill().to_numpy()
+
+
+@on_demand("Volume_Ratio_20")
+def _volume_ratio_20(get):
+    volume = np.asarray(get('Volume'), dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = volume / _rolling(volume, 20, "mean")
+    return np.nan_to_num(ratio, nan=1.0, posinf=1.0)
+
+
+def compute(name, frame):
+    """
+    Tính đặc trưng bổ sung từ một DataFrame đặc trưng (ví dụ dòng mới nhất khi chỉ dự đoán).
+    """
+    if name not in ON_DEMAND:
+        raise KeyError(f"Không có đặc trưng '{name}' (có: {', '.join(sorted(ON_DEMAND))})")
+    return ON_DEMAND[name](lambda col: frame[col].to_numpy())
+
+
+def feature_dir(ticker, root=None):
+    return os.path.join(root or os.environ.get("FEATURE_STORE_DIR") or DEFAULT_FEATURE_DIR, ticker)
+
+
+class FeatureSet:
+    """
+    Một phiên bản đặc trưng đã lưu; mọi mảng đều là memmap chỉ đọc.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.version = os.path.basename(path)
+        self.features = self.meta["features"]
+        self.matrix = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+        self.columns = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r")
+                        for col in NON_FEATURES if os.path.exists(os.path.join(path, f"{col}.npy"))}
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, "index.npy")).astype("datetime64[ns]"), name="Date")
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self, part=None, start=None, end=None):
+        """
+        Đoạn dòng liên tiếp của phần "train"/"test" (hoặc cả tập), giới hạn thêm theo khoảng ngày.
+        """
+        lo, hi = self.meta[part] if part else (0, len(self))
+        if start is not None:
+            lo = max(lo, int(self.dates.searchsorted(pd.Timestamp(start), side="left")))
+        if end is not None:
+            hi = min(hi, int(self.dates.searchsorted(pd.Timestamp(end), side="right")))
+        return slice(lo, max(lo, hi))
+
+    def column(self, name):
+        """
+        Một cột theo tên: view vào ma trận, Close/Outlier, hoặc đặc trưng bổ sung (tính và lưu lần đầu).
+        """
+        if name in self.columns:
+            return self.columns[name]
+        if name in self.features:
+            return self.matrix[:, self.features.index(name)]
+        path = os.path.join(self.path, "extra", f"{name}.npy")
+        if not os.path.exists(path):
+            if name not in ON_DEMAND:
+                raise KeyError(f"Không có đặc trưng '{name}' (có: {', '.join(sorted(ON_DEMAND))})")
+            started = time.perf_counter()
+            values = np.asarray(ON_DEMAND[name](self.column), dtype=self.matrix.dtype)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.save(path + ".tmp.npy", values)
+            os.replace(path + ".tmp.npy", path)
+            print(f"   - Đã tính và lưu đặc trưng {name} ({time.perf_counter() - started:.2f}s)")
+        return np.load(path, mmap_mode="r")
+
+    def frame(self, part=None, features=None, start=None, end=None):
+        """
+        DataFrame đặc trưng của một phần. Với danh sách đặc trưng mặc định đây là view của
+        memmap (không sao chép); có đặc trưng bổ sung thì các cột được ghép thành ma trận mới.
+        """
+        rows = self.rows(part, start, end)
+        features = list(features or self.features)
+        if features == self.features:
+            values = self.matrix[rows]
+        else:
+            values = np.column_stack([self.column(name)[rows] for name in features])
+        return pd.DataFrame(values, index=self.dates[rows], columns=features, copy=False)
+
+    def target(self, part=None, start=None, end=None, name='Close'):
+        rows = self.rows(part, start, end)
+        return pd.Series(self.column(name)[rows], index=self.dates[rows], name=name, copy=False)
+
+
+def _source_hash(source, split_path, compact):
+    digest = hashlib.sha256()
+    hasher = FileHasher()
+    digest.update(hasher.file_hash(source).encode())
+    if os.path.exists(split_path):
+        digest.update(hasher.file_hash(split_path).encode())
+    digest.update(json.dumps({"format": STORE_FORMAT, "compact": bool(compact)}).encode())
+    return digest.hexdigest()
+
+
+def _claim_version_dir(ticker_dir):
+    os.makedirs(ticker_dir, exist_ok=True)
+    versions = [d for d in os.listdir(ticker_dir) if d.startswith("v") and d[1:].isdigit()]
+    number = max((int(d[1:]) for d in versions), default=0) + 1
+    while True:
+        version = f"v{number:04d}"
+        try:
+            os.mkdir(os.path.join(ticker_dir, version))
+            return version
+        except FileExistsError:
+            number += 1
+
+
+def list_versions(ticker, root=None):
+    path = feature_dir(ticker, root)
+    if not os.path.isdir(path):
+        return []
+    return sorted(d for d in os.listdir(path) if d.startswith("v") and d[1:].isdigit()
+                  and os.path.exists(os.path.join(path, d, "meta.json")))
+
+
+def open_features(ticker, version=None, root=None):
+    """
+    Mở một phiên bản đặc trưng đã lưu (mặc định phiên bản mới nhất).
+    """
+    versions = list_versions(ticker, root)
+    version = version or (versions[-1] if versions else None)
+    if version is None:
+        raise FileNotFoundError(f"Chưa có đặc trưng của '{ticker}' trong {feature_dir(ticker, root)}")
+    return FeatureSet(os.path.join(feature_dir(ticker, root), version))
+
+
+def materialize(ticker, processed_dir, root=None, compact=False):
+    """
+    Lưu preprocessed_data.csv của ticker vào kho đặc trưng (một lần cho mỗi nội dung nguồn) và
+    trả về FeatureSet. Train/test lấy theo split.json nếu có, ngược lại 80/20 như preprocess_stock_data.
+    """
+    source = os.path.join(processed_dir, "preprocessed_data.csv")
+    split_path = os.path.join(processed_dir, "split.json")
+    if not os.path.exists(source):
+        print(f"Lỗi: Không tìm thấy {source}")
+        return None
+
+    source_hash = _source_hash(source, split_path, compact)
+    ticker_dir = feature_dir(ticker, root)
+    for version in reversed(list_versions(ticker, root)):
+        feature_set = FeatureSet(os.path.join(ticker_dir, version))
+        if feature_set.meta["source_hash"] == source_hash:
+            return feature_set
+
+    with open(source, "r") as f:
+        header = f.readline().rstrip("\r\n").split(",")
+        n_rows = sum(1 for _ in f)
+    features = [c for c in header if c != 'Date' and c not in NON_FEATURES]
+    dtype = compact_dtypes.FEATURE_DTYPE if compact else np.float64
+    version = _claim_version_dir(ticker_dir)
+    path = os.path.join(ticker_dir, version)
+
+    matrix = np.lib.format.open_memmap(os.path.join(path, "features.npy"), mode="w+", dtype=dtype,
+                                       shape=(n_rows, len(features)))
+    columns = {col: np.lib.format.open_memmap(os.path.join(path, f"{col}.npy"), mode="w+",
+                                              dtype=compact_dtypes.FLAG_DTYPE if col == 'Outlier' else dtype,
+                                              shape=(n_rows,))
+               for col in NON_FEATURES if col in header}
+    index = np.lib.format.open_memmap(os.path.join(path, "index.npy"), mode="w+", dtype=np.int64, shape=(n_rows,))
+    # Đọc nguồn theo khối để file lớn (tiền xử lý theo khối) không phải nạp toàn bộ
+    offset = 0
+    for chunk in pd.read_csv(source, chunksize=READ_CHUNK_ROWS):
+        end = offset + len(chunk)
+        matrix[offset:end] = chunk[features].to_numpy(dtype=dtype)
+        for col, values in columns.items():
+            values[offset:end] = chunk[col].to_numpy(dtype=values.dtype)
+        index[offset:end] = pd.to_datetime(chunk['Date'], format="ISO8601").to_numpy(dtype="datetime64[ns]").view(np.int64)
+        offset = end
+    for array in (matrix, index, *columns.values()):
+        array.flush()
+    del matrix, index, columns
+
+    if os.path.exists(split_path):
+        with open(split_path, "r") as f:
+            split_idx = json.load(f)["train"]["stop"]
+    else:
+        split_idx = int(n_rows * TRAIN_RATIO)
+    dates = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+    meta = {
+        "ticker": ticker,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": source,
+        "source_hash": source_hash,
+        "dtype": np.dtype(dtype).name,
+        "rows": n_rows,
+        "start": str(pd.Timestamp(int(dates[0]))) if n_rows else None,
+        "end": str(pd.Timestamp(int(dates[-1]))) if n_rows else None,
+        "features": features,
+        "train": [0, split_idx],
+        "test": [split_idx, n_rows],
+    }
+    # meta.json ghi sau cùng: phiên bản chưa có meta.json bị bỏ qua khi liệt kê
+    with open(os.path.join(path, "meta.json.tmp"), "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+    print(f"   - Đã lưu {n_rows} dòng x {len(features)} đặc trưng vào kho đặc trưng {ticker}/{version}")
+    return FeatureSet(path)
@@ -0,0 +1,162 @@
+import hashlib
+import importlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import worker_threads
+
+# Vẽ biểu đồ không giao diện (Agg) theo lô: mỗi biểu đồ là một job gồm hàm vẽ ("module:hàm"),
+# lát dữ liệu đầu vào và file PNG đích. Hàm vẽ chỉ nhận dữ liệu và trả về Figure, không tự đọc
+# file nên job có thể gửi sang process pool. Khóa của job là hash của lát dữ liệu + tham số +
+# mã nguồn module chứa hàm vẽ, được ghi vào metadata của chính file PNG; nếu khóa không đổi thì
+# biểu đồ được bỏ qua (không có file trạng thái chung, các stage chạy song song không ghi đè nhau).
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+HASH_KEY = "Source-Hash"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_source_hashes = {}
+
+
+def _init_worker():
+    # Mỗi worker 1 luồng BLAS, backend Agg (không cần màn hình)
+    worker_threads.limit_worker_threads()
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _resolve(func):
+    module_name, func_name = func.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _module_hash(func):
+    module_name = func.split(":")[0]
+    if module_name not in _source_hashes:
+        path = os.path.join(SRC_DIR, module_name + ".py")
+        with open(path, "rb") as f:
+            _source_hashes[module_name] = hashlib.sha256(f.read()).hexdigest()
+    return _source_hashes[module_name]
+
+
+def figure_job(renderer, path, title=None, **data):
+    """
+    Một biểu đồ cần vẽ: renderer ("module:hàm") được gọi với **data rồi lưu vào path.
+    data chỉ nên chứa đúng lát dữ liệu mà biểu đồ dùng (DataFrame, Series, mảng numpy, số, chuỗi).
+    """
+    return {"renderer": renderer, "path": path, "title": title or os.path.basename(path), "data": data}
+
+
+def slice_hash(job):
+    """
+    Hash nội dung đầu vào của job (dữ liệu, tham số, mã nguồn hàm vẽ).
+    """
+    digest = hashlib.sha256()
+    digest.update(job["renderer"].encode())
+    digest.update(_module_hash(job["renderer"]).encode())
+    for key in sorted(job["data"]):
+        value = job["data"][key]
+        digest.update(key.encode())
+        if isinstance(value, (np.ndarray, pd.Index)):
+            value = pd.Series(np.asarray(value))
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            # Tên cột và kiểu dữ liệu cũng là một phần của đầu vào
+            layout = value.dtypes.astype(str).to_dict() if isinstance(value, pd.DataFrame) else str(value.dtype)
+            digest.update(json.dumps([str(value.shape), layout], default=str).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def stored_hash(path):
+    """
+    Hash đã ghi trong metadata (chunk tEXt) của file PNG, None nếu không có.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return None
+            # Metadata nằm trước dữ liệu ảnh, chỉ đọc các chunk đầu
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                length, kind = int.from_bytes(header[:4], "big"), header[4:]
+                if kind in (b"IDAT", b"IEND"):
+                    return None
+                body = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                if kind == b"tEXt":
+                    key, _, value = body.partition(b"\0")
+                    if key.decode("latin-1") == HASH_KEY:
+                        return value.decode("latin-1")
+    except OSError:
+        return None
+
+
+def _render_task(job):
+    import matplotlib.pyplot as plt
+    fig = _resolve(job["renderer"])(**job["data"])
+    os.makedirs(os.path.dirname(job["path"]), exist_ok=True)
+    fig.savefig(job["path"], metadata={HASH_KEY: job["hash"]})
+    plt.close(fig)
+    return job["path"]
+
+
+def render_figures(jobs, max_workers=None, force=False):
+    """
+    Vẽ các job chưa có ảnh hoặc có đầu vào đã đổi, song song trên process pool (Agg).
+    Trả về dict path -> "rendered" / "skipped". force: vẽ lại tất cả.
+    """
+    status = {}
+    pending = []
+    for job in jobs:
+        job["hash"] = slice_hash(job)
+        if not force and stored_hash(job["path"]) == job["hash"]:
+            status[job["path"]] = "skipped"
+        else:
+            pending.append(job)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        # Một job hoặc một CPU: vẽ ngay trong tiến trình hiện tại, không tốn chi phí khởi tạo pool;
+        # vẫn ép backend Agg như trong worker để không phụ thuộc màn hình / MPLBACKEND của người gọi
+        if pending:
+            import matplotlib
+            matplotlib.use("Agg")
+        for job in pending:
+            status[_render_task(job)] = "rendered"
+    else:
+        with worker_threads.single_threaded_pool(), \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for path in pool.map(_render_task, pending):
+                status[path] = "rendered"
+    return status
+
+
+def render_outliers(dates, close, outlier_dates, outlier_close, ticker):
+    """
+    Giá đóng cửa và các điểm ngoại lai (outliers.png).
+    """
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(dates, close, label='Price', color='blue', alpha=0.5)
+    ax.scatter(outlier_dates, outlier_close, color='red', label='Outliers', zorder=5)
+    ax.set_title(f"Stock Price & Outliers: {ticker}", fontsize=16)
+    ax.legend()
+    ax.grid(True)
+    return fig
+
+
+def outlier_job(dates, close, outlier_dates, outlier_close, ticker, results_dir):
+    return figure_job("figure_renderer:render_outliers", os.path.join(results_dir, "outliers.png"),
+                      title="Stock Price & Outliers", dates=pd.DatetimeIndex(dates), close=np.asarray(close),
+                      outlier_dates=pd.DatetimeIndex(outlier_dates), outlier_close=np.asarray(outlier_close),
+                      ticker=ticker)
@@ -0,0 +1,281 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+import worker_threads
+
+# Tìm siêu tham số cho XGBoost (grid / random / successive halving) trên các fold
+# time-series CV của tập train. Mỗi trial chạy trong process pool với early stopping;
+# trial có điểm sau một fold tệ hơn hẳn trial tốt nhất hiện tại bị dừng sớm (pruned).
+# Mọi trial được ghi vào một file sqlite nên chạy lại cùng study sẽ bỏ qua các
+# trial đã xong và tiếp tục từ chỗ bị ngắt. Tham số tốt nhất được ghi vào
+# models/xgboost_params.json để run_modeling sử dụng.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Không gian tìm kiếm mặc định: list = các giá trị rời rạc, tuple = (kiểu, thấp, cao) cho random
+DEFAULT_SPACE = {
+    "learning_rate": ("log", 0.005, 0.3),
+    "max_depth": [3, 4, 6, 8],
+    "min_child_weight": ("log", 0.5, 10),
+    "subsample": ("uniform", 0.6, 1.0),
+    "colsample_bytree": ("uniform", 0.6, 1.0),
+    "reg_lambda": ("log", 0.1, 10),
+}
+TRIALS_PER_CORE = 8
+EARLY_STOPPING_ROUNDS = 50
+PRUNE_RATIO = 1.5
+
+_data = None
+
+
+def grid_candidates(space):
+    """
+    Tích Descartes của các giá trị; miền liên tục (tuple) lấy 3 điểm đều (theo log nếu là 'log').
+    """
+    axes = {}
+    for name, spec in space.items():
+        if isinstance(spec, tuple):
+            kind, low, high = spec
+            points = np.geomspace(low, high, 3) if kind == "log" else np.linspace(low, high, 3)
+            axes[name] = [int(round(p)) for p in points] if kind == "int" else [float(p) for p in points]
+        else:
+            axes[name] = list(spec)
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def random_candidates(space, n_trials, seed=42):
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n_trials):
+        params = {}
+        for name, spec in space.items():
+            if isinstance(spec, tuple):
+                kind, low, high = spec
+                if kind == "log":
+                    params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                elif kind == "int":
+                    params[name] = int(rng.integers(low, high + 1))
+                else:
+                    params[name] = float(rng.uniform(low, high))
+            else:
+                params[name] = spec[int(rng.integers(len(spec)))]
+                if isinstance(params[name], np.generic):
+                    params[name] = params[name].item()
+        candidates.append(params)
+    return candidates
+
+
+def time_series_folds(n_rows, n_splits=5):
+    """
+    Các fold expanding giống TimeSeriesSplit: (train_end, val_end) theo chỉ số dòng.
+    """
+    fold_size = n_rows // (n_splits + 1)
+    return [(fold_size * (k + 1), fold_size * (k + 2) if k < n_splits - 1 else n_rows) for k in range(n_splits)]
+
+
+def _trial_key(params, budget):
+    return hashlib.sha256(json.dumps([params, budget], sort_keys=True).encode()).hexdigest()[:16]
+
+
+class TrialStore:
+    """
+    Bảng trial trong sqlite; chỉ tiến trình chính ghi vào.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trials (
+                study TEXT, trial_key TEXT, rung INTEGER, budget INTEGER, params TEXT,
+                status TEXT, score REAL, best_iteration INTEGER, fold_scores TEXT,
+                seconds REAL, updated_at TEXT,
+                PRIMARY KEY (study, trial_key))
+        """)
+        self.conn.commit()
+
+    def get(self, study, key):
+        row = self.conn.execute("SELECT status, score, best_iteration FROM trials WHERE study=? AND trial_key=?",
+                                (study, key)).fetchone()
+        return None if row is None else {"status": row[0], "score": row[1], "best_iteration": row[2]}
+
+    def save(self, study, key, rung, budget, params, status, score=None, best_iteration=None,
+             fold_scores=None, seconds=None):
+        self.conn.execute("INSERT OR REPLACE INTO trials VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                          (study, key, rung, budget, json.dumps(params, sort_keys=True), status, score,
+                           best_iteration, json.dumps(fold_scores or []), seconds,
+                           time.strftime("%Y-%m-%dT%H:%M:%S")))
+        self.conn.commit()
+
+    def results(self, study):
+        return pd.read_sql_query("SELECT * FROM trials WHERE study=? ORDER BY rung, score", self.conn,
+                                 params=(study,))
+
+    def close(self):
+        self.conn.close()
+
+
+def _init_worker(processed_dir, n_splits):
+    global _data
+    from streaming_preprocess import load_split
+    # Mỗi trial dùng 1 luồng, song song hóa nằm ở cấp trial
+    worker_threads.limit_worker_threads()
+    train_df = load_split(processed_dir, "train")
+    features = [c for c in train_df.columns if c not in ['Close', 'Outlier']]
+    X = train_df[features].to_numpy()
+    y = train_df['Close'].to_numpy()
+    _data = (X, y, time_series_folds(len(X), n_splits))
+
+
+def evaluate_trial(params, budget, prune_threshold=None):
+    """
+    Chạy time-series CV cho một bộ tham số với tối đa `budget` cây (early stopping trên fold validation).
+    Dừng sớm (pruned) nếu RMSE trung bình sau một fold vượt prune_threshold.
+    """
+    import xgboost as xgb
+    X, y, folds = _data
+    started = time.perf_counter()
+    scores, iterations = [], []
+    for train_end, val_end in folds:
+        model = xgb.XGBRegressor(n_estimators=budget, objective='reg:squarederror', tree_method="hist",
+                                 n_jobs=1, early_stopping_rounds=EARLY_STOPPING_ROUNDS, **params)
+        model.fit(X[:train_end], y[:train_end], eval_set=[(X[train_end:val_end], y[train_end:val_end])],
+                  verbose=False)
+        pred = model.predict(X[train_end:val_end])
+        scores.append(float(np.sqrt(np.mean((y[train_end:val_end] - pred) ** 2))))
+        iterations.append(int(model.best_iteration) + 1)
+        if prune_threshold is not None and np.mean(scores) > prune_threshold:
+            return {"status": "pruned", "score": float(np.mean(scores)), "fold_scores": scores,
+                    "best_iteration": None, "seconds": time.perf_counter() - started}
+    return {"status": "complete", "score": float(np.mean(scores)), "fold_scores": scores,
+            "best_iteration": int(np.median(iterations)), "seconds": time.perf_counter() - started}
+
+
+def _run_rung(pool, max_workers, store, study, rung, budget, candidates, best_score):
+    """
+    Chạy (hoặc đọc lại từ sqlite) các trial của một rung. Trả về list (params, kết quả).
+    """
+    outcomes = {}
+    pending = []
+    for params in candidates:
+        key = _trial_key(params, budget)
+        previous = store.get(study, key)
+        if previous and previous["status"] in ("complete", "pruned"):
+            outcomes[key] = (params, previous)
+        else:
+            pending.append((key, params))
+    if outcomes:
+        print(f"   rung {rung}: dùng lại {len(outcomes)} trial đã có trong database")
+        scores = [r["score"] for _, r in outcomes.values() if r["status"] == "complete"]
+        best_score = min(scores + [best_score])
+
+    running = {}
+    while pending or running:
+        # Giữ hàng đợi ngắn để ngưỡng pruning luôn dựa trên trial tốt nhất mới nhất
+        while pending and len(running) < max_workers * 2:
+            key, params = pending.pop(0)
+            store.save(study, key, rung, budget, params, "running")
+            threshold = best_score * PRUNE_RATIO if math.isfinite(best_score) else None
+            running[pool.submit(evaluate_trial, params, budget, threshold)] = (key, params)
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            key, params = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Lỗi ở trial {params}: {type(e).__name__}: {e}")
+                store.save(study, key, rung, budget, params, "failed")
+                continue
+            store.save(study, key, rung, budget, params, result["status"], result["score"],
+                       result["best_iteration"], result["fold_scores"], result["seconds"])
+            outcomes[key] = (params, result)
+            if result["status"] == "complete":
+                best_score = min(best_score, result["score"])
+            print(f"   rung {rung} [{len(outcomes)}/{len(candidates)}] {result['status']:<8} "
+                  f"RMSE={result['score']:.5f} ({result['seconds']:.1f}s)")
+    return list(outcomes.values()), best_score
+
+
+def run_search(method="random", n_trials=None, space=None, n_splits=5, max_rounds=1000, min_rounds=50, eta=3,
+               max_workers=None, study=None, seed=42, output_dir=None):
+    """
+    Tìm siêu tham số XGBoost. method: "grid", "random" hoặc "halving" (successive halving trên
+    số cây tối đa, bắt đầu từ các ứng viên ngẫu nhiên). n_trials mặc định TRIALS_PER_CORE x số lõi.
+    Kết quả lưu ở results/hpo/trials.sqlite; tham số tốt nhất ghi vào models/xgboost_params.json.
+    """
+    base_dir = output_dir or BASE_DIR
+    from streaming_preprocess import SPLIT_FILE
+    processed_dir = os.path.join(base_dir, "data", "processed")
+    if not any(os.path.exists(os.path.join(processed_dir, name)) for name in ("train_data.csv", SPLIT_FILE)):
+        print("Lỗi: Không tìm thấy file dữ liệu train.")
+        return
+
+    space = space or DEFAULT_SPACE
+    max_workers = max_workers or os.cpu_count() or 1
+    n_trials = n_trials or TRIALS_PER_CORE * max_workers
+    if method == "grid":
+        candidates = grid_candidates(space)
+        rungs = [max_rounds]
+    elif method == "random":
+        candidates = random_candidates(space, n_trials, seed)
+        rungs = [max_rounds]
+    elif method == "halving":
+        candidates = random_candidates(space, n_trials, seed)
+        rungs = []
+        budget = min_rounds
+        while budget < max_rounds:
+            rungs.append(budget)
+            budget *= eta
+        rungs.append(max_rounds)
+    else:
+        raise ValueError(f"method phải là grid, random hoặc halving, nhận được '{method}'")
+    study = study or f"{method}-s{seed}-n{len(candidates)}"
+
+    store = TrialStore(os.path.join(base_dir, "results", "hpo", "trials.sqlite"))
+    print(f"Study '{study}': {len(candidates)} ứng viên, {n_splits} fold, {max_workers} worker, rung = {rungs}")
+    started = time.perf_counter()
+    best_score = math.inf
+    with worker_threads.single_threaded_pool(), \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                initargs=(processed_dir, n_splits)) as pool:
+        for rung, budget in enumerate(rungs):
+            outcomes, best_score = _run_rung(pool, max_workers, store, study, rung, budget, candidates, best_score)
+            if rung < len(rungs) - 1:
+                # Successive halving: giữ 1/eta ứng viên tốt nhất cho rung sau với nhiều cây hơn
+                complete = sorted((item for item in outcomes if item[1]["status"] == "complete"),
+                                  key=lambda item: item[1]["score"])
+                candidates = [params for params, _ in complete[:max(1, len(complete) // eta)]]
+
+    results = store.results(study)
+    store.close()
+    final = results[(results["status"] == "complete") & (results["budget"] == rungs[-1])]
+    if final.empty:
+        print("Lỗi: Không có trial nào hoàn thành.")
+        return
+    best = final.sort_values("score").iloc[0]
+    best_params = {**json.loads(best["params"]), "n_estimators": int(best["best_iteration"])}
+
+    models_dir = os.path.join(base_dir, "models")
+    os.makedirs(models_dir, exist_ok=True)
+    with open(os.path.join(models_dir, "xgboost_params.json"), "w") as f:
+        json.dump({"study": study, "cv_rmse": float(best["score"]), "params": best_params}, f, indent=2)
+
+    print(f"\n--- Best XGBoost params (CV RMSE {best['score']:.5f}, {time.perf_counter() - started:.1f}s) ---")
+    for name, value in best_params.items():
+        print(f"   {name}: {value}")
+    print(f"   - Saved to '{os.path.join(models_dir, 'xgboost_params.json')}'")
+    return best_params
+
+
+if __name__ == "__main__":
+    run_search()
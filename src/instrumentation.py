@@ -0,0 +1,131 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Đo thời gian, bộ nhớ (peak RSS) và thông lượng (dòng/giây) cho từng phase của
+# pipeline và các đoạn nóng bên trong (IsolationForest, chỉ báo, scaling, XGBoost).
+# Mỗi tiến trình giữ danh sách bản ghi riêng; bộ chạy pipeline gom bản ghi từ các
+# tiến trình con về tiến trình chính rồi xuất ra JSON và định dạng text của Prometheus.
+# Chỉ dùng thư viện chuẩn để import module này không làm chậm CLI.
+
+METRIC_PREFIX = "stock_pipeline_section"
+
+_records = []
+
+
+def _current_rss_bytes():
+    # /proc chỉ có trên Linux; nơi khác trả về None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS trả về byte, Linux trả về KB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextlib.contextmanager
+def track(name, rows=None):
+    """
+    Đo một đoạn mã. Có thể gán record["rows"] bên trong khối with khi số dòng chỉ biết sau khi chạy.
+    """
+    record = {"name": name, "rows": rows, "pid": os.getpid(),
+              "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "rss_start_bytes": _current_rss_bytes()}
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record["peak_rss_bytes"] = _peak_rss_bytes()
+        record["rss_end_bytes"] = _current_rss_bytes()
+        record["rows_per_sec"] = (record["rows"] / record["seconds"]
+                                  if record["rows"] and record["seconds"] > 0 else None)
+        _records.append(record)
+
+
+def records():
+    return list(_records)
+
+
+def add_records(new_records):
+    """
+    Thêm bản ghi thu được từ tiến trình khác (ví dụ worker của process pool).
+    """
+    _records.extend(new_records)
+
+
+def reset():
+    del _records[:]
+
+
+def to_json(path, extra=None):
+    payload = dict(extra or {})
+    payload["sections"] = records()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _prometheus_lines(labels=None):
+    # Gộp các bản ghi cùng tên (ví dụ chạy lại nhiều lần) để mỗi series chỉ xuất hiện một lần
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record["name"], {"seconds": 0.0, "rows": 0, "peak_rss_bytes": 0, "count": 0})
+        total["seconds"] += record["seconds"]
+        total["rows"] += record["rows"] or 0
+        total["peak_rss_bytes"] = max(total["peak_rss_bytes"], record["peak_rss_bytes"] or 0)
+        total["count"] += 1
+
+    metrics = [
+        ("seconds", "gauge", "Wall time of an instrumented section.", lambda t: t["seconds"]),
+        ("peak_rss_bytes", "gauge", "Peak resident set size of the process at the end of the section.",
+         lambda t: t["peak_rss_bytes"]),
+        ("rows", "gauge", "Rows processed by the section.", lambda t: t["rows"]),
+        ("rows_per_second", "gauge", "Row throughput of the section.",
+         lambda t: t["rows"] / t["seconds"] if t["rows"] and t["seconds"] > 0 else 0),
+        ("runs", "gauge", "Number of times the section ran.", lambda t: t["count"]),
+    ]
+    base_labels = "".join(f',{key}="{value}"' for key, value in sorted((labels or {}).items()))
+    lines = []
+    for suffix, kind, help_text, value in metrics:
+        metric = f"{METRIC_PREFIX}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, total in totals.items():
+            lines.append(f'{metric}{{section="{name}"{base_labels}}} {value(total):.6g}')
+    return lines
+
+
+def to_prometheus(path, labels=None):
+    """
+    Ghi file text theo định dạng exposition của Prometheus (dùng được với textfile collector).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(_prometheus_lines(labels)) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def print_summary():
+    if not _records:
+        return
+    print(f"\n{'Section':<32}{'Time (s)':>10}{'Peak RSS (MB)':>15}{'Rows':>10}{'Rows/s':>12}")
+    for record in _records:
+        peak = f"{record['peak_rss_bytes'] / 2**20:.0f}" if record["peak_rss_bytes"] else "-"
+        rows = record["rows"] if record["rows"] is not None else "-"
+        speed = f"{record['rows_per_sec']:.0f}" if record["rows_per_sec"] else "-"
+        print(f"{record['name']:<32}{record['seconds']:>10.2f}{peak:>15}{rows:>10}{speed:>12}")
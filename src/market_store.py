@@ -0,0 +1,305 @@
+import os
+import json
+import mmap
+import shutil
+import numpy as np
+import pandas as pd
+
+# Kho dữ liệu thị trường dạng cột, phân vùng theo ticker/năm:
+#   data/store/ticker=FPT.VN/year=2024/{Date,Open,High,Low,Close,Volume}.bin
+# Mỗi cột là một file nhị phân thô với kiểu dữ liệu cố định theo SCHEMA nên
+# có thể đọc bằng memory-map (không cần parse header) và chỉ nạp những cột
+# cần thiết (column pushdown). Date được lưu dạng int64
+# nanosecond UTC, đã sắp xếp, nên lọc theo khoảng thời gian chỉ cần
+# bỏ qua các phân vùng năm không liên quan rồi searchsorted.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STORE_DIR = os.path.join(BASE_DIR, "data", "store")
+LEGACY_CSV = os.path.join(BASE_DIR, "data", "raw", "stock_data.csv")
+DEFAULT_TICKER = "FPT.VN"
+
+# Volume giữ float64 vì bước tiền xử lý nội suy giá trị khuyết (NaN)
+DATE_DTYPE = np.dtype("<i8")
+SCHEMA = {
+    "Open": np.dtype("<f8"),
+    "High": np.dtype("<f8"),
+    "Low": np.dtype("<f8"),
+    "Close": np.dtype("<f8"),
+    "Volume": np.dtype("<f8"),
+}
+COLUMNS = list(SCHEMA)
+
+
+def store_dir(root=None):
+    """
+    Thư mục gốc của kho dữ liệu (ưu tiên tham số, sau đó biến môi trường STOCK_STORE_DIR).
+    """
+    return root or os.environ.get("STOCK_STORE_DIR") or DEFAULT_STORE_DIR
+
+
+def _ticker_dir(ticker, root=None):
+    return os.path.join(store_dir(root), f"ticker={ticker}")
+
+
+def _manifest_path(ticker, root=None):
+    return os.path.join(_ticker_dir(ticker, root), "_manifest.json")
+
+
+def _partition_dir(ticker, year, root=None):
+    return os.path.join(_ticker_dir(ticker, root), f"year={year}")
+
+
+def _to_utc_ns(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.as_unit("ns").asi8
+
+
+def list_tickers(root=None):
+    root = store_dir(root)
+    if not os.path.isdir(root):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("ticker="))
+
+
+def list_years(ticker, root=None):
+    path = _ticker_dir(ticker, root)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(name.split("=", 1)[1]) for name in os.listdir(path) if name.startswith("year="))
+
+
+def _read_column(path, dtype, use_mmap=True):
+    with open(path, "rb") as f:
+        if not use_mmap:
+            return np.fromfile(f, dtype=dtype)
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.empty(0, dtype=dtype)
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(buf, dtype=dtype)
+
+
+def _read_partition(path, columns, use_mmap=True):
+    arrays = {"Date": _read_column(os.path.join(path, "Date.bin"), DATE_DTYPE, use_mmap)}
+    for col in columns:
+        arrays[col] = _read_column(os.path.join(path, f"{col}.bin"), SCHEMA[col], use_mmap)
+    return arrays
+
+
+def _write_partition(path, arrays):
+    # Ghi ra thư mục tạm rồi đổi tên để người đọc không thấy phân vùng dở dang
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    for col, values in arrays.items():
+        dtype = DATE_DTYPE if col == "Date" else SCHEMA[col]
+        np.ascontiguousarray(values, dtype=dtype).tofile(os.path.join(tmp_path, f"{col}.bin"))
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+def write_ohlcv(df, ticker, root=None):
+    """
+    Ghi (upsert) dữ liệu OHLCV của một ticker vào kho, chỉ viết lại các phân vùng năm bị ảnh hưởng.
+    Các bar trùng thời điểm được thay bằng bản mới nhất.
+    """
+    if df.empty:
+        return 0
+
+    dates = _to_utc_ns(df.index)
+    years = pd.DatetimeIndex(dates).year.values
+    written = 0
+
+    for year in np.unique(years):
+        mask = years == year
+        new = {"Date": dates[mask]}
+        for col in COLUMNS:
+            new[col] = df[col].to_numpy(dtype=SCHEMA[col])[mask]
+
+        path = _partition_dir(ticker, int(year), root)
+        if os.path.exists(path):
+            old = _read_partition(path, COLUMNS, use_mmap=False)
+            merged = {col: np.concatenate([old[col], new[col]]) for col in new}
+        else:
+            merged = new
+
+        # Sắp xếp ổn định theo Date rồi giữ bản ghi cuối cùng của mỗi thời điểm
+        order = np.argsort(merged["Date"], kind="stable")
+        sorted_dates = merged["Date"][order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = sorted_dates[1:] != sorted_dates[:-1]
+        order = order[keep]
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_partition(path, {col: values[order] for col, values in merged.items()})
+        written += int(mask.sum())
+
+    _update_manifest(ticker, int(dates.max()), root)
+    return written
+
+
+def _update_manifest(ticker, last_ns, root=None):
+    manifest = read_manifest(ticker, root)
+    previous = manifest.get("last_timestamp")
+    if previous is not None:
+        last_ns = max(last_ns, _to_utc_ns([pd.Timestamp(previous)])[0])
+    manifest["last_timestamp"] = pd.Timestamp(last_ns).isoformat()
+    manifest["updated_at"] = pd.Timestamp.now(tz="UTC").tz_localize(None).isoformat()
+
+    path = _manifest_path(ticker, root)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(ticker, root=None):
+    """
+    Đọc manifest của ticker (thời điểm bar cuối cùng, lần cập nhật gần nhất).
+    """
+    path = _manifest_path(ticker, root)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def last_timestamp(ticker, root=None):
+    """
+    Thời điểm (UTC) của bar cuối cùng đã lưu cho ticker, None nếu chưa có dữ liệu.
+    """
+    last = read_manifest(ticker, root).get("last_timestamp")
+    if last is not None:
+        return pd.Timestamp(last)
+
+    # Kho được tạo trước khi có manifest: đọc trực tiếp phân vùng năm mới nhất
+    years = list_years(ticker, root)
+    if not years:
+        return None
+    dates = _read_column(os.path.join(_partition_dir(ticker, years[-1], root), "Date.bin"), DATE_DTYPE)
+    return pd.Timestamp(int(dates[-1])) if len(dates) else None
+
+
+def import_legacy_csv(ticker=DEFAULT_TICKER, csv_path=LEGACY_CSV, root=None):
+    """
+    Chuyển file CSV cũ (data/raw/stock_data.csv) vào kho dữ liệu.
+    """
+    df = pd.read_csv(csv_path)
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    df.set_index("Date", inplace=True)
+    return write_ohlcv(df, ticker, root=root)
+
+
+def _ensure_ticker(ticker, root=None):
+    if list_years(ticker, root):
+        return True
+    # Lần đầu chạy trên bản clone chỉ có file CSV cũ: tự động nhập vào kho
+    if ticker == DEFAULT_TICKER and os.path.exists(LEGACY_CSV):
+        import_legacy_csv(ticker, root=root)
+        return bool(list_years(ticker, root))
+    return False
+
+
+def has_ticker(ticker, root=None):
+    return _ensure_ticker(ticker, root)
+
+
+def _year_bounds(start, end):
+    start_ns = None if start is None else _to_utc_ns([pd.Timestamp(start)])[0]
+    end_ns = None if end is None else _to_utc_ns([pd.Timestamp(end)])[0]
+    return start_ns, end_ns
+
+
+def _scan(ticker, columns, start_ns, end_ns, root=None):
+    """
+    Trả về danh sách các lát cắt (dict cột -> mảng memmap) thỏa khoảng thời gian.
+    """
+    first_year = None if start_ns is None else pd.Timestamp(start_ns).year
+    last_year = None if end_ns is None else pd.Timestamp(end_ns).year
+    if first_year is not None and last_year is not None:
+        # Khoảng thời gian đã biết: đi thẳng tới các phân vùng năm, không cần liệt kê thư mục
+        years = range(first_year, last_year + 1)
+    else:
+        years = [y for y in list_years(ticker, root)
+                 if (first_year is None or y >= first_year) and (last_year is None or y <= last_year)]
+
+    chunks = []
+    for year in years:
+        try:
+            part = _read_partition(_partition_dir(ticker, year, root), columns)
+        except FileNotFoundError:
+            continue
+        lo = 0 if start_ns is None else np.searchsorted(part["Date"], start_ns, side="left")
+        hi = len(part["Date"]) if end_ns is None else np.searchsorted(part["Date"], end_ns, side="right")
+        if hi > lo:
+            chunks.append({col: values[lo:hi] for col, values in part.items()})
+    return chunks
+
+
+def load_ohlcv(ticker=DEFAULT_TICKER, columns=None, start=None, end=None, root=None):
+    """
+    Đọc dữ liệu của một ticker từ kho, chỉ nạp các cột và khoảng thời gian [start, end] được yêu cầu.
+    Index là Date (UTC, không kèm timezone).
+    """
+    columns = list(columns) if columns is not None else COLUMNS
+    if not _ensure_ticker(ticker, root):
+        raise FileNotFoundError(f"Không tìm thấy dữ liệu cho {ticker} trong {store_dir(root)}")
+
+    start_ns, end_ns = _year_bounds(start, end)
+    chunks = _scan(ticker, columns, start_ns, end_ns, root)
+    if chunks:
+        data = {col: np.concatenate([c[col] for c in chunks]) for col in ["Date"] + columns}
+    else:
+        data = {"Date": np.array([], dtype=DATE_DTYPE)}
+        data.update({col: np.array([], dtype=SCHEMA[col]) for col in columns})
+
+    index = pd.DatetimeIndex(data.pop("Date").astype("datetime64[ns]"), name="Date")
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def iter_ohlcv(ticker=DEFAULT_TICKER, chunk_rows=100_000, columns=None, start=None, end=None, root=None):
+    """
+    Đọc dữ liệu của một ticker theo từng khối tối đa chunk_rows dòng (theo thứ tự thời gian),
+    để xử lý lịch sử dài mà không nạp toàn bộ vào bộ nhớ. Mỗi khối là DataFrame như load_ohlcv.
+    """
+    columns = list(columns) if columns is not None else COLUMNS
+    if not _ensure_ticker(ticker, root):
+        raise FileNotFoundError(f"Không tìm thấy dữ liệu cho {ticker} trong {store_dir(root)}")
+
+    start_ns, end_ns = _year_bounds(start, end)
+    # Các phân vùng được memory-map nên chỉ những khối đang xử lý mới thực sự được đọc
+    for part in _scan(ticker, columns, start_ns, end_ns, root):
+        for lo in range(0, len(part["Date"]), chunk_rows):
+            index = pd.DatetimeIndex(part["Date"][lo:lo + chunk_rows].astype("datetime64[ns]"), name="Date")
+            yield pd.DataFrame({col: np.array(part[col][lo:lo + chunk_rows]) for col in columns},
+                               index=index, columns=columns)
+
+
+def load_panel(tickers, column="Close", start=None, end=None, root=None):
+    """
+    Đọc một cột cho nhiều ticker thành bảng rộng (Date x ticker).
+    Các ngày thiếu của từng ticker được để NaN.
+    """
+    start_ns, end_ns = _year_bounds(start, end)
+    series = []
+    for ticker in tickers:
+        chunks = _scan(ticker, [column], start_ns, end_ns, root)
+        if chunks:
+            series.append((ticker,
+                           np.concatenate([c["Date"] for c in chunks]),
+                           np.concatenate([c[column] for c in chunks])))
+
+    if not series:
+        return pd.DataFrame(columns=list(tickers), dtype=SCHEMA[column])
+
+    all_dates = np.unique(np.concatenate([dates for _, dates, _ in series]))
+    panel = np.full((len(all_dates), len(tickers)), np.nan, dtype=SCHEMA[column])
+    position = {ticker: j for j, ticker in enumerate(tickers)}
+    for ticker, dates, values in series:
+        panel[np.searchsorted(all_dates, dates), position[ticker]] = values
+
+    index = pd.DatetimeIndex(all_dates.astype("datetime64[ns]"), name="Date")
+    return pd.DataFrame(panel, index=index, columns=list(tickers))
+
@@ -0,0 +1,108 @@
+import argparse
+import functools
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+import synthetic_data
+
+# Máy chủ HTTP cục bộ thay thế nguồn dữ liệu thật, trả về OHLCV giả lập dạng CSV:
+#   GET /history?ticker=FPT.VN&period=5y
+#   GET /history?ticker=FPT.VN&start=2025-01-01
+# Có thể cấu hình độ trễ và tỉ lệ lỗi 503 để đo throughput và kiểm tra cơ chế retry.
+
+PERIOD_YEARS = {"1y": 1, "2y": 2, "5y": 5, "10y": 10}
+
+
+@functools.lru_cache(maxsize=4096)
+def _history(ticker, day):
+    # Sinh toàn bộ lịch sử một lần cho mỗi ticker/ngày rồi cắt theo start
+    return synthetic_data.generate_ohlcv(ticker, end=day)
+
+
+def make_handler(fail_rate=0.0, latency=0.0, seed=0):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    stats = {"requests": 0, "failures": 0}
+
+    class MarketDataHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 để client có thể tái sử dụng kết nối (keep-alive)
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            with lock:
+                stats["requests"] += 1
+                fail = rng.random() < fail_rate
+                if fail:
+                    stats["failures"] += 1
+
+            if latency:
+                time.sleep(latency)
+
+            if url.path != "/history" or "ticker" not in query:
+                return self._send(404, "not found\n")
+            if fail:
+                return self._send(503, "service unavailable\n")
+
+            today = pd.Timestamp.now(tz="UTC").normalize()
+            start = query.get("start")
+            if start is None:
+                years = PERIOD_YEARS.get(query.get("period", "5y"), 5)
+                start = (today - pd.DateOffset(years=years)).strftime("%Y-%m-%d")
+            df = _history(query["ticker"], today)
+            df = df[df.index >= pd.Timestamp(start, tz="UTC")]
+            self._send(200, df.to_csv(), content_type="text/csv")
+
+        def _send(self, status, body, content_type="text/plain"):
+            payload = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MarketDataHandler, stats
+
+
+def start_server(host="127.0.0.1", port=0, fail_rate=0.0, latency=0.0, seed=0):
+    """
+    Chạy máy chủ trong luồng nền. Trả về (server, stats); base URL là http://host:server.server_port.
+    """
+    handler, stats = make_handler(fail_rate=fail_rate, latency=latency, seed=seed)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, stats
+
+
+def run_server(host="127.0.0.1", port=8765, fail_rate=0.0, latency=0.0, seed=0):
+    """
+    Chạy máy chủ ở tiến trình hiện tại (blocking), dùng khi cần tách máy chủ khỏi tiến trình đo.
+    """
+    handler, _ = make_handler(fail_rate=fail_rate, latency=latency, seed=seed)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Máy chủ OHLCV giả lập cho benchmark offline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Độ trễ mỗi request (giây)")
+    args = parser.parse_args()
+
+    print(f"Serving synthetic OHLCV on http://{args.host}:{args.port}/history")
+    run_server(args.host, args.port, fail_rate=args.fail_rate, latency=args.latency)
@@ -0,0 +1,202 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Kho mô hình có phiên bản: mỗi lần huấn luyện lưu một thư mục
+#   models/<tên>/v0001/{meta.json, model.ubj}
+# meta.json chứa loại mô hình, danh sách đặc trưng, tham số scaling và metrics;
+# file LATEST trỏ tới phiên bản mới nhất. Linear Regression chỉ lưu hệ số trong
+# meta.json nên dự đoán không cần import scikit-learn; XGBoost lưu booster ở định
+# dạng nhị phân UBJSON của xgboost.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REGISTRY_DIR = os.path.join(BASE_DIR, "models")
+# Cột mã hóa ngày của mô hình panel (XGBoostGlobal), cùng với cột Ticker kiểu categorical
+CALENDAR_FEATURES = ("DayOfWeek", "Month", "DayOfYear")
+
+
+def calendar_features(index):
+    """
+    Các cột mã hóa ngày (CALENDAR_FEATURES) từ DatetimeIndex.
+    """
+    return dict(zip(CALENDAR_FEATURES, (index.dayofweek, index.month, index.dayofyear)))
+
+
+def registry_dir(root=None):
+    return root or os.environ.get("MODEL_REGISTRY_DIR") or DEFAULT_REGISTRY_DIR
+
+
+def list_versions(name, root=None):
+    model_dir = os.path.join(registry_dir(root), name)
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(d for d in os.listdir(model_dir) if d.startswith("v") and d[1:].isdigit())
+
+
+def latest_version(name, root=None):
+    pointer = os.path.join(registry_dir(root), name, "LATEST")
+    if os.path.exists(pointer):
+        with open(pointer, "r") as f:
+            return f.read().strip()
+    versions = list_versions(name, root)
+    return versions[-1] if versions else None
+
+
+def _claim_version_dir(model_dir):
+    # mkdir là nguyên tử: nhiều tiến trình lưu cùng lúc sẽ nhận các số phiên bản khác nhau
+    os.makedirs(model_dir, exist_ok=True)
+    versions = [d for d in os.listdir(model_dir) if d.startswith("v") and d[1:].isdigit()]
+    number = max((int(d[1:]) for d in versions), default=0) + 1
+    while True:
+        version = f"v{number:04d}"
+        try:
+            os.mkdir(os.path.join(model_dir, version))
+            return version
+        except FileExistsError:
+            number += 1
+
+
+def save_model(name, model, features, scaling_params=None, target="Close", metrics=None, extra=None, root=None):
+    """
+    Lưu mô hình đã huấn luyện (LinearRegression hoặc XGBRegressor) thành phiên bản mới. Trả về tên phiên bản.
+    """
+    model_dir = os.path.join(registry_dir(root), name)
+    version = _claim_version_dir(model_dir)
+    version_dir = os.path.join(model_dir, version)
+
+    meta = {
+        "name": name,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "features": list(features),
+        "target": target,
+        "scaling_params": scaling_params,
+        "metrics": metrics or {},
+    }
+    meta.update(extra or {})
+    if hasattr(model, "get_booster"):
+        meta["kind"] = "xgboost"
+        meta["artifact"] = "model.ubj"
+        model.save_model(os.path.join(version_dir, "model.ubj"))
+    elif hasattr(model, "coef_"):
+        meta["kind"] = "linear"
+        meta["coef"] = np.asarray(model.coef_, dtype=float).tolist()
+        meta["intercept"] = float(model.intercept_)
+    else:
+        raise TypeError(f"Không hỗ trợ lưu mô hình kiểu {type(model).__name__}")
+
+    with open(os.path.join(version_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2, default=float)
+    # Cập nhật con trỏ LATEST sau cùng để không bao giờ trỏ tới phiên bản chưa ghi xong
+    with open(os.path.join(model_dir, "LATEST.tmp"), "w") as f:
+        f.write(version)
+    os.replace(os.path.join(model_dir, "LATEST.tmp"), os.path.join(model_dir, "LATEST"))
+    return version
+
+
+class RegisteredModel:
+    """
+    Mô hình đã nạp từ kho cùng metadata; predict nhận đặc trưng đã chuẩn hóa.
+    """
+
+    def __init__(self, meta, booster=None):
+        self.meta = meta
+        self.name = meta["name"]
+        self.version = meta["version"]
+        self.features = meta["features"]
+        self.scaling_params = meta.get("scaling_params")
+        self.booster = booster
+        self.ticker = None
+        if meta["kind"] == "linear":
+            self.coef = np.asarray(meta["coef"])
+            self.intercept = meta["intercept"]
+
+    def for_ticker(self, ticker):
+        """
+        Mô hình panel (có danh sách "tickers"): bản dùng min/max của ticker và tự thêm cột Ticker/ngày
+        khi chuẩn hóa. Mô hình một ticker được trả về nguyên vẹn.
+        """
+        tickers = self.meta.get("tickers")
+        if not tickers:
+            return self
+        if ticker not in tickers:
+            raise KeyError(f"{self.name}/{self.version} không được huấn luyện cho {ticker}")
+        model = RegisteredModel(dict(self.meta, scaling_params=self.meta["ticker_scaling"][ticker]), self.booster)
+        model.ticker = ticker
+        return model
+
+    def _matrix(self, X):
+        if hasattr(X, "columns"):
+            X = X[self.features]
+            if self.meta.get("categorical"):
+                # Giữ DataFrame để cột categorical (Ticker) đi vào DMatrix đúng kiểu
+                return X
+        return np.asarray(X, dtype=np.float64)
+
+    def predict(self, X):
+        """
+        Dự đoán giá trị đích đã chuẩn hóa từ ma trận đặc trưng đã chuẩn hóa.
+        """
+        X = self._matrix(X)
+        if self.booster is not None:
+            if hasattr(X, "columns"):
+                import xgboost as xgb
+                return self.booster.predict(xgb.DMatrix(X, enable_categorical=True))
+            return self.booster.inplace_predict(X)
+        return X @ self.coef + self.intercept
+
+    def inverse_scale(self, values):
+        params = self.scaling_params
+        if not params:
+            return values
+        return values * (params["Close_max"] - params["Close_min"]) + params["Close_min"]
+
+    def scale_features(self, df):
+        """
+        Chuẩn hóa đặc trưng thô bằng min/max từng cột đã lưu lúc tiền xử lý.
+        """
+        columns = (self.scaling_params or {}).get("columns")
+        if not columns:
+            raise ValueError(f"{self.name}/{self.version} không có min/max của từng cột để chuẩn hóa dữ liệu mới")
+        # Chuẩn hóa mọi cột có min/max (kể cả Close) vì đặc trưng bổ sung được tính từ các cột đã chuẩn hóa
+        names = [col for col in columns if col in df.columns]
+        scaled = df[names].astype(float).copy()
+        for col in names:
+            low, high = columns[col]
+            scaled[col] = (scaled[col] - low) / (high - low) if high != low else 0.
+        extra = [col for col in self.features if col not in scaled.columns]
+        if extra:
+            import feature_store
+            for col in extra:
+                if self.ticker is not None and (col == "Ticker" or col in CALENDAR_FEATURES):
+                    continue
+                scaled[col] = feature_store.compute(col, scaled)
+        if self.ticker is not None:
+            import pandas as pd
+            scaled["Ticker"] = pd.Categorical([self.ticker] * len(scaled), categories=self.meta["tickers"])
+            for col, values in calendar_features(scaled.index).items():
+                scaled[col] = values
+        return scaled[self.features]
+
+
+def load_model(name, version=None, root=None):
+    """
+    Nạp một phiên bản mô hình (mặc định phiên bản mới nhất).
+    """
+    version = version or latest_version(name, root)
+    if version is None:
+        raise FileNotFoundError(f"Chưa có mô hình '{name}' trong {registry_dir(root)}")
+    version_dir = os.path.join(registry_dir(root), name, version)
+    if not os.path.exists(os.path.join(version_dir, "meta.json")):
+        raise FileNotFoundError(f"Không có phiên bản {version} của mô hình '{name}' trong {registry_dir(root)}")
+    with open(os.path.join(version_dir, "meta.json"), "r") as f:
+        meta = json.load(f)
+
+    booster = None
+    if meta["kind"] == "xgboost":
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(os.path.join(version_dir, meta["artifact"]))
+    return RegisteredModel(meta, booster)
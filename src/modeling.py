@@ -4,10 +4,18 @@ import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import xgboost as xgb
+import compact_dtypes
+import feature_store
+import instrumentation
+import model_registry
+from streaming_preprocess import SPLIT_FILE, load_split
 # from tensorflow.keras.models import Sequential
 # from tensorflow.keras.layers import LSTM, Dense, Bidirectional
 # from tensorflow.keras.callbacks import EarlyStopping
 import os
+import json
+import time
+import contextlib
 
 def evaluate_metrics(y_true, y_pred, model_name):
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
@@ -24,16 +32,156 @@ def evaluate_metrics(y_true, y_pred, model_name):
     
     return {"Model": model_name, "RMSE": rmse, "MAE": mae, "R2": r2, "MAPE": mape}
 
-def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
+# Chính sách quyết định khi nào phải huấn luyện lại toàn bộ XGBoost thay vì boosting tiếp
+RETRAIN_POLICY = {
+    "max_incremental_updates": 20,  # số lần boosting tiếp tối đa kể từ lần fit đầy đủ gần nhất
+    "max_new_fraction": 0.25,       # số dòng mới vượt 25% tập train thì fit lại
+    "max_scale_drift": 0.05,        # min/max của một đặc trưng lệch quá 5% biên độ so với lần fit đầy đủ
+    "max_error_ratio": 1.5,         # RMSE trên dữ liệu mới vượt 1.5 lần RMSE validation lúc fit
+}
+XGB_PARAMS = {"n_estimators": 1000, "learning_rate": 0.01, "objective": 'reg:squarederror'}
+INCREMENTAL_ROUNDS = 100  # số cây tối đa thêm vào mỗi lần boosting tiếp
+REPLAY_ROWS = 60          # số dòng cũ gần nhất được học lại cùng dữ liệu mới
+EARLY_STOPPING_ROUNDS = 50
+
+
+def load_xgb_params(registry_root):
+    """
+    Tham số XGBoost: mặc định, ghi đè bởi models/xgboost_params.json nếu đã chạy tìm siêu tham số.
+    """
+    params = dict(XGB_PARAMS)
+    tuned_path = os.path.join(registry_root, "xgboost_params.json")
+    if os.path.exists(tuned_path):
+        with open(tuned_path, "r") as f:
+            tuned = json.load(f)
+        params.update(tuned["params"])
+        print(f"Using tuned XGBoost params from study '{tuned.get('study')}'")
+    return params
+
+
+def _rmse(y_true, y_pred):
+    return float(np.sqrt(mean_squared_error(y_true, y_pred)))
+
+
+def _scale_drift(base_columns, columns):
+    # Độ lệch lớn nhất của min/max từng cột, tính theo tỉ lệ biên độ lúc fit đầy đủ
+    drift = 0.0
+    for col, (low, high) in base_columns.items():
+        if col not in columns:
+            return float("inf")
+        span = (high - low) or 1.0
+        drift = max(drift, abs(columns[col][0] - low) / span, abs(columns[col][1] - high) / span)
+    return drift
+
+
+def decide_retrain(previous, features, scaling_params, n_new, n_train, new_rmse=None, policy=None):
+    """
+    Chọn cách cập nhật XGBoost: "full" (fit lại), "incremental" (boosting tiếp từ booster cũ)
+    hoặc "reuse" (không có dữ liệu mới). Trả về (chế độ, lý do).
+    """
+    policy = {**RETRAIN_POLICY, **(policy or {})}
+    if previous is None:
+        return "full", "chưa có mô hình đã lưu"
+    meta = previous.meta
+    if meta["features"] != list(features):
+        return "full", "danh sách đặc trưng thay đổi"
+    if n_new == 0:
+        return "reuse", "không có dữ liệu mới"
+    if meta.get("incremental_updates", 0) >= policy["max_incremental_updates"]:
+        return "full", f"đã boosting tiếp {meta['incremental_updates']} lần"
+    if n_new > policy["max_new_fraction"] * n_train:
+        return "full", f"{n_new} dòng mới (> {policy['max_new_fraction']:.0%} tập train)"
+    base_columns = meta.get("base_scaling")
+    columns = (scaling_params or {}).get("columns")
+    if not base_columns or not columns:
+        return "full", "thiếu min/max từng cột để so sánh thang đo"
+    drift = _scale_drift(base_columns, columns)
+    if drift > policy["max_scale_drift"]:
+        return "full", f"thang đo đặc trưng lệch {drift:.1%}"
+    if new_rmse is not None and meta.get("val_rmse") and new_rmse > policy["max_error_ratio"] * meta["val_rmse"]:
+        return "full", f"RMSE trên dữ liệu mới {new_rmse:.4f} > {policy['max_error_ratio']}x validation"
+    return "incremental", f"{n_new} dòng mới"
+
+
+def train_xgboost_incremental(X_train, y_train, scaling_params, registry_root, policy=None, params=None):
+    """
+    Cập nhật XGBoost theo chính sách decide_retrain: boosting tiếp từ booster đã lưu trên các
+    dòng mới (kèm REPLAY_ROWS dòng cũ) hoặc fit lại toàn bộ, đều dùng tree_method="hist"
+    và early stopping trên 10% dòng train gần nhất (không được fit ở cả hai chế độ).
+    Trả về (mô hình, thông tin để lưu vào kho).
+    """
+    try:
+        previous = model_registry.load_model("XGBoost", root=registry_root)
+    except FileNotFoundError:
+        previous = None
+
+    # 10% dòng cuối chỉ dùng để early stopping / val_rmse, không bao giờ nằm trong đoạn được fit;
+    # train_end là dòng cuối booster thực sự học nên lần sau các dòng validation này được học tiếp
+    n_val = max(1, int(len(X_train) * 0.1))
+    fit_end = len(X_train) - n_val
+    X_val, y_val = X_train.iloc[fit_end:], y_train.iloc[fit_end:]
+
+    new_mask = np.ones(len(X_train), dtype=bool)
+    new_rmse = None
+    if previous is not None and previous.meta.get("train_end"):
+        new_mask = X_train.index > pd.Timestamp(previous.meta["train_end"])
+        if new_mask.any() and previous.meta["features"] == list(X_train.columns):
+            new_rmse = _rmse(y_train[new_mask], previous.predict(X_train[new_mask]))
+    # Chỉ các dòng mới nằm trước đoạn validation mới được boosting tiếp
+    mode, reason = decide_retrain(previous, X_train.columns, scaling_params, int(new_mask[:fit_end].sum()),
+                                  len(X_train), new_rmse, policy)
+    print(f"XGBoost: {mode} ({reason})")
+
+    info = {"mode": mode, "reason": reason, "train_end": str(X_train.index[fit_end - 1])}
+    if mode == "reuse":
+        model = xgb.XGBRegressor()
+        model.load_model(bytearray(previous.booster.save_raw("ubj")))
+        return model, None
+
+    if mode == "full":
+        model = xgb.XGBRegressor(**{**XGB_PARAMS, **(params or {})}, tree_method="hist",
+                                 early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        model.fit(X_train.iloc[:fit_end], y_train.iloc[:fit_end], eval_set=[(X_val, y_val)], verbose=False)
+        info.update(incremental_updates=0, base_scaling=(scaling_params or {}).get("columns"),
+                    base_version=None)
+    else:
+        # Dữ liệu mới cộng một đoạn dữ liệu cũ ngay trước đó để cây mới không chỉ học vài ngày gần nhất
+        start = max(0, int(np.argmax(new_mask)) - REPLAY_ROWS)
+        model = xgb.XGBRegressor(**{**XGB_PARAMS, **(params or {}), "n_estimators": INCREMENTAL_ROUNDS},
+                                 tree_method="hist", early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        model.fit(X_train.iloc[start:fit_end], y_train.iloc[start:fit_end], eval_set=[(X_val, y_val)],
+                  xgb_model=previous.booster, verbose=False)
+        info.update(incremental_updates=previous.meta.get("incremental_updates", 0) + 1,
+                    base_scaling=previous.meta.get("base_scaling"),
+                    base_version=previous.meta.get("base_version") or previous.version)
+    info["val_rmse"] = _rmse(y_val, model.predict(X_val))
+    info["n_trees"] = model.get_booster().num_boosted_rounds()
+    return model, info
+
+
+def run_modeling(train_file="train_data.csv", test_file="test_data.csv", output_dir=None, incremental=False,
+                 compact=False, ticker="FPT.VN", extra_features=()):
     """
     Huấn luyện và đánh giá các mô hình: Linear Regression, XGBoost, BiLSTM.
+    incremental: cập nhật XGBoost từ phiên bản đã lưu thay vì fit lại 1000 cây (xem decide_retrain).
+    compact: đọc và huấn luyện trên đặc trưng float32 (xem compact_dtypes).
+    extra_features: đặc trưng bổ sung từ kho đặc trưng (feature_store.ON_DEMAND), tính một lần rồi lưu lại.
     """
     import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_processed_dir = os.path.join(base_dir, "data", "processed")
     results_dir = os.path.join(base_dir, "results", "figures")
     metrics_path = os.path.join(base_dir, "results", "metrics.csv")
     scaling_params_path = os.path.join(data_processed_dir, "scaling_params.json")
+    os.makedirs(results_dir, exist_ok=True)
+
+    # Mặc định đọc qua kho đặc trưng (memmap của preprocessed_data.csv, train/test là khoảng dòng);
+    # chỉ đọc CSV train/test khi được truyền file riêng
+    use_store = (train_file == "train_data.csv" and test_file == "test_data.csv"
+                 and os.path.exists(os.path.join(data_processed_dir, "preprocessed_data.csv")))
+    # Tiền xử lý theo khối chỉ ghi preprocessed_data.csv, train/test là khoảng chỉ số trong split.json
+    use_split = (train_file == "train_data.csv" and test_file == "test_data.csv"
+                 and os.path.exists(os.path.join(data_processed_dir, SPLIT_FILE)))
 
     # Override defaults with correct paths if not specified or if defaults are filenames
     if train_file == "train_data.csv":
@@ -41,7 +189,7 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
     if test_file == "test_data.csv":
          test_file = os.path.join(data_processed_dir, "test_data.csv")
 
-    if not os.path.exists(train_file) or not os.path.exists(test_file):
+    if not use_store and not use_split and (not os.path.exists(train_file) or not os.path.exists(test_file)):
         print("Lỗi: Không tìm thấy file dữ liệu train/test.")
         return
 
@@ -51,7 +199,7 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
     if os.path.exists(scaling_params_path):
         with open(scaling_params_path, "r") as f:
             scaling_params = json.load(f)
-        print(f"Loaded scaling params: {scaling_params}")
+        print(f"Loaded scaling params: Close_min={scaling_params['Close_min']}, Close_max={scaling_params['Close_max']}")
     else:
         print("Warning: Scaling params not found. Predictions will be normalized.")
 
@@ -65,19 +213,34 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
 
     # 1. Load Data
     print("Loading data...")
-    train_df = pd.read_csv(train_file, index_col='Date', parse_dates=True)
-    test_df = pd.read_csv(test_file, index_col='Date', parse_dates=True)
-
-    # Xác định Features (X) và Target (y)
-    # Target là 'Close'. Features là tất cả trừ 'Close', 'Outlier'.
-    
-    features = [c for c in train_df.columns if c not in ['Close', 'Outlier']]
     target = 'Close'
-    
-    X_train = train_df[features]
-    y_train = train_df[target]
-    X_test = test_df[features]
-    y_test = test_df[target]
+    with instrumentation.track("model.load") as record:
+        if use_store:
+            store = feature_store.materialize(ticker, data_processed_dir, compact=compact,
+                                              root=os.path.join(base_dir, "data", "features"))
+            features = store.features + [f for f in extra_features if f not in store.features]
+            # Không có đặc trưng bổ sung: X là view của memmap, LR và XGBoost dùng chung một vùng nhớ
+            X_train, X_test = store.frame("train", features), store.frame("test", features)
+            y_train, y_test = store.target("train"), store.target("test")
+            print(f"   - Kho đặc trưng {ticker}/{store.version}: {len(features)} đặc trưng")
+        else:
+            if use_split:
+                train_df = load_split(data_processed_dir, "train", compact=compact)
+                test_df = load_split(data_processed_dir, "test", compact=compact)
+            else:
+                train_df = compact_dtypes.read_csv(train_file, compact=compact)
+                test_df = compact_dtypes.read_csv(test_file, compact=compact)
+            if extra_features:
+                print("Warning: Đặc trưng bổ sung chỉ có khi đọc qua kho đặc trưng, bỏ qua.")
+
+            # Xác định Features (X) và Target (y)
+            # Target là 'Close'. Features là tất cả trừ 'Close', 'Outlier'.
+            features = [c for c in train_df.columns if c not in ['Close', 'Outlier']]
+            X_train = train_df[features]
+            y_train = train_df[target]
+            X_test = test_df[features]
+            y_test = test_df[target]
+        record["rows"] = len(X_train) + len(X_test)
 
     # Inverse Transform Target for Validation/Reporting
     y_test_original = inverse_scale(y_test)
@@ -89,8 +252,9 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
 
     # 2. Baseline Model: Linear Regression
     print("\nTraining Linear Regression...")
-    lr_model = LinearRegression()
-    lr_model.fit(X_train, y_train)
+    with instrumentation.track("model.linear_regression_fit", rows=len(X_train)):
+        lr_model = LinearRegression()
+        lr_model.fit(X_train, y_train)
     y_pred_lr_scaled = lr_model.predict(X_test)
     y_pred_lr = inverse_scale(y_pred_lr_scaled)
     predictions['LinearRegression'] = y_pred_lr
@@ -98,9 +262,19 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
 
     # 3. Machine Learning Model: XGBoost
     print("\nTraining XGBoost...")
-    xgb_model = xgb.XGBRegressor(n_estimators=1000, learning_rate=0.01, objective='reg:squarederror')
-    xgb_model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False) # Train on scaled data
-    y_pred_xgb_scaled = xgb_model.predict(X_test)
+    registry_root = os.path.join(base_dir, "models")
+    xgb_info = {"mode": "full", "incremental_updates": 0,
+                "base_scaling": (scaling_params or {}).get("columns")}
+    xgb_params = load_xgb_params(registry_root)
+    with instrumentation.track("model.xgboost_fit", rows=len(X_train)):
+        if incremental:
+            xgb_model, xgb_info = train_xgboost_incremental(X_train, y_train, scaling_params, registry_root,
+                                                            params=xgb_params)
+        else:
+            xgb_model = xgb.XGBRegressor(**xgb_params)
+            xgb_model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False) # Train on scaled data
+    with instrumentation.track("model.xgboost_predict", rows=len(X_test)):
+        y_pred_xgb_scaled = xgb_model.predict(X_test)
     y_pred_xgb = inverse_scale(y_pred_xgb_scaled)
     predictions['XGBoost'] = y_pred_xgb
     results.append(evaluate_metrics(y_test_original, y_pred_xgb, "XGBoost"))
@@ -150,7 +324,160 @@ def run_modeling(train_file="train_data.csv", test_file="test_data.csv"):
     predictions.to_csv(os.path.join(base_dir, "results", "predictions.csv"))
     print("   - Saved 'predictions.csv'")
 
+    # 7. Lưu mô hình vào kho để dự đoán sau này không phải huấn luyện lại
+    train_range = [str(X_train.index.min()), str(X_train.index.max())]
+    extra = {"ticker": ticker, "train_rows": len(X_train), "train_range": train_range,
+             "train_end": train_range[1],
+             "extra_features": [f for f in features if f in feature_store.ON_DEMAND]}
+    if use_store:
+        extra["feature_store"] = {"ticker": ticker, "version": store.version}
+    to_save = [("LinearRegression", lr_model, results[0], extra)]
+    if xgb_info is not None:
+        # xgb_info là None khi dùng lại nguyên booster cũ (không có dữ liệu mới)
+        to_save.append(("XGBoost", xgb_model, results[1], {**extra, **xgb_info}))
+    for name, model, metrics, model_extra in to_save:
+        version = model_registry.save_model(name, model, features, scaling_params, target=target,
+                                            metrics=metrics, root=registry_root, extra=model_extra)
+        print(f"   - Saved model {name} {version} to '{registry_root}'")
+
     print("Modeling Completed.")
+    return results_df
+
+def load_ticker_frames(sources, compact=False):
+    """
+    Đọc train/test đã tiền xử lý và tham số scaling của từng ticker (dict ticker -> thư mục data/processed).
+    """
+    frames = {}
+    for ticker, processed_dir in sources.items():
+        train_df = load_split(processed_dir, "train", compact=compact)
+        test_df = load_split(processed_dir, "test", compact=compact)
+        if train_df is None or test_df is None:
+            print(f"Lỗi: Không tìm thấy file dữ liệu train/test của {ticker}, bỏ qua.")
+            continue
+        scaling_params = {}
+        scaling_params_path = os.path.join(processed_dir, "scaling_params.json")
+        if os.path.exists(scaling_params_path):
+            with open(scaling_params_path, "r") as f:
+                scaling_params = json.load(f)
+        frames[ticker] = {
+            "train": train_df,
+            "test": test_df,
+            "scaling": scaling_params,
+        }
+    return frames
+
+
+def stack_panel(frames, part, compact=False):
+    """
+    Ghép frame của các ticker thành một ma trận, thêm mã ticker (categorical) và mã hóa ngày.
+    Các đặc trưng đã được chuẩn hóa [0, 1] theo từng ticker nên so sánh được giữa các ticker.
+    compact: mã hóa ngày bằng int8/int16 thay vì int32.
+    """
+    panel = pd.concat([data[part] for data in frames.values()])
+    # Tạo thẳng mã categorical, không qua cột chuỗi object cho từng dòng
+    codes = np.repeat(np.arange(len(frames), dtype=np.int32), [len(data[part]) for data in frames.values()])
+    panel['Ticker'] = pd.Categorical.from_codes(codes, categories=list(frames))
+    calendar_dtypes = (np.int8, np.int8, np.int16) if compact else (None, None, None)
+    for (col, values), dtype in zip(model_registry.calendar_features(panel.index).items(), calendar_dtypes):
+        panel[col] = values if dtype is None else values.astype(dtype)
+    return panel
+
+
+def _inverse_scale_panel(values, tickers, frames):
+    close_min = tickers.map({t: data["scaling"].get("Close_min", 0.0) for t, data in frames.items()})
+    close_max = tickers.map({t: data["scaling"].get("Close_max", 1.0) for t, data in frames.items()})
+    return values * (np.asarray(close_max, dtype=float) - np.asarray(close_min, dtype=float)) \
+        + np.asarray(close_min, dtype=float)
+
+
+def _per_ticker_metrics(y_true, y_pred, tickers, model_name):
+    rows = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for ticker in tickers.cat.categories:
+            mask = np.asarray(tickers == ticker)
+            if mask.any():
+                rows.append({"Ticker": ticker, **evaluate_metrics(y_true[mask], y_pred[mask], model_name)})
+    return rows
+
+
+def run_global_modeling(sources, output_dir=None, compare=True, compact=False):
+    """
+    Huấn luyện một XGBoost chung cho cả universe trên ma trận ghép từ mọi ticker và dự đoán tất cả
+    ticker trong một lần predict. compare=True: huấn luyện thêm từng mô hình riêng cho mỗi ticker
+    để so sánh thời gian và độ chính xác. Ghi results/global_model_metrics.csv.
+    compact: panel float32 với mã ticker/ngày kiểu nguyên nhỏ (xem compact_dtypes).
+    """
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results_path = os.path.join(base_dir, "results", "global_model_metrics.csv")
+    registry_root = os.path.join(base_dir, "models")
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+
+    print("Loading data...")
+    frames = load_ticker_frames(sources, compact=compact)
+    if not frames:
+        print("Lỗi: Không có ticker nào có dữ liệu train/test.")
+        return
+    train = stack_panel(frames, "train", compact=compact)
+    test = stack_panel(frames, "test", compact=compact)
+    features = [c for c in train.columns if c not in ['Close', 'Outlier']]
+    ticker_features = [c for c in features if c not in ['Ticker', *model_registry.CALENDAR_FEATURES]]
+    y_true = _inverse_scale_panel(test['Close'].to_numpy(), test['Ticker'], frames)
+    print(f"Panel: {len(frames)} ticker, train {len(train)} dòng, test {len(test)} dòng "
+          f"({compact_dtypes.frame_nbytes(train) / 2**20:.1f} MB train)")
+
+    params = load_xgb_params(registry_root)
+    timings = []
+    print("\nTraining global XGBoost...")
+    global_model = xgb.XGBRegressor(**params, tree_method="hist", enable_categorical=True)
+    with instrumentation.track("model.global_fit", rows=len(train)) as fit:
+        global_model.fit(train[features], train['Close'], verbose=False)
+    with instrumentation.track("model.global_predict", rows=len(test)) as predict:
+        # Một lần predict cho mọi ticker
+        y_pred = _inverse_scale_panel(global_model.predict(test[features]), test['Ticker'], frames)
+    metrics = _per_ticker_metrics(y_true, y_pred, test['Ticker'], "XGBoost (global)")
+    pooled = [evaluate_metrics(y_true, y_pred, "XGBoost (global, pooled)")]
+    timings.append({"Model": "XGBoost (global)", "fit_seconds": fit["seconds"],
+                    "predict_seconds": predict["seconds"]})
+
+    if compare:
+        print("\nTraining per-ticker XGBoost models...")
+        y_pred_local = np.empty(len(test))
+        fit_seconds = predict_seconds = 0.0
+        offset = 0
+        for ticker, data in frames.items():
+            model = xgb.XGBRegressor(**params, tree_method="hist")
+            started = time.perf_counter()
+            model.fit(data["train"][ticker_features], data["train"]['Close'], verbose=False)
+            fit_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            y_pred_local[offset:offset + len(data["test"])] = model.predict(data["test"][ticker_features])
+            predict_seconds += time.perf_counter() - started
+            offset += len(data["test"])
+        y_pred_local = _inverse_scale_panel(y_pred_local, test['Ticker'], frames)
+        metrics += _per_ticker_metrics(y_true, y_pred_local, test['Ticker'], "XGBoost (per-ticker)")
+        pooled.append(evaluate_metrics(y_true, y_pred_local, "XGBoost (per-ticker, pooled)"))
+        timings.append({"Model": "XGBoost (per-ticker)", "fit_seconds": fit_seconds,
+                        "predict_seconds": predict_seconds})
+
+    metrics_df = pd.DataFrame(metrics)
+    metrics_df.to_csv(results_path, index=False)
+    summary = metrics_df.groupby("Model")[["RMSE", "MAE", "R2", "MAPE"]].mean().reset_index()
+    summary = summary.merge(pd.DataFrame(timings), on="Model")
+    summary["train_rows_per_sec"] = len(train) / summary["fit_seconds"]
+    summary["predict_rows_per_sec"] = len(test) / summary["predict_seconds"]
+    print("\n--- Global vs Per-ticker (trung bình theo ticker) ---")
+    print(summary.to_markdown(index=False))
+    print(f"   - Saved per-ticker metrics to '{results_path}'")
+
+    version = model_registry.save_model("XGBoostGlobal", global_model, features, target="Close",
+                                        metrics=pooled[0], root=registry_root,
+                                        extra={"tickers": list(frames), "train_rows": len(train),
+                                               "categorical": ["Ticker"],
+                                               # predict chuẩn hóa và đổi ngược theo min/max của từng ticker
+                                               "ticker_scaling": {t: data["scaling"] for t, data in frames.items()}})
+    print(f"   - Saved model XGBoostGlobal {version} to '{registry_root}'")
+    return summary
+
 
 if __name__ == "__main__":
     run_modeling()
@@ -0,0 +1,163 @@
+import numpy as np
+
+# Tính chỉ báo kỹ thuật trên panel 2 chiều (ticker x ngày) trong một lượt.
+# Các hàm lặp theo trục thời gian nhưng mỗi bước xử lý toàn bộ ticker cùng lúc
+# bằng NumPy, và dùng đúng công thức truy hồi của pandas (ewm adjust=False,
+# rolling mean có bù Kahan) nên kết quả trùng với calculate_rsi / calculate_macd /
+# rolling(window).mean() trong preprocess_data.py, kể cả NaN ở đầu chuỗi
+# (ticker niêm yết muộn) và NaN xen giữa.
+
+
+def _as_panel(panel):
+    panel = np.asarray(panel, dtype=np.float64)
+    if panel.ndim == 1:
+        panel = panel[np.newaxis, :]
+    return panel
+
+
+def _center_of_mass(com=None, span=None, alpha=None):
+    # Giống pandas.core.window.ewm.get_center_of_mass
+    if com is not None:
+        return float(com)
+    if span is not None:
+        return float((span - 1) / 2)
+    return float((1 - alpha) / alpha)
+
+
+def ewm_mean(panel, com=None, span=None, alpha=None):
+    """
+    Tương đương Series.ewm(..., adjust=False).mean() cho từng hàng của panel.
+    """
+    # Duyệt theo thời gian trên bản chuyển vị (ngày x ticker) để mỗi bước đọc một hàng liên tục
+    x = np.ascontiguousarray(_as_panel(panel).T)
+    n_days, n_tickers = x.shape
+    out = np.empty_like(x)
+    if n_days == 0:
+        return out.T
+
+    alpha = 1. / (1. + _center_of_mass(com, span, alpha))
+    old_wt_factor = 1. - alpha
+    new_wt = alpha
+
+    weighted = x[0].copy()
+    out[0] = weighted
+    if not np.isnan(x).any():
+        # Không có NaN: old_wt luôn bằng old_wt_factor sau mỗi bước
+        denominator = old_wt_factor + new_wt
+        for t in range(1, n_days):
+            cur = x[t]
+            blended = (old_wt_factor * weighted + new_wt * cur) / denominator
+            weighted = np.where(weighted != cur, blended, weighted)
+            out[t] = weighted
+        return out.T
+
+    old_wt = np.ones(n_tickers)
+    for t in range(1, n_days):
+        cur = x[t]
+        is_observation = cur == cur
+        has_value = weighted == weighted
+
+        old_wt = np.where(has_value, old_wt * old_wt_factor, old_wt)
+        update = has_value & is_observation & (weighted != cur)
+        blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+        weighted = np.where(update, blended, weighted)
+        old_wt = np.where(has_value & is_observation, 1., old_wt)
+        # Ticker chưa có giá trị nào: bắt đầu từ quan sát đầu tiên
+        weighted = np.where(~has_value & is_observation, cur, weighted)
+        out[t] = weighted
+    return out.T
+
+
+def diff(panel):
+    x = _as_panel(panel)
+    delta = np.full_like(x, np.nan)
+    delta[:, 1:] = x[:, 1:] - x[:, :-1]
+    return delta
+
+
+def rsi(panel, period=14):
+    """
+    RSI cho từng hàng của panel, cùng công thức với calculate_rsi.
+    """
+    delta = diff(panel)
+    gain = ewm_mean(np.where(delta > 0, delta, 0), alpha=1/period)
+    loss = ewm_mean(-np.where(delta < 0, delta, 0), alpha=1/period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = gain / loss
+        return 100 - (100 / (1 + rs))
+
+
+def macd(panel, fast=12, slow=26, signal=9):
+    """
+    MACD và đường tín hiệu cho từng hàng của panel, cùng công thức với calculate_macd.
+    """
+    macd_line = ewm_mean(panel, span=fast) - ewm_mean(panel, span=slow)
+    return macd_line, ewm_mean(macd_line, span=signal)
+
+
+def sma(panel, window):
+    """
+    Tương đương Series.rolling(window=window).mean() cho từng hàng của panel.
+    """
+    x = np.ascontiguousarray(_as_panel(panel).T)
+    n_days, n_tickers = x.shape
+    out = np.empty_like(x)
+
+    nobs = np.zeros(n_tickers, dtype=np.int64)
+    neg_ct = np.zeros(n_tickers, dtype=np.int64)
+    sum_x = np.zeros(n_tickers)
+    compensation_add = np.zeros(n_tickers)
+    compensation_remove = np.zeros(n_tickers)
+    same_count = np.zeros(n_tickers, dtype=np.int64)
+    prev_value = np.full(n_tickers, np.nan)
+
+    for t in range(n_days):
+        if t >= window:
+            # Bỏ giá trị ra khỏi cửa sổ (tổng có bù Kahan như pandas)
+            val = x[t - window]
+            valid = val == val
+            y = -val - compensation_remove
+            total = sum_x + y
+            compensation_remove = np.where(valid, total - sum_x - y, compensation_remove)
+            sum_x = np.where(valid, total, sum_x)
+            nobs -= valid
+            neg_ct -= valid & np.signbit(val)
+
+        val = x[t]
+        valid = val == val
+        y = val - compensation_add
+        total = sum_x + y
+        compensation_add = np.where(valid, total - sum_x - y, compensation_add)
+        sum_x = np.where(valid, total, sum_x)
+        nobs += valid
+        neg_ct += valid & np.signbit(val)
+        same_count = np.where(valid, np.where(val == prev_value, same_count + 1, 1), same_count)
+        prev_value = np.where(valid, val, prev_value)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = sum_x / nobs
+        # Chuỗi hằng số trả về đúng giá trị đó; giữ dấu khi mọi giá trị cùng dấu
+        result = np.where(same_count >= nobs, prev_value, result)
+        result = np.where((neg_ct == 0) & (result < 0), 0., result)
+        result = np.where((neg_ct == nobs) & (result > 0), 0., result)
+        out[t] = np.where(nobs >= window, result, np.nan)
+    return out.T
+
+
+def compute_indicators(close):
+    """
+    Tính toàn bộ chỉ báo dùng trong preprocess_stock_data cho panel giá đóng cửa (ticker x ngày).
+    Trả về dict tên cột -> mảng (ticker x ngày).
+    """
+    close = _as_panel(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = np.log(close / np.concatenate([np.full((close.shape[0], 1), np.nan), close[:, :-1]], axis=1))
+    macd_line, signal_line = macd(close)
+    return {
+        "Log_Returns": log_returns,
+        "RSI_14": rsi(close, period=14),
+        "MACD_12_26_9": macd_line,
+        "MACDs_12_26_9": signal_line,
+        "SMA_7": sma(close, 7),
+        "SMA_30": sma(close, 30),
+    }
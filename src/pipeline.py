@@ -0,0 +1,206 @@
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import instrumentation
+
+# Bộ chạy pipeline dạng DAG: mỗi stage khai báo hàm thực thi ("module:hàm"),
+# tham số, các file/thư mục đầu vào, đầu ra và stage phụ thuộc. Khóa của stage
+# là hash nội dung của đầu vào + tham số + mã nguồn module; nếu khóa không đổi
+# và đầu ra còn nguyên thì stage được bỏ qua. Các stage độc lập (ví dụ EDA và
+# modeling) chạy song song trong process pool.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+STATE_PATH = os.path.join(BASE_DIR, "data", ".pipeline_state.json")
+
+
+class Stage:
+    def __init__(self, name, func, title=None, params=None, inputs=(), outputs=(), deps=(), always_run=False):
+        self.name = name
+        self.func = func
+        self.title = title or name
+        self.params = params or {}
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        # Stage có đầu vào bên ngoài (ví dụ tải dữ liệu qua mạng) không thể băm trước
+        self.always_run = always_run
+
+    @property
+    def module_path(self):
+        return os.path.join(SRC_DIR, self.func.split(":")[0] + ".py")
+
+
+def _resolve(func):
+    module_name, func_name = func.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _run_stage(name, title, func, params):
+    # Chạy trong tiến trình con; bỏ giá trị trả về (DataFrame...) để khỏi phải pickle về,
+    # chỉ gửi về thời gian chạy và các bản ghi đo đạc của stage
+    print(f"\n--- {title} ---")
+    instrumentation.reset()
+    try:
+        with instrumentation.track(name) as record:
+            result = _resolve(func)(**params)
+    finally:
+        sys.stdout.flush()
+    # Các hàm stage báo lỗi bằng cách in "Lỗi: ..." rồi trả về None: coi là thất bại để không lưu khóa
+    if result is None:
+        raise RuntimeError(f"{func} không trả về kết quả")
+    return record["seconds"], instrumentation.records()
+
+
+class FileHasher:
+    """
+    Băm nội dung file, có cache theo (kích thước, mtime) để không đọc lại file chưa đổi.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cache[path] = [signature, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        if not os.path.exists(path):
+            return None
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        # Thư mục: băm các file dữ liệu theo thứ tự, bỏ qua file metadata (_manifest.json, .tmp...)
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")) and not d.endswith(".tmp"))
+            for name in sorted(files):
+                if name.startswith((".", "_")):
+                    continue
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).encode())
+                digest.update(self.file_hash(full).encode())
+        return digest.hexdigest()
+
+
+def stage_key(stage, hasher):
+    payload = {
+        "func": stage.func,
+        "params": stage.params,
+        "inputs": {path: hasher.path_hash(path) for path in stage.inputs},
+        "code": hasher.path_hash(stage.module_path),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _load_state(path):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _check_graph(stages):
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' phụ thuộc stage không tồn tại: {missing}")
+
+    # Phát hiện chu trình bằng cách sắp xếp topo
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Pipeline có chu trình phụ thuộc: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_pipeline(stages, only=None, force=False, max_workers=None, state_path=STATE_PATH):
+    """
+    Chạy các stage theo thứ tự phụ thuộc. only: danh sách tên stage cần chạy (các stage
+    khác coi như đã xong), force: bỏ qua cache. Trả về dict tên stage -> trạng thái.
+    """
+    _check_graph(stages)
+    if only:
+        unknown = set(only) - {stage.name for stage in stages}
+        if unknown:
+            raise ValueError(f"Stage không tồn tại: {sorted(unknown)}")
+
+    state = _load_state(state_path)
+    hasher = FileHasher(state.get("files"))
+    by_name = {stage.name: stage for stage in stages}
+    # Stage không được chọn coi như đầu ra đã có sẵn
+    status = {stage.name: "not selected" for stage in stages if only and stage.name not in only}
+    pending = [stage for stage in stages if stage.name not in status]
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if any(status.get(dep) not in ("done", "skipped", "not selected") for dep in stage.deps):
+                    if any(status.get(dep) == "failed" for dep in stage.deps):
+                        pending.remove(stage)
+                        status[stage.name] = "failed"
+                        print(f"\n--- {stage.title}: bỏ qua do stage phụ thuộc bị lỗi ---")
+                    continue
+
+                pending.remove(stage)
+                key = stage_key(stage, hasher)
+                previous = state["stages"].get(stage.name, {}).get("key")
+                outputs_ok = all(os.path.exists(path) for path in stage.outputs)
+                if not force and not stage.always_run and key == previous and outputs_ok:
+                    status[stage.name] = "skipped"
+                    print(f"\n--- {stage.title}: không đổi, bỏ qua ---")
+                    continue
+
+                sys.stdout.flush()
+                future = pool.submit(_run_stage, stage.name, stage.title, stage.func, stage.params)
+                running[future] = (stage, key)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, key = running.pop(future)
+                try:
+                    elapsed, stage_records = future.result()
+                except Exception as e:
+                    status[stage.name] = "failed"
+                    print(f"Lỗi ở stage '{stage.name}': {type(e).__name__}: {e}")
+                    continue
+
+                status[stage.name] = "done"
+                instrumentation.add_records(stage_records)
+                # Với stage always_run, khóa lưu lại dựa trên tham số/mã nguồn lúc chạy
+                state["stages"][stage.name] = {"key": key, "elapsed": elapsed,
+                                               "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                state["files"] = hasher.cache
+                _save_state(state, state_path)
+
+    # Giữ nguyên thứ tự khai báo khi báo cáo
+    return {name: status[name] for name in by_name}
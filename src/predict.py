@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import market_store
+import model_registry
+from technical_indicators import calculate_rsi, calculate_macd
+
+# Chế độ chỉ dự đoán: nạp mô hình mới nhất từ kho mô hình, tính đặc trưng cho các
+# bar mới nhất trong kho dữ liệu (cùng công thức với preprocess_stock_data), chuẩn hóa
+# bằng min/max đã lưu và dự đoán, không cần huấn luyện lại.
+
+LAGS = 3
+
+
+def build_features(df):
+    """
+    Tạo các cột đặc trưng giống preprocess_stock_data (chưa chuẩn hóa) từ DataFrame OHLCV.
+    """
+    features = df.interpolate(method='linear')
+    features['Log_Returns'] = np.log(features['Close'] / features['Close'].shift(1))
+    features['RSI_14'] = calculate_rsi(features['Close'], period=14)
+    features['MACD_12_26_9'], features['MACDs_12_26_9'] = calculate_macd(features['Close'])
+    features['SMA_7'] = features['Close'].rolling(window=7).mean()
+    features['SMA_30'] = features['Close'].rolling(window=30).mean()
+    # Giống bfill/ffill của bản batch cho các bar khởi động
+    features = features.bfill().ffill()
+    for i in range(1, LAGS + 1):
+        features[f'Close_Lag_{i}'] = features['Close'].shift(i)
+    return features.dropna()
+
+
+def predict_latest(ticker="FPT.VN", model_name="XGBoost", rows=1, version=None, root=None):
+    """
+    Dự đoán giá đóng cửa cho `rows` bar mới nhất của ticker bằng mô hình đã lưu.
+    Trả về DataFrame (Date, Actual, Prediction).
+    """
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
+        return
+
+    started = time.perf_counter()
+    try:
+        model = model_registry.load_model(model_name, version=version, root=root)
+        # Mô hình panel (XGBoostGlobal) dùng min/max riêng của ticker
+        model = model.for_ticker(ticker)
+    except FileNotFoundError as e:
+        print(f"Lỗi: {e}. Hãy chạy 'python main.py model' trước.")
+        return
+    except KeyError as e:
+        print(f"Lỗi: {e.args[0]}")
+        return
+    loaded = time.perf_counter()
+
+    features = build_features(market_store.load_ohlcv(ticker))
+    # Chuẩn hóa trên cả lịch sử để đặc trưng bổ sung dạng cửa sổ trượt có đủ dữ liệu
+    scaled = model.scale_features(features).iloc[-rows:]
+    features = features.iloc[-rows:]
+    prediction = model.inverse_scale(model.predict(scaled))
+    finished = time.perf_counter()
+
+    result = pd.DataFrame({"Actual": features['Close'], "Prediction": np.asarray(prediction)},
+                          index=features.index)
+    print(f"--- {model.name} {model.version} ({ticker}) ---")
+    print(result.to_markdown())
+    print(f"Nạp mô hình: {(loaded - started) * 1000:.1f} ms, "
+          f"đặc trưng + dự đoán: {(finished - loaded) * 1000:.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    predict_latest()
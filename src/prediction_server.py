@@ -0,0 +1,321 @@
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import model_registry
+
+# Dịch vụ dự đoán HTTP cục bộ (asyncio, không cần mạng ngoài):
+#   POST /predict  {"model": "XGBoost", "rows": [{đặc trưng: giá trị đã chuẩn hóa}, ...]}
+#                  hoặc {"model": "XGBoost", "ticker": "FPT.VN"} (dòng mới nhất trong data/processed; ticker
+#                  khác mô hình trong models/ dùng mô hình và dữ liệu của universe/<ticker>/)
+#   GET  /metrics  histogram độ trễ và kích thước batch (định dạng Prometheus)
+#   GET  /health
+# Mô hình được nạp một lần khi khởi động. Các request đến cùng lúc được gom thành
+# micro-batch (tối đa max_batch dòng hoặc chờ max_wait_ms) và dự đoán bằng một lần predict.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def prometheus(self, metric, labels=""):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum{{{labels.rstrip(',')}}} {self.total:.6g}")
+        lines.append(f"{metric}_count{{{labels.rstrip(',')}}} {self.count}")
+        return lines
+
+
+class MicroBatcher:
+    """
+    Gom các yêu cầu dự đoán đồng thời cho một mô hình thành một lần predict.
+    """
+
+    def __init__(self, model, max_batch=256, max_wait_ms=2.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+        self.predict_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def predict(self, matrix):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((matrix, future))
+        return await future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            rows = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            # Chờ thêm request trong max_wait hoặc tới khi đủ max_batch dòng
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                rows += len(item[0])
+
+            batch = np.vstack([matrix for matrix, _ in items])
+            started = time.perf_counter()
+            try:
+                # Predict chạy trong thread để vòng lặp vẫn nhận request mới
+                scaled = await loop.run_in_executor(None, self.model.predict, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.predict_ms.observe((time.perf_counter() - started) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            offset = 0
+            for matrix, future in items:
+                # Client đã ngắt kết nối (future bị hủy): bỏ qua, không dừng batcher
+                if not future.done():
+                    future.set_result(np.asarray(scaled[offset:offset + len(matrix)]))
+                offset += len(matrix)
+
+
+def _trained_ticker(model):
+    # Ticker của mô hình một ticker; mô hình cũ chưa ghi "ticker" được huấn luyện trên FPT.VN
+    if model.meta.get("tickers"):
+        return None
+    return model.meta.get("ticker") or model.meta.get("feature_store", {}).get("ticker") or "FPT.VN"
+
+
+def _valid_ticker(ticker):
+    # Ticker được ghép thẳng vào đường dẫn universe/<ticker>/: không cho phép dấu phân cách hay ".."
+    return isinstance(ticker, str) and bool(ticker) and "/" not in ticker and "\\" not in ticker and ".." not in ticker
+
+
+class PredictionService:
+    def __init__(self, model_names=("LinearRegression", "XGBoost"), base_dir=None, max_batch=256,
+                 max_wait_ms=2.0):
+        self.base_dir = base_dir or BASE_DIR
+        self.model_names = list(model_names)
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        registry_root = os.path.join(self.base_dir, "models")
+        self.models = {}
+        for name in model_names:
+            try:
+                self.models[name] = model_registry.load_model(name, root=registry_root)
+            except FileNotFoundError:
+                print(f"Warning: Chưa có mô hình {name} trong {registry_root}, bỏ qua.")
+        self.batchers = {name: MicroBatcher(model, max_batch, max_wait_ms) for name, model in self.models.items()}
+        # (ticker, tên mô hình) -> (mô hình, batcher, thư mục data/processed) của universe/<ticker>/
+        self.ticker_models = {}
+        self.latency = {}
+        self.processed_frames = {}
+
+    def _ticker_model(self, name, ticker):
+        """
+        Mô hình dùng để dự đoán cho ticker: mô hình trong models/ nếu được huấn luyện trên ticker đó,
+        ngược lại mô hình riêng trong universe/<ticker>/models (nạp một lần). KeyError nếu không có.
+        """
+        model = self.models.get(name)
+        if model is not None and _trained_ticker(model) == ticker:
+            return model, self.batchers[name], os.path.join(self.base_dir, "data", "processed")
+        if (ticker, name) not in self.ticker_models:
+            ticker_dir = os.path.join(self.base_dir, "universe", ticker)
+            try:
+                model = model_registry.load_model(name, root=os.path.join(ticker_dir, "models"))
+            except FileNotFoundError:
+                raise KeyError(f"Không có mô hình '{name}' được huấn luyện cho {ticker}")
+            batcher = MicroBatcher(model, self.max_batch, self.max_wait_ms)
+            batcher.start()
+            self.ticker_models[(ticker, name)] = (model, batcher, os.path.join(ticker_dir, "data", "processed"))
+        return self.ticker_models[(ticker, name)]
+
+    def _latest_features(self, ticker, processed_dir, features):
+        # Dòng đặc trưng (đã chuẩn hóa) mới nhất của ticker, đọc một lần từ data/processed
+        path = os.path.join(processed_dir, "preprocessed_data.csv")
+        if path not in self.processed_frames:
+            if not os.path.exists(path):
+                raise KeyError(f"Không có dữ liệu đã tiền xử lý cho {ticker}")
+            self.processed_frames[path] = pd.read_csv(path, index_col='Date')
+        df = self.processed_frames[path]
+        missing = [f for f in features if f not in df.columns]
+        if missing:
+            # Đặc trưng bổ sung của kho đặc trưng cần cả lịch sử, tính một lần rồi giữ lại
+            import feature_store
+            for name in missing:
+                df[name] = feature_store.compute(name, df)
+        return df.index[-1], df.iloc[-1:][features].to_numpy(dtype=np.float64)
+
+    async def handle_predict(self, payload):
+        if not isinstance(payload, dict):
+            return 400, {"error": "Body phải là JSON object"}
+        name = payload.get("model", "XGBoost")
+        if name not in self.model_names:
+            return 404, {"error": f"Không có mô hình '{name}'", "models": list(self.batchers)}
+        date = None
+        if "ticker" in payload:
+            ticker = payload["ticker"]
+            if not _valid_ticker(ticker):
+                return 400, {"error": "'ticker' phải là chuỗi mã cổ phiếu, ví dụ \"FPT.VN\""}
+            try:
+                model, batcher, processed_dir = self._ticker_model(name, ticker)
+                date, matrix = self._latest_features(ticker, processed_dir, model.features)
+            except KeyError as e:
+                return 404, {"error": str(e.args[0])}
+        else:
+            if name not in self.batchers:
+                return 404, {"error": f"Không có mô hình '{name}'", "models": list(self.batchers)}
+            model, batcher = self.models[name], self.batchers[name]
+            rows = payload.get("rows")
+            if not rows or not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return 400, {"error": "Cần 'rows' (danh sách dòng đặc trưng) hoặc 'ticker'"}
+            for i, row in enumerate(rows):
+                missing = [f for f in model.features if f not in row]
+                if missing:
+                    return 400, {"error": f"Dòng {i} thiếu đặc trưng: {missing}"}
+            try:
+                matrix = np.array([[row[f] for f in model.features] for row in rows], dtype=np.float64)
+            except (TypeError, ValueError):
+                return 400, {"error": "Giá trị đặc trưng phải là số"}
+
+        scaled = await batcher.predict(matrix)
+        response = {"model": name, "version": model.version,
+                    "predictions": model.inverse_scale(scaled).tolist(), "scaled": scaled.tolist()}
+        if date is not None:
+            response["date"] = date
+        return 200, response
+
+    def _labelled_batchers(self):
+        yield from self.batchers.items()
+        for (ticker, name), (_, batcher, _) in self.ticker_models.items():
+            yield f"{name}@{ticker}", batcher
+
+    def metrics_text(self):
+        lines = ["# HELP prediction_request_latency_ms Request latency in milliseconds.",
+                 "# TYPE prediction_request_latency_ms histogram"]
+        for path, histogram in self.latency.items():
+            lines += histogram.prometheus("prediction_request_latency_ms", f'path="{path}",')
+        lines += ["# HELP prediction_batch_size Rows per batched predict call.",
+                  "# TYPE prediction_batch_size histogram"]
+        for name, batcher in self._labelled_batchers():
+            lines += batcher.batch_sizes.prometheus("prediction_batch_size", f'model="{name}",')
+        lines += ["# HELP prediction_predict_latency_ms Model predict time per batch in milliseconds.",
+                  "# TYPE prediction_predict_latency_ms histogram"]
+        for name, batcher in self._labelled_batchers():
+            lines += batcher.predict_ms.prometheus("prediction_predict_latency_ms", f'model="{name}",')
+        return "\n".join(lines) + "\n"
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "models": {n: m.version for n, m in self.models.items()}}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics_text()
+        if method == "POST" and path == "/predict":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "Body không phải JSON"}
+            return await self.handle_predict(payload)
+        return 404, {"error": f"Không có {method} {path}"}
+
+    @staticmethod
+    async def _respond(writer, status, payload):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload, default=str).encode(), "application/json"
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(status, "Error")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 tối giản có keep-alive: đủ cho client cục bộ, không cần thư viện ngoài
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0")
+                if len(parts) != 3 or not length.isdigit():
+                    # Không đọc được body nên không giữ kết nối: trả lỗi rồi đóng
+                    await self._respond(writer, 400, {"error": "Request HTTP không hợp lệ"})
+                    break
+                method, path, _ = parts
+                body = await reader.readexactly(int(length))
+
+                started = time.perf_counter()
+                status, payload = await self.route(method, path, body)
+                self.latency.setdefault(path, Histogram(LATENCY_BUCKETS_MS)).observe(
+                    (time.perf_counter() - started) * 1000)
+
+                await self._respond(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, max_batch=256, max_wait_ms=2.0, base_dir=None):
+    service = PredictionService(base_dir=base_dir, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    if not service.models:
+        print("Lỗi: Không có mô hình nào trong kho. Hãy chạy 'python main.py model' trước.")
+        return False
+    for batcher in service.batchers.values():
+        batcher.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Prediction server: http://{host}:{port} "
+          f"(models: {', '.join(f'{n} {m.version}' for n, m in service.models.items())}, "
+          f"max_batch={max_batch}, max_wait={max_wait_ms}ms)")
+    async with server:
+        await server.serve_forever()
+
+
+def run_server(host="127.0.0.1", port=8765, max_batch=256, max_wait_ms=2.0, base_dir=None):
+    try:
+        return asyncio.run(serve(host, port, max_batch, max_wait_ms, base_dir)) is not False
+    except KeyboardInterrupt:
+        print("\nĐã dừng prediction server.")
+        return True
+
+
+if __name__ == "__main__":
+    run_server()
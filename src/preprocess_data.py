@@ -1,84 +1,88 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import MinMaxScaler
 import os
 import json
+import anomaly_detector
+import compact_dtypes
+import figure_renderer
+import instrumentation
+import market_store
+import streaming_preprocess
 
 # Helper Functions for Indicators (Manual Implementation)
-def calculate_rsi(series, period=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).ewm(alpha=1/period, adjust=False).mean()
-    loss = (-delta.where(delta < 0, 0)).ewm(alpha=1/period, adjust=False).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
-
-def calculate_macd(series, fast=12, slow=26, signal=9):
-    exp1 = series.ewm(span=fast, adjust=False).mean()
-    exp2 = series.ewm(span=slow, adjust=False).mean()
-    macd = exp1 - exp2
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    return macd, signal_line
-
-def preprocess_stock_data(filename="stock_data.csv"):
+# Định nghĩa trong technical_indicators để chế độ dự đoán dùng lại mà không phải import sklearn/matplotlib
+from technical_indicators import calculate_rsi, calculate_macd
+
+def preprocess_stock_data(ticker="FPT.VN", output_dir=None, chunk_rows=None, compact=False,
+                          outlier_method="isolation_forest"):
     """
     Tiền xử lý dữ liệu chứng khoán: Làm sạch, kỹ thuật đặc trưng, chuẩn hóa và phân chia.
+    output_dir: thư mục gốc chứa data/processed và results/figures (mặc định là thư mục dự án).
+    chunk_rows: nếu có, xử lý theo khối với bộ nhớ giới hạn (xem streaming_preprocess).
+    compact: chuẩn hóa và chia tập trên float32, Outlier int8 (xem compact_dtypes).
+    outlier_method: "isolation_forest" hoặc "robust_z" (trực tuyến, xem anomaly_detector).
     """
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_raw_dir = os.path.join(base_dir, "data", "raw")
+    if chunk_rows:
+        return streaming_preprocess.preprocess_stock_data_streaming(ticker=ticker, output_dir=output_dir,
+                                                                    chunk_rows=chunk_rows, compact=compact,
+                                                                    outlier_method=outlier_method)
+
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_processed_dir = os.path.join(base_dir, "data", "processed")
     os.makedirs(data_processed_dir, exist_ok=True)
     results_dir = os.path.join(base_dir, "results", "figures")
     os.makedirs(results_dir, exist_ok=True)
 
-    filename = os.path.join(data_raw_dir, "stock_data.csv")
-    
-    if not os.path.exists(filename):
-        print(f"Lỗi: Không tìm thấy file {filename}")
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
         return
 
-    # 1. Load data
+    # 1. Load data (Date đã ở dạng UTC không timezone và được sắp xếp trong kho)
     print("Loading data...")
-    df = pd.read_csv(filename)
-    df['Date'] = pd.to_datetime(df['Date'], utc=True)
-    df.set_index('Date', inplace=True)
-    df.index = df.index.tz_convert(None) # Remove timezone info for simpler handling
-    df.sort_index(inplace=True)
+    with instrumentation.track("preprocess.load") as record:
+        df = market_store.load_ohlcv(ticker)
+        record["rows"] = len(df)
 
     # 2. Làm sạch dữ liệu (Interpolation)
     df_clean = df.interpolate(method='linear')
     print("1. Đã xử lý dữ liệu khuyết bằng phương pháp Interpolation.")
 
     # 3. Xử lý ngoại lai (Outlier Detection)
-    iso = IsolationForest(contamination=0.01, random_state=42)
-    df_clean['Outlier'] = iso.fit_predict(df_clean[['Close', 'Volume']])
+    state_path = os.path.join(data_processed_dir, anomaly_detector.STATE_FILE)
+    if outlier_method == "robust_z":
+        # Trạng thái cuối được lưu lại để chấm điểm các bar mới mà không phải chạy lại lịch sử
+        with instrumentation.track("preprocess.robust_z", rows=len(df_clean)):
+            df_clean['Outlier'], state = anomaly_detector.detect_frame(df_clean, ticker=ticker)
+            anomaly_detector.save_state(state, state_path)
+    else:
+        with instrumentation.track("preprocess.isolation_forest", rows=len(df_clean)):
+            iso = IsolationForest(contamination=0.01, random_state=42)
+            df_clean['Outlier'] = iso.fit_predict(df_clean[['Close', 'Volume']])
+        if os.path.exists(state_path):
+            os.remove(state_path)
     
-    # Save Outlier Plot
-    plt.figure(figsize=(12, 6))
-    plt.plot(df_clean.index, df_clean['Close'], label='Price', color='blue', alpha=0.5)
+    # Save Outlier Plot (bỏ qua nếu dữ liệu vẽ không đổi)
     outliers = df_clean[df_clean['Outlier'] == -1]
-    plt.scatter(outliers.index, outliers['Close'], color='red', label='Outliers', zorder=5)
-    plt.title("Stock Price & Outliers: FPT.VN", fontsize=16)
-    plt.legend()
-    plt.grid(True)
-    plt.savefig(os.path.join(results_dir, 'outliers.png'))
-    plt.close()
+    figure_renderer.render_figures([figure_renderer.outlier_job(df_clean.index, df_clean['Close'], outliers.index,
+                                                                outliers['Close'], ticker, results_dir)])
     print("2. Đã phát hiện ngoại lai và lưu biểu đồ.")
 
     # 4. Kỹ thuật đặc trưng (Feature Engineering)
-    # Log Returns
-    df_clean['Log_Returns'] = np.log(df_clean['Close'] / df_clean['Close'].shift(1))
-    
-    # Technical Indicators (Manual)
-    df_clean['RSI_14'] = calculate_rsi(df_clean['Close'], period=14)
-    
-    macd, signal = calculate_macd(df_clean['Close'])
-    df_clean['MACD_12_26_9'] = macd
-    df_clean['MACDs_12_26_9'] = signal
+    with instrumentation.track("preprocess.indicators", rows=len(df_clean)):
+        # Log Returns
+        df_clean['Log_Returns'] = np.log(df_clean['Close'] / df_clean['Close'].shift(1))
+
+        # Technical Indicators (Manual)
+        df_clean['RSI_14'] = calculate_rsi(df_clean['Close'], period=14)
+
+        macd, signal = calculate_macd(df_clean['Close'])
+        df_clean['MACD_12_26_9'] = macd
+        df_clean['MACDs_12_26_9'] = signal
 
-    df_clean['SMA_7'] = df_clean['Close'].rolling(window=7).mean()
-    df_clean['SMA_30'] = df_clean['Close'].rolling(window=30).mean()
+        df_clean['SMA_7'] = df_clean['Close'].rolling(window=7).mean()
+        df_clean['SMA_30'] = df_clean['Close'].rolling(window=30).mean()
     
     # Fill NaN
     df_clean.fillna(method='bfill', inplace=True)
@@ -90,6 +94,9 @@ def preprocess_stock_data(filename="stock_data.csv"):
     
     # Drop NaN created by lags
     df_features = df_clean.dropna()
+    if compact:
+        # Chỉ báo được tính trên float64; từ bước chuẩn hóa trở đi dùng float32/int8
+        df_features = compact_dtypes.compact_frame(df_features)
     print("3. Đã tạo các biến đặc trưng (RSI, MACD, MA, Lags).")
 
     # Save Scaling Params BEFORE Scaling
@@ -98,12 +105,16 @@ def preprocess_stock_data(filename="stock_data.csv"):
     scaling_params = {"Close_min": float(close_min), "Close_max": float(close_max)}
     
     # 5. Chuẩn hóa dữ liệu (Feature Scaling)
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    cols_to_scale = df_features.columns.drop('Outlier')
-    df_scaled = pd.DataFrame(scaler.fit_transform(df_features[cols_to_scale]), 
-                             columns=cols_to_scale, 
-                             index=df_features.index)
-    df_scaled['Outlier'] = df_features['Outlier']
+    with instrumentation.track("preprocess.scaling", rows=len(df_features)):
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        cols_to_scale = df_features.columns.drop('Outlier')
+        df_scaled = pd.DataFrame(scaler.fit_transform(df_features[cols_to_scale]),
+                                 columns=cols_to_scale,
+                                 index=df_features.index)
+        df_scaled['Outlier'] = df_features['Outlier']
+    # Min/max từng cột để chuẩn hóa dữ liệu mới khi chỉ chạy dự đoán (model_registry)
+    scaling_params["columns"] = {col: [float(low), float(high)] for col, low, high in
+                                 zip(cols_to_scale, scaler.data_min_, scaler.data_max_)}
     print("4. Đã chuẩn hóa dữ liệu [0, 1].")
 
     # 6. Phân chia tập dữ liệu
@@ -114,15 +125,21 @@ def preprocess_stock_data(filename="stock_data.csv"):
     print(f"5. Đã chia tập dữ liệu: Train ({len(train_df)}), Test ({len(test_df)}).")
 
     # Lưu kết quả
-    df_scaled.to_csv(os.path.join(data_processed_dir, 'preprocessed_data.csv'))
-    train_df.to_csv(os.path.join(data_processed_dir, 'train_data.csv'))
-    test_df.to_csv(os.path.join(data_processed_dir, 'test_data.csv'))
+    with instrumentation.track("preprocess.save", rows=len(df_scaled)):
+        df_scaled.to_csv(os.path.join(data_processed_dir, 'preprocessed_data.csv'))
+        train_df.to_csv(os.path.join(data_processed_dir, 'train_data.csv'))
+        test_df.to_csv(os.path.join(data_processed_dir, 'test_data.csv'))
+    # split.json của lần chạy theo khối trước đó không còn đúng với các file vừa ghi
+    split_path = os.path.join(data_processed_dir, streaming_preprocess.SPLIT_FILE)
+    if os.path.exists(split_path):
+        os.remove(split_path)
     
     # Save Scaling Params
     with open(os.path.join(data_processed_dir, "scaling_params.json"), "w") as f:
         json.dump(scaling_params, f)
         
-    print(f"6. Đã lưu dữ liệu và tham số scaling ({scaling_params}) vào 'data/processed/'.")
+    print(f"6. Đã lưu dữ liệu và tham số scaling (Close_min={scaling_params['Close_min']}, "
+          f"Close_max={scaling_params['Close_max']}) vào 'data/processed/'.")
 
     return train_df, test_df
 
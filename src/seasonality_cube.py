@@ -0,0 +1,292 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import market_store
+from streaming_stats import RELATIVE_ACCURACY
+
+# Khối tổng hợp mùa vụ (tháng x thứ trong tuần) cho Volume và Log_Returns, tính sẵn và cập nhật
+# dần theo bar mới thay vì groupby lại toàn bộ lịch sử mỗi lần vẽ:
+#   - count / tổng theo ô (measure x tháng x thứ) để lấy số bar và trung bình chính xác;
+#   - phân vị xấp xỉ từ bucket theo log (sai số tương đối RELATIVE_ACCURACY như streaming_stats),
+#     lưu thưa dưới dạng (id, count) với id = ô * STRIDE + bucket có dấu. Gộp hai khối (nhiều lần
+#     cập nhật, nhiều ticker) chỉ là cộng số đếm theo id, nên mùa vụ cả universe là một phép tra cứu.
+# Mỗi ticker một file data/seasonality/<ticker>.npz, kèm bar cuối đã gộp để lần sau chỉ đọc bar mới.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CUBE_DIR = os.path.join(BASE_DIR, "data", "seasonality")
+MEASURES = ("Volume", "Log_Returns")
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+N_CELLS = len(MEASURES) * 12 * 7
+# |giá trị| nhỏ hơn MIN_VALUE rơi vào bucket 0; bucket lớn nhất đủ cho mọi volume thực tế
+MIN_VALUE = 1e-6
+MAX_KEY = 1 << 15
+STRIDE = 2 * MAX_KEY + 1
+GROUPS = {"cell": 12 * 7, "month": 12, "weekday": 7}
+# Bar ngày trong kho được đánh dấu theo nửa đêm giờ sàn Việt Nam (17:00 UTC hôm trước):
+# tháng / thứ lấy theo giờ sàn, nếu không mọi phiên thứ Hai sẽ rơi vào Chủ nhật
+EXCHANGE_UTC_OFFSET = pd.Timedelta(hours=7)
+
+
+class SeasonalityCube:
+    """
+    Số bar, tổng và bucket phân vị của Volume / Log_Returns theo (tháng, thứ); gộp được.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.count = np.zeros((len(MEASURES), 12, 7), dtype=np.int64)
+        self.total = np.zeros((len(MEASURES), 12, 7), dtype=np.float64)
+        # Vị trí đã gộp tới trong lịch sử của ticker (None với khối gộp nhiều ticker)
+        self.first_date = None
+        self.last_date = None
+        self.last_close = math.nan
+        self.rows = 0
+
+    def _keys(self, values):
+        magnitude = np.abs(values)
+        keys = np.zeros(len(values), dtype=np.int64)
+        large = magnitude >= MIN_VALUE
+        keys[large] = np.clip(np.ceil(np.log(magnitude[large] / MIN_VALUE) / self.log_gamma) + 1, 1, MAX_KEY)
+        return np.where(values < 0, -keys, keys)
+
+    def _values(self, keys):
+        values = 2 * MIN_VALUE * self.gamma ** (np.abs(keys) - 1) / (self.gamma + 1)
+        return np.where(keys == 0, 0., np.sign(keys) * values)
+
+    def _add(self, ids, counts):
+        ids = np.concatenate([self.ids, ids])
+        counts = np.concatenate([self.counts, counts])
+        self.ids, inverse = np.unique(ids, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts).astype(np.int64)
+
+    def update(self, frame):
+        """
+        Gộp các bar mới (DataFrame có Close, Volume, index Date tăng dần); bar không mới hơn last_date bị bỏ qua.
+        """
+        if self.last_date is not None:
+            frame = frame[frame.index > self.last_date]
+        if frame.empty:
+            return self
+        close = frame['Close'].to_numpy(dtype=np.float64)
+        # Return của bar đầu khối dùng giá đóng cửa hợp lệ cuối cùng của lần cập nhật trước
+        previous = pd.Series(np.concatenate([[self.last_close], close[:-1]])).ffill().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.log(close / previous)
+        returns[~np.isfinite(returns)] = np.nan
+        local = frame.index + EXCHANGE_UTC_OFFSET
+        month = local.month.to_numpy() - 1
+        weekday = local.weekday.to_numpy()
+
+        ids = []
+        for m, values in enumerate((frame['Volume'].to_numpy(dtype=np.float64), returns)):
+            valid = ~np.isnan(values)
+            cells = (m * 12 + month[valid]) * 7 + weekday[valid]
+            self.count += np.bincount(cells, minlength=N_CELLS).reshape(self.count.shape)
+            self.total += np.bincount(cells, weights=values[valid], minlength=N_CELLS).reshape(self.total.shape)
+            ids.append(cells * STRIDE + self._keys(values[valid]) + MAX_KEY)
+        ids = np.concatenate(ids)
+        self._add(ids, np.ones(len(ids), dtype=np.int64))
+
+        valid_close = close[~np.isnan(close)]
+        if len(valid_close):
+            self.last_close = float(valid_close[-1])
+        self.first_date = frame.index[0] if self.first_date is None else self.first_date
+        self.last_date = frame.index[-1]
+        self.rows += len(frame)
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Không gộp được hai khối khác relative_accuracy")
+        merged = SeasonalityCube(self.relative_accuracy)
+        merged.ids, merged.counts = self.ids, self.counts
+        merged._add(other.ids, other.counts)
+        merged.count = self.count + other.count
+        merged.total = self.total + other.total
+        merged.rows = self.rows + other.rows
+        return merged
+
+    def _grouped(self, measure, by):
+        # Bucket của measure, gom theo nhóm (ô / tháng / thứ) và sắp theo (nhóm, giá trị)
+        cells, keys = np.divmod(self.ids, STRIDE)
+        keep = cells // 84 == MEASURES.index(measure)
+        cells, keys, counts = cells[keep] % 84, keys[keep], self.counts[keep]
+        group = {"cell": cells, "month": cells // 7, "weekday": cells % 7}[by]
+        ids, inverse = np.unique(group * STRIDE + keys, return_inverse=True)
+        group, keys = np.divmod(ids, STRIDE)
+        return group, keys - MAX_KEY, np.bincount(inverse, weights=counts).astype(np.int64)
+
+    def quantiles(self, measure, qs=QUANTILES, by="cell"):
+        """
+        Phân vị (theo hạng q * (n - 1) như pandas) của measure cho từng nhóm: mảng (số nhóm x len(qs)),
+        NaN cho nhóm chưa có dữ liệu. by: "cell" (tháng * 7 + thứ), "month" hoặc "weekday".
+        """
+        group, keys, counts = self._grouped(measure, by)
+        result = np.full((GROUPS[by], len(qs)), np.nan)
+        if not len(counts):
+            return result
+        values = self._values(keys)
+        cumulative = np.cumsum(counts)
+        sizes = np.bincount(group, weights=counts, minlength=GROUPS[by]).astype(np.int64)
+        starts = np.cumsum(sizes) - sizes
+        filled = sizes > 0
+        last = len(values) - 1
+        for j, q in enumerate(qs):
+            rank = q * (sizes[filled] - 1)
+            lower = np.floor(rank)
+            low = values[np.minimum(np.searchsorted(cumulative, starts[filled] + lower, side="right"), last)]
+            high = values[np.minimum(np.searchsorted(cumulative, starts[filled] + lower + 1, side="right"), last)]
+            result[filled, j] = low + (rank - lower) * (high - low)
+        return result
+
+    def aggregate(self, measure, by="cell"):
+        """
+        (count, mean) của measure cho từng nhóm.
+        """
+        m = MEASURES.index(measure)
+        count, total = self.count[m], self.total[m]
+        if by == "month":
+            count, total = count.sum(axis=1), total.sum(axis=1)
+        elif by == "weekday":
+            count, total = count.sum(axis=0), total.sum(axis=0)
+        count, total = count.ravel(), total.ravel()
+        return count, np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+    def to_frame(self, by="cell", qs=QUANTILES):
+        """
+        Bảng tra cứu: mỗi dòng một (Measure, nhóm) với Count, Mean và các cột phân vị Q05, Q25...
+        """
+        frames = []
+        for measure in MEASURES:
+            count, mean = self.aggregate(measure, by)
+            groups = np.arange(GROUPS[by])
+            frame = pd.DataFrame({"Measure": [measure] * len(groups)})
+            if by in ("cell", "month"):
+                frame["Month"] = (groups // 7 if by == "cell" else groups) + 1
+            if by in ("cell", "weekday"):
+                frame["Weekday"] = [WEEKDAYS[g] for g in (groups % 7 if by == "cell" else groups)]
+            frame["Count"] = count
+            frame["Mean"] = mean
+            quantiles = self.quantiles(measure, qs, by)
+            for j, q in enumerate(qs):
+                frame[f"Q{round(q * 100):02d}"] = quantiles[:, j]
+            frames.append(frame[frame["Count"] > 0])
+        return pd.concat(frames, ignore_index=True)
+
+
+def save_cube(cube, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    dates = [-1 if d is None else d.value for d in (cube.first_date, cube.last_date)]
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, ids=cube.ids, counts=cube.counts, count=cube.count, total=cube.total,
+                 params=np.array([cube.relative_accuracy, cube.last_close], dtype=np.float64),
+                 dates=np.array(dates + [cube.rows], dtype=np.int64))
+    # Ghi đè nguyên tử để không để lại khối hỏng nếu bị ngắt giữa chừng
+    os.replace(path + ".tmp", path)
+
+
+def load_cube(path):
+    with np.load(path) as data:
+        relative_accuracy, last_close = data["params"]
+        cube = SeasonalityCube(float(relative_accuracy))
+        cube.ids, cube.counts = data["ids"], data["counts"]
+        cube.count, cube.total = data["count"], data["total"]
+        first_date, last_date, rows = (int(v) for v in data["dates"])
+    cube.last_close = float(last_close)
+    cube.first_date = None if first_date < 0 else pd.Timestamp(first_date)
+    cube.last_date = None if last_date < 0 else pd.Timestamp(last_date)
+    cube.rows = rows
+    return cube
+
+
+def cube_path(ticker, root=None):
+    return os.path.join(root or DEFAULT_CUBE_DIR, f"{ticker}.npz")
+
+
+def update_ticker(ticker, root=None, rebuild=False, store_root=None):
+    """
+    Gộp các bar mới của ticker từ kho vào khối đã lưu (tạo mới nếu chưa có). Trả về (khối, số bar mới).
+    Nếu phần lịch sử đã gộp trong kho bị thay đổi (số bar hoặc ngày đầu khác) thì dựng lại từ đầu;
+    rebuild=True để dựng lại cả khi chỉ giá trị của bar cũ được sửa.
+    """
+    path = cube_path(ticker, root)
+    cube = None if rebuild or not os.path.exists(path) else load_cube(path)
+    if cube is not None and cube.last_date is not None:
+        # Chỉ đọc cột Date (memmap) để kiểm tra, không đọc lại dữ liệu
+        seen = market_store.load_ohlcv(ticker, columns=[], end=cube.last_date, root=store_root).index
+        if len(seen) != cube.rows or seen[0] != cube.first_date:
+            cube = None
+    cube = cube or SeasonalityCube()
+    start = None if cube.last_date is None else cube.last_date + pd.Timedelta(1, "ns")
+    added = 0
+    for chunk in market_store.iter_ohlcv(ticker, columns=['Close', 'Volume'], start=start, root=store_root):
+        cube.update(chunk)
+        added += len(chunk)
+    if added or not os.path.exists(path):
+        save_cube(cube, path)
+    return cube, added
+
+
+def _update_task(task):
+    _, added = update_ticker(task["ticker"], task["root"], task["rebuild"])
+    return task["ticker"], added
+
+
+def universe_cube(tickers, root=None):
+    """
+    Gộp khối đã lưu của các ticker (không đọc dữ liệu giá); None nếu chưa có khối nào.
+    """
+    cubes = [load_cube(cube_path(t, root)) for t in tickers if os.path.exists(cube_path(t, root))]
+    if not cubes:
+        return None
+    if len({c.relative_accuracy for c in cubes}) > 1:
+        raise ValueError("Không gộp được các khối khác relative_accuracy")
+    merged = SeasonalityCube(cubes[0].relative_accuracy)
+    # Cộng số đếm của mọi khối trong một lần thay vì gộp lần lượt từng cặp
+    merged._add(np.concatenate([c.ids for c in cubes]), np.concatenate([c.counts for c in cubes]))
+    merged.count = sum(c.count for c in cubes)
+    merged.total = sum(c.total for c in cubes)
+    merged.rows = sum(c.rows for c in cubes)
+    return merged
+
+
+def run_seasonality(tickers, root=None, jobs=None, rebuild=False, output_dir=None):
+    """
+    Cập nhật khối mùa vụ của từng ticker trên process pool rồi tra cứu mùa vụ cả universe.
+    Ghi results/seasonality.csv (theo tháng x thứ).
+    """
+    base_dir = output_dir or BASE_DIR
+    available = [t for t in tickers if market_store.has_ticker(t)]
+    missing = sorted(set(tickers) - set(available))
+    if missing:
+        print(f"Warning: Bỏ qua {len(missing)} ticker không có trong kho: {', '.join(missing[:10])}")
+    if not available:
+        print(f"Lỗi: Không có ticker nào trong {market_store.store_dir()}")
+        return
+
+    tasks = [{"ticker": t, "root": root, "rebuild": rebuild} for t in available]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        added = dict(pool.map(_update_task, tasks))
+    print(f"1. Đã cập nhật khối mùa vụ cho {len(available)} ticker ({sum(added.values())} bar mới, "
+          f"{sum(1 for n in added.values() if n == 0)} ticker không đổi).")
+
+    cube = universe_cube(available, root)
+    cells = cube.to_frame("cell")
+    path = os.path.join(base_dir, "results", "seasonality.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cells.to_csv(path, index=False)
+    for by in ("month", "weekday"):
+        table = cube.to_frame(by)
+        print(f"\n--- Mùa vụ cả universe theo {by} ---")
+        print(table.to_markdown(index=False, floatfmt=".4g"))
+    print(f"   - Saved '{path}'")
+    return cells
@@ -0,0 +1,241 @@
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Trạng thái chỉ báo theo từng ticker, cập nhật O(1) cho mỗi bar mới.
+# Các bộ tính EWM / rolling mean dùng đúng công thức truy hồi của pandas
+# (giống panel_indicators) nên giá trị phát ra trùng với calculate_rsi,
+# calculate_macd và rolling(window).mean() khi chạy lại toàn bộ lịch sử.
+# Lưu ý: đây là giá trị chưa chuẩn hóa và chưa bfill; các bar khởi động
+# (chưa đủ cửa sổ) có NaN thay vì giá trị điền ngược như bản batch.
+
+LAGS = 3
+
+
+def _center_of_mass(com=None, span=None, alpha=None):
+    if com is not None:
+        return float(com)
+    if span is not None:
+        return float((span - 1) / 2)
+    return float((1 - alpha) / alpha)
+
+
+class EWMState:
+    """
+    Trung bình trượt hàm mũ (adjust=False) cập nhật từng giá trị.
+    """
+
+    def __init__(self, com=None, span=None, alpha=None):
+        self.alpha = 1. / (1. + _center_of_mass(com, span, alpha))
+        self.weighted = math.nan
+        self.old_wt = 1.
+        self.count = 0
+
+    def update(self, cur):
+        if self.count == 0:
+            self.weighted = cur
+        elif self.weighted == self.weighted:
+            self.old_wt *= 1. - self.alpha
+            if cur == cur:
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * cur) / (self.old_wt + self.alpha)
+                self.old_wt = 1.
+        elif cur == cur:
+            self.weighted = cur
+        self.count += 1
+        return self.weighted
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "weighted": self.weighted, "old_wt": self.old_wt, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(alpha=data["alpha"])
+        state.alpha = data["alpha"]
+        state.weighted = data["weighted"]
+        state.old_wt = data["old_wt"]
+        state.count = data["count"]
+        return state
+
+
+class RollingMeanState:
+    """
+    Trung bình trượt cửa sổ cố định, tổng có bù Kahan như rolling().mean() của pandas.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.
+        self.compensation_add = 0.
+        self.compensation_remove = 0.
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def update(self, val):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.compensation_remove
+                total = self.sum_x + y
+                self.compensation_remove = total - self.sum_x - y
+                self.sum_x = total
+                self.neg_ct -= math.copysign(1, old) < 0
+
+        self.values.append(val)
+        if val == val:
+            self.nobs += 1
+            y = val - self.compensation_add
+            total = self.sum_x + y
+            self.compensation_add = total - self.sum_x - y
+            self.sum_x = total
+            self.neg_ct += math.copysign(1, val) < 0
+            self.same_count = self.same_count + 1 if val == self.prev_value else 1
+            self.prev_value = val
+
+        if self.nobs < self.window:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.
+        return result
+
+    def to_dict(self):
+        data = dict(self.__dict__)
+        data["values"] = list(self.values)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data["window"])
+        state.__dict__.update(data)
+        state.values = deque(data["values"])
+        return state
+
+
+class IndicatorState:
+    """
+    Trạng thái đầy đủ của một ticker: nhận một bar mới và trả về dòng đặc trưng
+    (Log_Returns, RSI_14, MACD, SMA_7/30, Close_Lag_1..3) trong thời gian hằng số.
+    """
+
+    def __init__(self, ticker="FPT.VN", rsi_period=14, macd=(12, 26, 9), sma_windows=(7, 30)):
+        self.ticker = ticker
+        self.last_date = None
+        self.prev_close = math.nan
+        self.rsi_period = rsi_period
+        self.gain = EWMState(alpha=1 / rsi_period)
+        self.loss = EWMState(alpha=1 / rsi_period)
+        self.macd = tuple(macd)
+        self.fast = EWMState(span=macd[0])
+        self.slow = EWMState(span=macd[1])
+        self.signal = EWMState(span=macd[2])
+        self.sma = {window: RollingMeanState(window) for window in sma_windows}
+        self.lags = deque(maxlen=LAGS)
+
+    def update(self, date, open, high, low, close, volume):
+        """
+        Hấp thụ một bar mới (theo thứ tự thời gian) và trả về dòng đặc trưng tương ứng.
+        """
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Bar {date} của {self.ticker} không mới hơn bar cuối {self.last_date}")
+
+        delta = close - self.prev_close
+        # Giống delta.where(delta > 0, 0): delta NaN (bar đầu tiên) được thay bằng 0
+        avg_gain = self.gain.update(delta if delta > 0 else 0.)
+        avg_loss = self.loss.update(-(delta if delta < 0 else 0.))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = float(np.float64(avg_gain) / np.float64(avg_loss))
+
+        macd_line = self.fast.update(close) - self.slow.update(close)
+        signal_line = self.signal.update(macd_line)
+
+        row = {
+            "Date": date,
+            "Open": open, "High": high, "Low": low, "Close": close, "Volume": volume,
+            "Log_Returns": float(np.log(np.float64(close) / np.float64(self.prev_close))),
+            "RSI_14": 100 - (100 / (1 + rs)),
+            "MACD_12_26_9": macd_line,
+            "MACDs_12_26_9": signal_line,
+        }
+        for window, state in self.sma.items():
+            row[f"SMA_{window}"] = state.update(close)
+        for i in range(1, LAGS + 1):
+            row[f"Close_Lag_{i}"] = self.lags[-i] if len(self.lags) >= i else math.nan
+
+        self.lags.append(close)
+        self.prev_close = close
+        self.last_date = date
+        return row
+
+    def update_frame(self, df):
+        """
+        Hấp thụ lần lượt các bar trong DataFrame OHLCV (index là Date) và trả về các dòng đặc trưng.
+        """
+        rows = [self.update(date, *values) for date, values in
+                zip(df.index, df[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False))]
+        return pd.DataFrame(rows).set_index("Date") if rows else pd.DataFrame()
+
+    @classmethod
+    def from_history(cls, df, ticker="FPT.VN"):
+        """
+        Khởi tạo trạng thái bằng cách chạy lại lịch sử một lần.
+        """
+        state = cls(ticker=ticker)
+        state.update_frame(df)
+        return state
+
+    def to_dict(self):
+        return {
+            "ticker": self.ticker,
+            "last_date": None if self.last_date is None else self.last_date.isoformat(),
+            "prev_close": self.prev_close,
+            "rsi_period": self.rsi_period,
+            "gain": self.gain.to_dict(),
+            "loss": self.loss.to_dict(),
+            "macd": list(self.macd),
+            "fast": self.fast.to_dict(),
+            "slow": self.slow.to_dict(),
+            "signal": self.signal.to_dict(),
+            "sma": {str(window): state.to_dict() for window, state in self.sma.items()},
+            "lags": list(self.lags),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(ticker=data["ticker"], rsi_period=data["rsi_period"], macd=data["macd"],
+                    sma_windows=[int(w) for w in data["sma"]])
+        state.last_date = None if data["last_date"] is None else pd.Timestamp(data["last_date"])
+        state.prev_close = data["prev_close"]
+        state.gain = EWMState.from_dict(data["gain"])
+        state.loss = EWMState.from_dict(data["loss"])
+        state.fast = EWMState.from_dict(data["fast"])
+        state.slow = EWMState.from_dict(data["slow"])
+        state.signal = EWMState.from_dict(data["signal"])
+        state.sma = {int(w): RollingMeanState.from_dict(s) for w, s in data["sma"].items()}
+        state.lags = deque(data["lags"], maxlen=LAGS)
+        return state
+
+
+def save_state(state, path):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state.to_dict(), f)
+    # Ghi đè nguyên tử để không để lại trạng thái hỏng nếu bị ngắt giữa chừng
+    os.replace(path + ".tmp", path)
+
+
+def load_state(path):
+    with open(path, "r") as f:
+        return IndicatorState.from_dict(json.load(f))
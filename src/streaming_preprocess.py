@@ -0,0 +1,377 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+import anomaly_detector
+import compact_dtypes
+import figure_renderer
+import instrumentation
+import market_store
+
+# Tiền xử lý theo khối (out-of-core) cho lịch sử dài, ví dụ nến phút trong nhiều năm.
+# Dữ liệu được đọc từ kho theo từng khối chunk_rows dòng và đi qua hai lượt:
+#   1. nội suy, tính chỉ báo (mang theo cửa sổ khởi động giữa các khối), cập nhật
+#      min/max từng cột và ghi đặc trưng chưa chuẩn hóa ra file tạm (memmap);
+#   2. gắn nhãn ngoại lai, chuẩn hóa [0, 1] và ghi nối tiếp vào preprocessed_data.csv.
+# Train/test không còn là hai bản sao: split.json lưu khoảng chỉ số (và vị trí byte)
+# của từng phần trong preprocessed_data.csv; load_split đọc đúng khoảng đó.
+# Khi mẫu IsolationForest chứa toàn bộ dữ liệu, kết quả trùng với preprocess_stock_data
+# (SMA có thể lệch ở mức sai số làm tròn vì tổng trượt được tính lại ở mỗi khối).
+# Với outlier_method="robust_z", nhãn ngoại lai được tính ngay ở lượt 1 bằng trạng thái
+# anomaly_detector mang qua các khối nên trùng với bản nạp toàn bộ.
+
+CHUNK_ROWS = 100_000
+# Khối đầu tiên phải chứa trọn cửa sổ khởi động (SMA_30) để bfill giống bản nạp toàn bộ;
+# iter_ohlcv cắt khối theo phân vùng năm nên các khối đầu ngắn hơn được gộp lại (_warm_chunks)
+MIN_CHUNK_ROWS = 64
+OUTLIER_SAMPLE_ROWS = 100_000
+TRAIN_RATIO = 0.8
+SPLIT_FILE = "split.json"
+PLOT_POINTS = 5000
+
+RSI_PERIOD = 14
+MACD_SPANS = (12, 26, 9)
+SMA_WINDOWS = (7, 30)
+LAGS = 3
+
+
+class MinMaxState:
+    """
+    Min/max từng cột, gộp được giữa các khối; transform giống MinMaxScaler(feature_range=(0, 1)).
+    """
+
+    def __init__(self, columns=None, data_min=None, data_max=None, rows=0):
+        self.columns = list(columns) if columns is not None else []
+        self.data_min = None if data_min is None else np.asarray(data_min, dtype=np.float64)
+        self.data_max = None if data_max is None else np.asarray(data_max, dtype=np.float64)
+        self.rows = rows
+
+    @classmethod
+    def from_frame(cls, df):
+        values = df.to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return cls(df.columns)
+        return cls(df.columns, np.nanmin(values, axis=0), np.nanmax(values, axis=0), len(values))
+
+    def merge(self, other):
+        if other.rows == 0:
+            return self
+        if self.rows == 0:
+            self.columns, self.data_min, self.data_max = list(other.columns), other.data_min.copy(), other.data_max.copy()
+        else:
+            if list(other.columns) != self.columns:
+                raise ValueError("Không thể gộp MinMaxState có danh sách cột khác nhau")
+            self.data_min = np.fmin(self.data_min, other.data_min)
+            self.data_max = np.fmax(self.data_max, other.data_max)
+        self.rows += other.rows
+        return self
+
+    def update(self, df):
+        return self.merge(MinMaxState.from_frame(df))
+
+    def transform(self, values):
+        # Cùng thứ tự phép tính với MinMaxScaler (X * scale_ + min_) để kết quả trùng khớp
+        data_range = self.data_max - self.data_min
+        scale = 1.0 / np.where(data_range == 0, 1.0, data_range)
+        return values * scale + (0.0 - self.data_min * scale)
+
+    def to_params(self):
+        return {col: [float(low), float(high)] for col, low, high in zip(self.columns, self.data_min, self.data_max)}
+
+
+class WarmupState:
+    """
+    Phần cuối của các khối trước cần cho khối sau: dòng đã nội suy cuối cùng, các dòng
+    còn chờ nội suy, giá trị EWM của RSI/MACD, các giá Close gần nhất (SMA, lag) và
+    dòng đặc trưng cuối cùng (để ffill).
+    """
+
+    def __init__(self):
+        self.last_clean = None
+        self.pending = None
+        self.ewm = {}
+        self.closes = np.empty(0)
+        self.last_features = None
+
+    def interpolate(self, raw, final=False):
+        frame = raw if self.pending is None else pd.concat([self.pending, raw])
+        self.pending = None
+        if not final:
+            # Các dòng cuối còn NaN cần giá trị của khối sau để nội suy: giữ lại
+            valid = np.flatnonzero(frame.notna().all(axis=1).to_numpy())
+            cut = valid[-1] + 1 if len(valid) else 0
+            if cut < len(frame):
+                self.pending = frame.iloc[cut:]
+                frame = frame.iloc[:cut]
+        if frame.empty:
+            return frame
+        context = 0 if self.last_clean is None else 1
+        if context:
+            frame = pd.concat([self.last_clean, frame])
+        clean = frame.interpolate(method='linear').iloc[context:]
+        self.last_clean = clean.iloc[-1:]
+        return clean
+
+    def _ewm(self, key, values, **kwargs):
+        # Mồi bằng giá trị EWM cuối của khối trước: với adjust=False đây đúng là công thức truy hồi
+        seed = self.ewm.get(key)
+        if seed is not None:
+            values = np.concatenate([[seed], values])
+        result = pd.Series(values).ewm(adjust=False, **kwargs).mean().to_numpy()
+        if seed is not None:
+            result = result[1:]
+        self.ewm[key] = result[-1]
+        return result
+
+    def features(self, clean):
+        """
+        Tính đặc trưng cho một khối đã nội suy, tiếp nối trạng thái của các khối trước.
+        """
+        close = clean['Close'].to_numpy(dtype=np.float64)
+        carried = len(self.closes)
+        history = pd.Series(np.concatenate([self.closes, close]))
+
+        df = clean.copy()
+        df['Log_Returns'] = np.log(history / history.shift(1)).to_numpy()[carried:]
+
+        delta = history.diff().iloc[carried:]
+        gain = self._ewm("gain", delta.where(delta > 0, 0).to_numpy(), alpha=1 / RSI_PERIOD)
+        loss = self._ewm("loss", (-delta.where(delta < 0, 0)).to_numpy(), alpha=1 / RSI_PERIOD)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df['RSI_14'] = 100 - (100 / (1 + gain / loss))
+
+        fast, slow, signal = MACD_SPANS
+        macd = self._ewm("fast", close, span=fast) - self._ewm("slow", close, span=slow)
+        df['MACD_12_26_9'] = macd
+        df['MACDs_12_26_9'] = self._ewm("signal", macd, span=signal)
+
+        for window in SMA_WINDOWS:
+            df[f'SMA_{window}'] = history.rolling(window=window).mean().to_numpy()[carried:]
+
+        # Fill NaN: bfill trong khối, ffill tiếp nối từ dòng cuối của khối trước
+        df = df.bfill()
+        if self.last_features is not None:
+            df = pd.concat([self.last_features, df]).ffill().iloc[1:]
+        self.last_features = df.iloc[-1:]
+
+        for i in range(1, LAGS + 1):
+            df[f'Close_Lag_{i}'] = history.shift(i).to_numpy()[carried:]
+
+        keep = max(max(SMA_WINDOWS), LAGS + 1)
+        self.closes = history.to_numpy()[-keep:]
+        return df.dropna()
+
+
+def _warm_chunks(chunks, min_rows=MIN_CHUNK_ROWS):
+    """
+    Gộp các khối đầu liên tiếp tới khi đủ min_rows dòng (phân vùng năm đầu tiên có thể
+    chỉ có vài ngày), các khối sau giữ nguyên.
+    """
+    head, rows = [], 0
+    for raw in chunks:
+        head.append(raw)
+        rows += len(raw)
+        if rows >= min_rows:
+            break
+    if head:
+        yield head[0] if len(head) == 1 else pd.concat(head)
+    yield from chunks
+
+
+class _Reservoir:
+    """
+    Mẫu ngẫu nhiên đều (reservoir sampling) các dòng [Close, Volume] để huấn luyện IsolationForest.
+    """
+
+    def __init__(self, capacity, seed=42):
+        self.capacity = capacity
+        self.sample = np.empty((capacity, 2))
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, values):
+        take = min(max(self.capacity - self.seen, 0), len(values))
+        self.sample[self.seen:self.seen + take] = values[:take]
+        rest = values[take:]
+        if len(rest):
+            slots = self.rng.integers(0, np.arange(self.seen + take, self.seen + len(values)) + 1)
+            keep = slots < self.capacity
+            self.sample[slots[keep]] = rest[keep]
+        self.seen += len(values)
+
+    def values(self):
+        return self.sample[:min(self.seen, self.capacity)]
+
+
+def load_split(processed_dir, part, compact=False):
+    """
+    Đọc phần "train" hoặc "test" đã tiền xử lý: theo khoảng chỉ số trong split.json nếu có,
+    ngược lại từ train_data.csv / test_data.csv. Trả về None nếu chưa tiền xử lý.
+    compact: đọc với kiểu gọn (xem compact_dtypes).
+    """
+    split_path = os.path.join(processed_dir, SPLIT_FILE)
+    if os.path.exists(split_path):
+        with open(split_path, "r") as f:
+            split = json.load(f)
+        bounds = split[part]
+        with open(os.path.join(processed_dir, split["file"]), "r") as f:
+            header = f.readline().rstrip("\r\n").split(",")
+            # Nhảy thẳng tới dòng đầu của phần cần đọc, không parse phần còn lại của file
+            f.seek(bounds["offset"])
+            return compact_dtypes.read_csv(f, compact=compact, header=None, names=header,
+                                           nrows=bounds["stop"] - bounds["start"])
+
+    csv_path = os.path.join(processed_dir, f"{part}_data.csv")
+    if os.path.exists(csv_path):
+        return compact_dtypes.read_csv(csv_path, compact=compact)
+    return None
+
+
+def preprocess_stock_data_streaming(ticker="FPT.VN", output_dir=None, chunk_rows=CHUNK_ROWS,
+                                    sample_rows=OUTLIER_SAMPLE_ROWS, compact=False,
+                                    outlier_method="isolation_forest"):
+    """
+    Tiền xử lý theo khối chunk_rows dòng với bộ nhớ giới hạn. Ghi preprocessed_data.csv,
+    split.json (khoảng train/test) và scaling_params.json vào data/processed. Trả về nội dung split.json.
+    compact: ghi đặc trưng đã chuẩn hóa dạng float32 và Outlier int8.
+    outlier_method: "isolation_forest" (trên mẫu đều) hoặc "robust_z" (trực tuyến, xem anomaly_detector).
+    """
+    base_dir = output_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_processed_dir = os.path.join(base_dir, "data", "processed")
+    os.makedirs(data_processed_dir, exist_ok=True)
+    results_dir = os.path.join(base_dir, "results", "figures")
+    os.makedirs(results_dir, exist_ok=True)
+
+    if not market_store.has_ticker(ticker):
+        print(f"Lỗi: Không tìm thấy dữ liệu cho {ticker} trong {market_store.store_dir()}")
+        return
+    chunk_rows = max(chunk_rows, MIN_CHUNK_ROWS)
+
+    # Lượt 1: nội suy + chỉ báo + min/max, đặc trưng chưa chuẩn hóa ghi ra file tạm
+    features_path = os.path.join(data_processed_dir, ".features.f8")
+    dates_path = os.path.join(data_processed_dir, ".dates.i8")
+    outliers_path = os.path.join(data_processed_dir, ".outliers.i1")
+    state_path = os.path.join(data_processed_dir, anomaly_detector.STATE_FILE)
+    robust = outlier_method == "robust_z"
+    detector = anomaly_detector.RobustZState([ticker]) if robust else None
+    print(f"Loading data theo khối {chunk_rows} dòng...")
+    warmup = WarmupState()
+    scaler = MinMaxState()
+    reservoir = _Reservoir(sample_rows)
+    columns = None
+    rows = 0
+    with instrumentation.track("preprocess.stream_features") as record, \
+            open(features_path, "wb") as features_file, open(dates_path, "wb") as dates_file, \
+            open(outliers_path, "wb") as outliers_file:
+        chunks = _warm_chunks(market_store.iter_ohlcv(ticker, chunk_rows=chunk_rows))
+        raw = next(chunks, None)
+        while raw is not None:
+            following = next(chunks, None)
+            clean = warmup.interpolate(raw, final=following is None)
+            raw = following
+            if clean.empty:
+                continue
+            if robust:
+                flags, detector = anomaly_detector.detect_frame(clean, state=detector)
+            else:
+                reservoir.add(clean[['Close', 'Volume']].to_numpy(dtype=np.float64))
+            df = warmup.features(clean)
+            if df.empty:
+                continue
+            if robust:
+                flags.reindex(df.index).to_numpy(dtype=np.int8).tofile(outliers_file)
+            columns = columns or list(df.columns)
+            scaler.merge(MinMaxState.from_frame(df[columns]))
+            df[columns].to_numpy(dtype=np.float64).tofile(features_file)
+            df.index.as_unit("ns").asi8.tofile(dates_file)
+            rows += len(df)
+        record["rows"] = int(detector.count[0]) if robust else reservoir.seen
+    if rows == 0:
+        print(f"Lỗi: Không đủ dữ liệu để tạo đặc trưng cho {ticker}")
+        for path in (features_path, dates_path, outliers_path):
+            os.remove(path)
+        return
+    print(f"1. Đã nội suy và tạo đặc trưng cho {rows} dòng (RSI, MACD, MA, Lags).")
+
+    if robust:
+        anomaly_detector.save_state(detector, state_path)
+        print("2. Đã gắn nhãn ngoại lai bằng robust z-score trực tuyến và lưu trạng thái.")
+    else:
+        # IsolationForest học trên mẫu đều; ngưỡng contamination tính trên chính mẫu đó
+        with instrumentation.track("preprocess.isolation_forest", rows=len(reservoir.values())):
+            iso = IsolationForest(contamination=0.01, random_state=42)
+            iso.fit(reservoir.values())
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        print(f"2. Đã huấn luyện IsolationForest trên {len(reservoir.values())}/{reservoir.seen} dòng.")
+
+    # Lượt 2: nhãn ngoại lai + chuẩn hóa, ghi nối tiếp vào một file duy nhất
+    features = np.memmap(features_path, dtype=np.float64, mode="r", shape=(rows, len(columns)))
+    dates = np.memmap(dates_path, dtype=np.int64, mode="r", shape=(rows,))
+    flags = np.memmap(outliers_path, dtype=np.int8, mode="r", shape=(rows,)) if robust else None
+    close_col, volume_col = columns.index('Close'), columns.index('Volume')
+    split_idx = int(rows * TRAIN_RATIO)
+    stride = max(1, rows // PLOT_POINTS)
+    plot_dates, plot_close, outlier_dates, outlier_close = [], [], [], []
+    output_path = os.path.join(data_processed_dir, 'preprocessed_data.csv')
+    offsets = {}
+    with instrumentation.track("preprocess.stream_scale_save", rows=rows), open(output_path, "w") as out:
+        for lo in range(0, rows, chunk_rows):
+            hi = min(lo + chunk_rows, rows)
+            block = np.array(features[lo:hi])
+            index = pd.DatetimeIndex(np.array(dates[lo:hi]).astype("datetime64[ns]"), name="Date")
+            outlier = np.array(flags[lo:hi]) if robust else iso.predict(block[:, [close_col, volume_col]])
+
+            df_scaled = pd.DataFrame(scaler.transform(block), columns=columns, index=index)
+            df_scaled['Outlier'] = outlier
+            if compact:
+                df_scaled = compact_dtypes.compact_frame(df_scaled)
+            if lo == 0:
+                out.write(",".join(["Date"] + list(df_scaled.columns)) + "\n")
+                offsets["train"] = out.tell()
+            if lo <= split_idx < hi:
+                df_scaled.iloc[:split_idx - lo].to_csv(out, header=False)
+                offsets["test"] = out.tell()
+                df_scaled.iloc[split_idx - lo:].to_csv(out, header=False)
+            else:
+                df_scaled.to_csv(out, header=False)
+
+            start = (-lo) % stride
+            plot_dates.append(index[start::stride])
+            plot_close.append(block[start::stride, close_col])
+            outlier_dates.append(index[outlier == -1])
+            outlier_close.append(block[outlier == -1, close_col])
+    del features, dates, flags
+    for path in (features_path, dates_path, outliers_path):
+        os.remove(path)
+
+    figure_renderer.render_figures([figure_renderer.outlier_job(
+        np.concatenate(plot_dates), np.concatenate(plot_close), np.concatenate(outlier_dates),
+        np.concatenate(outlier_close), ticker, results_dir)])
+    print("3. Đã chuẩn hóa dữ liệu [0, 1] và lưu biểu đồ ngoại lai.")
+
+    split = {
+        "file": "preprocessed_data.csv",
+        "rows": rows,
+        "train": {"start": 0, "stop": split_idx, "offset": offsets["train"]},
+        "test": {"start": split_idx, "stop": rows, "offset": offsets["test"]},
+    }
+    with open(os.path.join(data_processed_dir, SPLIT_FILE), "w") as f:
+        json.dump(split, f, indent=2)
+    # Bỏ bản sao train/test cũ (nếu có) để load_split không đọc nhầm dữ liệu lỗi thời
+    for name in ("train_data.csv", "test_data.csv"):
+        stale = os.path.join(data_processed_dir, name)
+        if os.path.exists(stale):
+            os.remove(stale)
+    print(f"4. Đã chia tập dữ liệu: Train ({split_idx}), Test ({rows - split_idx}) trong split.json.")
+
+    close_low, close_high = scaler.data_min[close_col], scaler.data_max[close_col]
+    scaling_params = {"Close_min": float(close_low), "Close_max": float(close_high), "columns": scaler.to_params()}
+    with open(os.path.join(data_processed_dir, "scaling_params.json"), "w") as f:
+        json.dump(scaling_params, f)
+    print(f"5. Đã lưu dữ liệu và tham số scaling (Close_min={scaling_params['Close_min']}, "
+          f"Close_max={scaling_params['Close_max']}) vào 'data/processed/'.")
+    return split
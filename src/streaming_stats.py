@@ -0,0 +1,341 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Thống kê mô tả một lượt, gộp được (mergeable) giữa các khối, tiến trình và ticker.
+#   - MomentState: n, mean, M2..M4 (tổng lũy thừa độ lệch) và min/max cho nhiều cột cùng lúc.
+#     Mỗi khối được tính hai lượt trong bộ nhớ rồi gộp bằng công thức Welford / Pébay, nên
+#     không bị triệt tiêu số như cách cộng dồn tổng x^k; skew/kurtosis dùng đúng công thức
+#     hiệu chỉnh của pandas (Series.skew / Series.kurt).
+#   - QuantileSketch: histogram log (kiểu DDSketch) với sai số tương đối cố định cho median
+#     và các phân vị khác; gộp = cộng số đếm theo bucket.
+#   - RollingWindow: cửa sổ trượt bằng hai ngăn xếp (two-stacks), chỉ dùng merge nên không
+#     phải trừ phần tử rời cửa sổ (ổn định số, O(1) khấu hao mỗi bar).
+
+RELATIVE_ACCURACY = 0.001
+# Giống nanops._zero_out_fperr của pandas
+FPERR = 1e-14
+
+
+def _zero_out_fperr(values):
+    return np.where(np.abs(values) < FPERR, 0., values)
+
+
+class MomentState:
+    """
+    Moment bậc 1-4, min và max của từng cột; NaN được bỏ qua như pandas.
+    """
+
+    def __init__(self, n_columns):
+        self.n = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.m3 = np.zeros(n_columns)
+        self.m4 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Moment của một khối (dòng x cột) trong bộ nhớ.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        state = cls(values.shape[1])
+        observed = ~np.isnan(values)
+        state.n = observed.sum(axis=0).astype(np.float64)
+        if not observed.any():
+            return state
+        with np.errstate(invalid="ignore", divide="ignore"):
+            state.mean = np.where(state.n > 0, np.nansum(values, axis=0) / state.n, 0.)
+        delta = np.where(observed, values - state.mean, 0.)
+        delta2 = delta * delta
+        state.m2 = delta2.sum(axis=0)
+        state.m3 = (delta2 * delta).sum(axis=0)
+        state.m4 = (delta2 * delta2).sum(axis=0)
+        state.min = np.where(observed, values, np.inf).min(axis=0)
+        state.max = np.where(observed, values, -np.inf).max(axis=0)
+        return state
+
+    def update(self, values):
+        self.merge_inplace(MomentState.from_values(values))
+        return self
+
+    def merge_inplace(self, other):
+        na, nb = self.n, other.n
+        n = na + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = other.mean - self.mean
+            delta2 = delta * delta
+            mean = self.mean + delta * nb / n
+            m2 = self.m2 + other.m2 + delta2 * na * nb / n
+            m3 = (self.m3 + other.m3 + delta2 * delta * na * nb * (na - nb) / (n * n)
+                  + 3. * delta * (na * other.m2 - nb * self.m2) / n)
+            m4 = (self.m4 + other.m4 + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / (n * n * n)
+                  + 6. * delta2 * (na * na * other.m2 + nb * nb * self.m2) / (n * n)
+                  + 4. * delta * (na * other.m3 - nb * self.m3) / n)
+        # Một phía rỗng: giữ nguyên phía còn lại (tránh 0/0)
+        for name, merged in (("mean", mean), ("m2", m2), ("m3", m3), ("m4", m4)):
+            ours, theirs = getattr(self, name), getattr(other, name)
+            setattr(self, name, np.where(nb == 0, ours, np.where(na == 0, theirs, merged)))
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def merge(self, other):
+        return self.copy().merge_inplace(other)
+
+    def copy(self):
+        state = MomentState(len(self.n))
+        for name in ("n", "mean", "m2", "m3", "m4", "min", "max"):
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+    def std(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > ddof, np.sqrt(self.m2 / (self.n - ddof)), np.nan)
+
+    def skew(self):
+        """
+        Độ lệch đã hiệu chỉnh như Series.skew().
+        """
+        n = self.n
+        m2, m3 = _zero_out_fperr(self.m2), _zero_out_fperr(self.m3)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+        result = np.where(m2 == 0, 0., result)
+        return np.where(n < 3, np.nan, result)
+
+    def kurtosis(self):
+        """
+        Độ nhọn dư (excess) đã hiệu chỉnh như Series.kurt().
+        """
+        n = self.n
+        m2, m4 = _zero_out_fperr(self.m2), _zero_out_fperr(self.m4)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            adj = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+            numerator = n * (n + 1) * (n - 1) * m4
+            denominator = (n - 2) * (n - 3) * m2 ** 2
+            result = numerator / denominator - adj
+        result = np.where(denominator == 0, 0., result)
+        return np.where(n < 4, np.nan, result)
+
+
+class _BucketStore:
+    """
+    Số đếm theo chỉ số bucket liên tiếp [offset, offset + len(counts)), mảng dày để cộng/gộp bằng NumPy.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _extend(self, lo, hi):
+        if not len(self.counts):
+            self.offset, self.counts = lo, np.zeros(hi - lo, dtype=np.int64)
+            return
+        new_lo, new_hi = min(lo, self.offset), max(hi, self.offset + len(self.counts))
+        if (new_lo, new_hi) != (self.offset, self.offset + len(self.counts)):
+            counts = np.zeros(new_hi - new_lo, dtype=np.int64)
+            counts[self.offset - new_lo:self.offset - new_lo + len(self.counts)] = self.counts
+            self.offset, self.counts = new_lo, counts
+
+    def add(self, keys):
+        if len(keys):
+            lo, hi = int(keys.min()), int(keys.max()) + 1
+            self._extend(lo, hi)
+            self.counts[lo - self.offset:hi - self.offset] += np.bincount(keys - lo, minlength=hi - lo)
+
+    def add_store(self, other):
+        if len(other.counts):
+            self._extend(other.offset, other.offset + len(other.counts))
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+
+    def copy(self):
+        store = _BucketStore()
+        store.offset, store.counts = self.offset, self.counts.copy()
+        return store
+
+
+class QuantileSketch:
+    """
+    Phân vị xấp xỉ với sai số tương đối relative_accuracy (bucket theo log, kiểu DDSketch).
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = _BucketStore()
+        self.negative = _BucketStore()
+        self.zeros = 0
+
+    @property
+    def count(self):
+        return int(self.positive.counts.sum() + self.negative.counts.sum()) + self.zeros
+
+    def _keys(self, values):
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.zeros += int((values == 0).sum())
+        self.positive.add(self._keys(values[values > 0]))
+        self.negative.add(self._keys(-values[values < 0]))
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Không gộp được hai sketch khác relative_accuracy")
+        merged = QuantileSketch(self.relative_accuracy)
+        merged.positive, merged.negative = self.positive.copy(), self.negative.copy()
+        merged.positive.add_store(other.positive)
+        merged.negative.add_store(other.negative)
+        merged.zeros = self.zeros + other.zeros
+        return merged
+
+    def _values(self, store):
+        return 2 * self.gamma ** np.arange(store.offset, store.offset + len(store.counts)) / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Phân vị q (0..1) theo hạng q * (n - 1) như pandas; trả về NaN khi chưa có dữ liệu.
+        """
+        count = self.count
+        if count == 0:
+            return math.nan
+        # Các bucket theo thứ tự tăng dần: số âm (bucket lớn trước), số 0, rồi số dương
+        values = np.concatenate([-self._values(self.negative)[::-1], [0.], self._values(self.positive)])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zeros], self.positive.counts])
+        cumulative = np.cumsum(counts)
+        rank = q * (count - 1)
+        lower = math.floor(rank)
+        value = values[np.searchsorted(cumulative, lower, side="right")]
+        if rank == lower:
+            return float(value)
+        upper = values[np.searchsorted(cumulative, lower + 1, side="right")]
+        return float(value + (rank - lower) * (upper - value))
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+class StatsState:
+    """
+    Thống kê mô tả của một tập cột: moment + sketch phân vị, gộp được.
+    """
+
+    def __init__(self, columns, relative_accuracy=RELATIVE_ACCURACY):
+        self.columns = list(columns)
+        self.moments = MomentState(len(self.columns))
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in self.columns]
+
+    def update(self, frame):
+        """
+        Hấp thụ một khối (DataFrame có các cột trên, hoặc mảng dòng x cột).
+        """
+        if isinstance(frame, pd.DataFrame):
+            frame = frame if list(frame.columns) == self.columns else frame[self.columns]
+            values = frame.to_numpy(dtype=np.float64)
+        else:
+            values = np.asarray(frame, dtype=np.float64).reshape(-1, len(self.columns))
+        self.moments.merge_inplace(MomentState.from_values(values))
+        for i, sketch in enumerate(self.sketches):
+            sketch.update(values[:, i])
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError(f"Không gộp được thống kê của các cột khác nhau: {self.columns} / {other.columns}")
+        merged = StatsState(self.columns, self.sketches[0].relative_accuracy if self.sketches else RELATIVE_ACCURACY)
+        merged.moments = self.moments.merge(other.moments)
+        merged.sketches = [a.merge(b) for a, b in zip(self.sketches, other.sketches)]
+        return merged
+
+    def to_frame(self):
+        """
+        Bảng thống kê mỗi cột một dòng, cùng tên cột với bảng của descriptive_stats.
+        """
+        moments = self.moments
+        observed = moments.n > 0
+        return pd.DataFrame({
+            "Variable": self.columns,
+            "Mean (Trung bình)": np.where(observed, moments.mean, np.nan),
+            "Median (Trung vị)": [sketch.median() for sketch in self.sketches],
+            "Std (Độ lệch chuẩn)": moments.std(),
+            "Min (Nhỏ nhất)": np.where(observed, moments.min, np.nan),
+            "Max (Lớn nhất)": np.where(observed, moments.max, np.nan),
+            "Skewness (Độ lệch)": moments.skew(),
+            "Kurtosis (Độ nhọn)": moments.kurtosis(),
+            "Count": moments.n.astype(np.int64),
+        })
+
+
+class RollingWindow:
+    """
+    Cửa sổ trượt `window` phần tử cho một trạng thái gộp được (two-stacks):
+    push thêm phần tử mới, phần tử cũ nhất tự rời cửa sổ; value() là trạng thái gộp của cả cửa sổ.
+    """
+
+    def __init__(self, window, merge):
+        self.window = window
+        self._merge = merge
+        # front: (phần tử, gộp của nó với mọi phần tử mới hơn trong front) — đỉnh là phần tử cũ nhất
+        self.front = []
+        self.back = []
+        self.back_total = None
+
+    def __len__(self):
+        return len(self.front) + len(self.back)
+
+    def push(self, item):
+        self.back.append(item)
+        self.back_total = item if self.back_total is None else self._merge(self.back_total, item)
+        if len(self) > self.window:
+            self.pop()
+
+    def pop(self):
+        if not self.front:
+            # Đổ back sang front, tính sẵn gộp từ phần tử mới nhất về cũ nhất
+            total = None
+            for item in reversed(self.back):
+                total = item if total is None else self._merge(item, total)
+                self.front.append((item, total))
+            self.back, self.back_total = [], None
+        return self.front.pop()[0]
+
+    def value(self):
+        if not self.front:
+            return self.back_total
+        if self.back_total is None:
+            return self.front[-1][1]
+        return self._merge(self.front[-1][1], self.back_total)
+
+
+def rolling_moments(frame, window, columns=None):
+    """
+    Mean / std / skew / kurtosis trượt `window` dòng của các cột (giống rolling(window) của pandas,
+    NaN khi cửa sổ chưa đủ). Trả về DataFrame cột dạng "<cột>_<thống kê>".
+    """
+    columns = list(columns or frame.columns)
+    values = frame[columns].to_numpy(dtype=np.float64)
+    rolling = RollingWindow(window, lambda a, b: a.merge(b))
+    out = np.full((len(values), len(columns), 4), np.nan)
+    for i, row in enumerate(values):
+        rolling.push(MomentState.from_values(row[np.newaxis, :]))
+        if len(rolling) < window:
+            continue
+        state = rolling.value()
+        full = state.n >= window
+        with np.errstate(invalid="ignore"):
+            stats = np.stack([state.mean, state.std(), state.skew(), state.kurtosis()], axis=1)
+        out[i] = np.where(full[:, np.newaxis], stats, np.nan)
+    names = ("mean", "std", "skew", "kurt")
+    return pd.DataFrame(out.reshape(len(values), -1), index=frame.index,
+                        columns=[f"{col}_{name}" for col in columns for name in names])
@@ -0,0 +1,88 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+# Sinh dữ liệu OHLCV giả lập (random walk hình học) có seed cố định theo ticker.
+# Chuỗi ngày luôn bắt đầu từ cùng một mốc ORIGIN nên phần lịch sử đã sinh không đổi
+# khi khoảng thời gian yêu cầu dài thêm (phù hợp để thử tải incremental).
+# Dữ liệu trong ngày (interval khác "1d") được sinh theo phiên giao dịch HOSE
+# 9:00-15:00 giờ Việt Nam, bắt đầu từ start nên không có tính chất tiền tố này.
+
+ORIGIN = "2015-01-01"
+# Phiên giao dịch theo giờ UTC (9:00-15:00 UTC+7)
+SESSION_OPEN = "02:00"
+SESSION_CLOSE = "08:00"
+INTERVALS = {"1d": None, "1h": "60min", "30m": "30min", "15m": "15min", "5m": "5min", "1m": "1min"}
+
+
+def _intraday_index(days, interval):
+    freq = INTERVALS[interval]
+    session = pd.date_range(f"2000-01-01 {SESSION_OPEN}", f"2000-01-01 {SESSION_CLOSE}",
+                            freq=freq, inclusive="left")
+    offsets = session - session[0].normalize()
+    # Mỗi ngày giao dịch lặp lại cùng các mốc trong phiên
+    index = (days.values[:, np.newaxis] + offsets.values[np.newaxis, :]).ravel()
+    return pd.DatetimeIndex(index, name="Date").tz_localize("UTC"), len(offsets)
+
+
+def generate_ohlcv(ticker, start=None, end=None, seed=0, interval="1d", days=None):
+    """
+    Sinh dữ liệu (Open, High, Low, Close, Volume) cho một ticker trong [start, end].
+    days: số ngày giao dịch tính ngược từ end (thay cho start). interval: "1d" hoặc một khung
+    trong ngày ("1h", "30m", "15m", "5m", "1m").
+    Index là Date (UTC, có timezone) giống dữ liệu từ yfinance.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"interval không hỗ trợ: {interval} (chọn trong {list(INTERVALS)})")
+    end = pd.Timestamp(end or pd.Timestamp.now(tz="UTC")).normalize()
+    if end.tz is None:
+        end = end.tz_localize("UTC")
+    if days is not None:
+        start = pd.bdate_range(end=end, periods=days)[0]
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.tz_localize("UTC") if start.tz is None else start
+
+    origin = pd.Timestamp(ORIGIN, tz="UTC")
+    if interval != "1d" or (start is not None and start < origin):
+        origin = start if start is not None else origin
+    dates = pd.bdate_range(origin, end, name="Date")
+    bars_per_day = 1
+    if interval != "1d":
+        dates, bars_per_day = _intraday_index(dates, interval)
+
+    rng = np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+    start_price = rng.uniform(10_000, 150_000)
+    # Một hàng 4 số ngẫu nhiên cho mỗi bar: giữ nguyên tiền tố khi chuỗi dài thêm
+    noise = rng.standard_normal((len(dates), 4))
+
+    # Biến động và khối lượng mỗi bar co lại theo số bar trong ngày
+    scale = 1 / np.sqrt(bars_per_day)
+    close = start_price * np.exp(np.cumsum(0.0003 / bars_per_day + 0.02 * scale * noise[:, 0]))
+    open_ = close * np.exp(0.005 * scale * noise[:, 1])
+    high = np.maximum(open_, close) * (1 + 0.01 * scale * np.abs(noise[:, 2]))
+    low = np.minimum(open_, close) * (1 - 0.01 * scale * np.abs(noise[:, 3]))
+    volume = np.round(np.exp(14 - np.log(bars_per_day) + 0.5 * noise[:, 2]))
+
+    df = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                      index=dates)
+    if start is not None:
+        df = df[df.index >= start]
+    return df
+
+
+def universe_tickers(n_tickers, prefix="SYN"):
+    width = max(4, len(str(n_tickers - 1)))
+    return [f"{prefix}{i:0{width}d}" for i in range(n_tickers)]
+
+
+def write_universe(n_tickers, days=1250, interval="1d", seed=0, end=None, root=None, prefix="SYN"):
+    """
+    Sinh n_tickers ticker giả lập và ghi vào kho dữ liệu. Trả về danh sách ticker.
+    """
+    import market_store
+    tickers = universe_tickers(n_tickers, prefix)
+    for ticker in tickers:
+        market_store.write_ohlcv(generate_ohlcv(ticker, end=end, seed=seed, interval=interval, days=days),
+                                 ticker, root=root)
+    return tickers
@@ -0,0 +1,118 @@
+import contextlib
+import gc
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import worker_threads
+
+# Chế độ universe: chạy tiền xử lý, EDA và modeling cho nhiều ticker trên
+# process pool, mỗi task là một lô ticker. Kết quả của từng ticker nằm trong
+# universe/<ticker>/ (cùng cấu trúc data/processed và results/ như bản đơn lẻ),
+# log in ra của từng ticker được ghi vào universe/<ticker>/run.log.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_ROOT = os.path.join(BASE_DIR, "universe")
+STEPS = ("preprocess", "eda", "model")
+
+
+def _init_worker(memory_limit_mb):
+    # Mỗi worker chỉ dùng 1 luồng cho BLAS/OpenMP để không tranh CPU với các worker khác
+    worker_threads.limit_worker_threads()
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    if memory_limit_mb:
+        import resource
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def process_ticker(ticker, output_root=DEFAULT_OUTPUT_ROOT, steps=STEPS, incremental_model=False, compact=False,
+                   outlier_method="isolation_forest"):
+    """
+    Chạy các bước cho một ticker, trả về dict kết quả (không ném lỗi ra ngoài).
+    """
+    output_dir = os.path.join(output_root, ticker)
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    result = {"ticker": ticker, "status": "ok", "error": "", "elapsed": 0.0}
+
+    with open(os.path.join(output_dir, "run.log"), "w") as log, contextlib.redirect_stdout(log):
+        try:
+            if "preprocess" in steps:
+                import preprocess_data
+                if preprocess_data.preprocess_stock_data(ticker=ticker, output_dir=output_dir, compact=compact,
+                                                         outlier_method=outlier_method) is None:
+                    raise RuntimeError("Không có dữ liệu để tiền xử lý")
+            if "eda" in steps:
+                import eda_analysis
+                # Song song hóa đã ở cấp ticker: vẽ tuần tự trong worker
+                eda_analysis.run_eda_analysis(ticker=ticker, output_dir=output_dir, render_workers=1)
+            if "model" in steps:
+                import modeling
+                modeling.run_modeling(output_dir=output_dir, incremental=incremental_model, compact=compact,
+                                      ticker=ticker)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=log)
+        finally:
+            # Giải phóng figure và bộ nhớ trước khi sang ticker tiếp theo
+            import matplotlib.pyplot as plt
+            plt.close("all")
+            gc.collect()
+
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def process_batch(tickers, output_root=DEFAULT_OUTPUT_ROOT, steps=STEPS, incremental_model=False, compact=False,
+                  outlier_method="isolation_forest"):
+    return [process_ticker(ticker, output_root, steps, incremental_model, compact, outlier_method) for ticker in tickers]
+
+
+def run_universe(tickers, steps=STEPS, max_workers=None, batch_size=1, memory_limit_mb=None,
+                 max_tasks_per_child=50, output_root=DEFAULT_OUTPUT_ROOT, incremental_model=False, compact=False,
+                 outlier_method="isolation_forest"):
+    """
+    Chia danh sách ticker thành các lô và chạy song song trên process pool.
+    memory_limit_mb giới hạn bộ nhớ ảo của mỗi worker; worker được thay mới sau
+    max_tasks_per_child lô để bộ nhớ phân mảnh không tích lũy qua cả đêm.
+    incremental_model: cập nhật XGBoost từ mô hình đã lưu của từng ticker thay vì fit lại.
+    compact: tiền xử lý và huấn luyện trên float32 / int8 (xem compact_dtypes).
+    outlier_method: "isolation_forest" hoặc "robust_z" (xem anomaly_detector).
+    """
+    os.makedirs(output_root, exist_ok=True)
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    results = []
+    started = time.perf_counter()
+
+    # max_tasks_per_child buộc dùng spawn: biến môi trường 1 luồng phải có sẵn từ tiến trình cha
+    with worker_threads.single_threaded_pool(), \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                initargs=(memory_limit_mb,), max_tasks_per_child=max_tasks_per_child) as pool:
+        futures = {pool.submit(process_batch, batch, output_root, tuple(steps), incremental_model, compact,
+                               outlier_method): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                # Worker chết (ví dụ bị hệ điều hành kill): đánh dấu lỗi cho cả lô
+                batch_results = [{"ticker": t, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                                  "elapsed": 0.0} for t in futures[future]]
+            for result in batch_results:
+                results.append(result)
+                print(f"[{len(results)}/{len(tickers)}] {result['ticker']}: {result['status']} "
+                      f"({result['elapsed']:.1f}s)")
+
+    summary = pd.DataFrame(results, columns=["ticker", "status", "error", "elapsed"])
+    summary.to_csv(os.path.join(output_root, "summary.csv"), index=False)
+
+    failed = summary[summary["status"] != "ok"]
+    print(f"\n--- Universe: {len(summary) - len(failed)}/{len(summary)} ticker thành công "
+          f"trong {time.perf_counter() - started:.1f}s ---")
+    for _, row in failed.iterrows():
+        print(f"   - {row['ticker']}: {row['error']}")
+    return summary
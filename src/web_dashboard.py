@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import os
+import sys
+
+# Add src to python path to facilitate imports (streamlit run src/web_dashboard.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import downsampling
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -12,29 +17,63 @@ st.set_page_config(
 )
 
 # --- LOAD DATA ---
-@st.cache_data
-def load_data():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    results_dir = os.path.join(base_dir, "results")
-    metrics_path = os.path.join(results_dir, "metrics.csv")
-    predictions_path = os.path.join(results_dir, "predictions.csv")
-    figures_dir = os.path.join(results_dir, "figures")
-    
-    # Load Metrics
-    if os.path.exists(metrics_path):
-        metrics_df = pd.read_csv(metrics_path)
-    else:
-        metrics_df = pd.DataFrame(columns=["Model", "RMSE", "R2", "MAPE"])
-        
-    # Load Predictions
-    if os.path.exists(predictions_path):
-        preds_df = pd.read_csv(predictions_path, index_col=0, parse_dates=True)
-    else:
-        preds_df = pd.DataFrame()
-        
-    return metrics_df, preds_df, figures_dir
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+METRICS_PATH = os.path.join(RESULTS_DIR, "metrics.csv")
+PREDICTIONS_PATH = os.path.join(RESULTS_DIR, "predictions.csv")
+FIGURES_DIR = os.path.join(RESULTS_DIR, "figures")
+# Số điểm tối đa mỗi đường gửi lên trình duyệt (~ độ rộng biểu đồ tính bằng pixel)
+MAX_POINTS = 2000
+# Từ ngưỡng này dùng trace WebGL (Scattergl) thay cho SVG
+WEBGL_MIN_POINTS = 1000
+
+
+@st.cache_resource
+def file_hasher():
+    # Một FileHasher dùng chung cho mọi phiên: chỉ băm lại khi kích thước/mtime của file đổi
+    from pipeline import FileHasher
+    return FileHasher()
+
+
+def file_key(path):
+    """
+    Khóa cache của một file kết quả: hash nội dung (None nếu file chưa có).
+    """
+    return file_hasher().path_hash(path)
+
+
+@st.cache_data(max_entries=4)
+def load_metrics(key):
+    # key chỉ dùng làm khóa cache: file đổi nội dung -> khóa mới -> đọc lại
+    if key is None:
+        return pd.DataFrame(columns=["Model", "RMSE", "R2", "MAPE"])
+    return pd.read_csv(METRICS_PATH)
+
+
+@st.cache_resource(max_entries=2)
+def load_predictions(key):
+    # cache_resource: bảng dự đoán (có thể là nhiều năm nến phút) được dùng chung, không sao chép
+    # cho mỗi lần chạy lại script / mỗi phiên; chỉ đọc, không sửa tại chỗ
+    if key is None:
+        return pd.DataFrame()
+    return pd.read_csv(PREDICTIONS_PATH, index_col=0, parse_dates=True)
 
-metrics_df, preds_df, figures_dir = load_data()
+
+@st.cache_data(max_entries=64)
+def chart_series(key, column, days_to_show, method):
+    """
+    Cột `column` trong days_to_show ngày cuối, đã giảm còn khoảng MAX_POINTS điểm (dùng chung giữa các phiên).
+    """
+    preds = load_predictions(key)
+    start = preds.index[-1] - pd.Timedelta(days=days_to_show)
+    window = preds.loc[preds.index > start, column]
+    return downsampling.downsample(window, MAX_POINTS, method), len(window)
+
+
+metrics_df = load_metrics(file_key(METRICS_PATH))
+predictions_key = file_key(PREDICTIONS_PATH)
+preds_df = load_predictions(predictions_key)
+figures_dir = FIGURES_DIR
 
 # --- TITLE & SIDEBAR ---
 st.title("📈 Stock Price Analysis & Prediction Dashboard")
@@ -47,8 +86,12 @@ with st.sidebar:
     model_options = [col for col in preds_df.columns if col != 'Actual']
     selected_model = st.selectbox("Select Prediction Model", model_options, index=len(model_options)-1 if model_options else 0)
     
-    # Date Range
-    days_to_show = st.slider("Days to Visualize", min_value=30, max_value=len(preds_df), value=100)
+    # Date Range (theo ngày lịch, không theo số dòng: dữ liệu có thể là nến phút)
+    history_days = max((preds_df.index[-1] - preds_df.index[0]).days + 1, 30) if not preds_df.empty else 30
+    days_to_show = st.slider("Days to Visualize", min_value=min(30, history_days), max_value=history_days,
+                             value=min(100, history_days))
+    downsample_method = st.radio("Downsampling", downsampling.METHODS, horizontal=True,
+                                 format_func={"lttb": "LTTB", "minmax": "Min-Max"}.get)
     
     st.divider()
     st.info("Built with [Streamlit](https://streamlit.io) • Phase 6b")
@@ -96,24 +139,27 @@ if not preds_df.empty:
 st.subheader(f"Price History: Actual vs {selected_model}")
 
 if not preds_df.empty:
-    subset = preds_df.iloc[-days_to_show:]
-    
+    actual, window_rows = chart_series(predictions_key, 'Actual', days_to_show, downsample_method)
+    predicted, _ = chart_series(predictions_key, selected_model, days_to_show, downsample_method)
+    # Lịch sử dài: trace WebGL để trình duyệt vẫn mượt
+    trace = go.Scattergl if window_rows > WEBGL_MIN_POINTS else go.Scatter
+
     fig = go.Figure()
-    
+
     # Actual Price
-    fig.add_trace(go.Scatter(
-        x=subset.index, y=subset['Actual'],
+    fig.add_trace(trace(
+        x=actual.index, y=actual.values,
         mode='lines', name='Actual Price',
         line=dict(color='black', width=2)
     ))
-    
+
     # Predicted Price
-    fig.add_trace(go.Scatter(
-        x=subset.index, y=subset[selected_model],
+    fig.add_trace(trace(
+        x=predicted.index, y=predicted.values,
         mode='lines', name=f'Predicted ({selected_model})',
         line=dict(color='#00CC96', width=2, dash='dash')
     ))
-    
+
     fig.update_layout(
         height=500,
         margin=dict(l=0, r=0, t=30, b=0),
@@ -122,6 +168,8 @@ if not preds_df.empty:
     )
     
     st.plotly_chart(fig, use_container_width=True)
+    if len(actual) < window_rows:
+        st.caption(f"{window_rows:,} points downsampled to {len(actual):,} ({downsample_method}).")
 
 # --- DETAILED ANALYSIS ---
 c1, c2 = st.columns([1, 1])
@@ -0,0 +1,39 @@
+import contextlib
+import os
+
+# Giới hạn BLAS/OpenMP về 1 luồng cho các worker của process pool (song song hóa đã nằm ở cấp task).
+# Đặt biến môi trường trong initializer là quá muộn: với spawn (ví dụ khi dùng max_tasks_per_child)
+# worker đã import numpy/OpenBLAS lúc unpickle initializer, với fork thư viện đã nạp sẵn từ tiến
+# trình cha. Vì vậy:
+#   - single_threaded_pool(): đặt biến môi trường ở tiến trình cha trong lúc pool còn chạy, worker
+#     spawn (kể cả worker được thay mới) đọc chúng ngay khi khởi động;
+#   - limit_worker_threads(): gọi trong initializer, ép các thư viện đã nạp về 1 luồng bằng
+#     threadpoolctl và giữ biến môi trường cho thư viện nạp sau (xgboost, scikit-learn).
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+@contextlib.contextmanager
+def single_threaded_pool():
+    """
+    Đặt THREAD_ENV_VARS = 1 trong tiến trình cha khi tạo và chạy pool, khôi phục giá trị cũ khi xong.
+    """
+    previous = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: "1" for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in previous.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def limit_worker_threads():
+    """
+    Gọi trong initializer của worker: 1 luồng cho thư viện đã nạp và sẽ nạp.
+    """
+    os.environ.update({var: "1" for var in THREAD_ENV_VARS})
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)